@@ -2,22 +2,32 @@
 
 import adsk.core
 import adsk.fusion
-import traceback
 import os
 import sys
 import time
-import subprocess
-import platform
-import configparser
 import threading
 from pathlib import Path
 
+# Importing the add-in is main-thread time Fusion waits for too; it is recorded as the 'import' phase.
+import_started = time.perf_counter()
+
 # --- Add the bundled 'lib' folder to Python's path ---
 lib_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib')
 if lib_path not in sys.path:
     sys.path.insert(0, lib_path)
+# The vendored requests keeps its package under src/.
+requests_path = os.path.join(lib_path, 'requests', 'src')
+if requests_path not in sys.path:
+    sys.path.insert(0, requests_path)
 
-import chardet
+from wakatimeUtils import activity
+from wakatimeUtils import (
+    ActivityTracker, CategoryClassifier, CircuitBreaker, DeliveryError, EntityResolver, HeartbeatCompactor,
+    HeartbeatDispatcher, HeartbeatJournal, HeartbeatRateLimiter, InstanceCoordinator, PeriodicTimer, DEBUG, INFO,
+    WARNING, CliLocator, CliUpdater, ConfigService, StartupProfile, StatsStore, create_executor, leader_address,
+    logger, metrics, today_totals, wakatime_home
+)
+from . import commands
 
 # --- Globals and Setup ---
 app = adsk.core.Application.get()
@@ -25,160 +35,408 @@ ui = app.userInterface
 ADDIN_NAME = 'FusionWakaTime'
 ADDIN_VERSION = '6.0.7'
 HEARTBEAT_INTERVAL = 120
+CLI_TIMEOUT = 15
+CLI_CONCURRENCY = 1
+CONFIG_SECTION = 'fusion360'
+PLUGIN = f'fusion-360-wakatime/{ADDIN_VERSION}'
+BATCH_WINDOW = 10
+MAX_BATCH_SIZE = 50
+JOURNAL_PATH = os.path.join(str(Path.home()), '.wakatime', 'fusion360-heartbeats.db')
+STATS_PATH = os.path.join(str(Path.home()), '.wakatime', 'fusion360-stats.db')
+LEADER_LOCK_PATH = os.path.join(str(Path.home()), '.wakatime', 'fusion360-leader.lock')
+STOP_TIMEOUT = 20
+FLUSH_INTERVAL = 5
+FLUSH_EVENT_ID = f'{ADDIN_NAME}_FlushActivity'
+LOG_PATH = os.path.join(str(Path.home()), '.wakatime', 'fusion360-wakatime.log')
+LOG_FLUSH_INTERVAL = 2
+LOG_CONSOLE_EVENT_ID = f'{ADDIN_NAME}_LogToConsole'
+CONFIG_CHECK_INTERVAL = 5
+CONFIG_CHANGED_EVENT_ID = f'{ADDIN_NAME}_ConfigChanged'
+TOTALS_REFRESH_INTERVAL = 5
+CLI_CACHE_PATH = os.path.join(str(Path.home()), '.wakatime', 'fusion360-cli.json')
+CLI_INSTALL_DIR = os.path.join(wakatime_home(), '.wakatime')
+STARTUP_FAILED_EVENT_ID = f'{ADDIN_NAME}_StartupFailed'
 stop_event = threading.Event()
-last_heartbeat_time = 0
+startup_failed = threading.Event()
+startup = StartupProfile()
 CLI_PATH = None
+CLI_VERSION = None
+executor = None
+executor_settings = None
+executor_lock = threading.Lock()
+warm_up_thread = None
 
 # --- Helper Functions ---
+cli_locator = CliLocator(CLI_CACHE_PATH)
+
 def find_cli_path():
-    global CLI_PATH
-    os_name = 'windows' if sys.platform == 'win32' else ('darwin' if sys.platform == 'darwin' else 'linux')
-    machine = platform.machine().lower()
-    arch_name = 'arm64' if 'arm64' in machine or 'aarch64' in machine else 'amd64'
-    cli_filename = f'wakatime-cli-{os_name}-{arch_name}'
-    if os_name == 'windows': cli_filename += '.exe'
-    home_dir = str(Path.home())
-    locations_to_check = [os.path.join(home_dir, '.wakatime', cli_filename), os.path.join(home_dir, cli_filename)]
-    for path in locations_to_check:
-        if os.path.exists(path):
-            CLI_PATH = path
-            return CLI_PATH
-    return None
+    # Checked against the cache with a single stat; only a changed or missing CLI triggers a new search.
+    global CLI_PATH, CLI_VERSION
+    install = cli_locator.locate()
+    if install is None: return None
+    CLI_PATH, CLI_VERSION = install.path, install.version
+    return CLI_PATH
+
+def make_updater():
+    settings = wakatime_config.settings
+    return CliUpdater(CLI_INSTALL_DIR, timeout=CLI_TIMEOUT, proxy=settings.proxy, verify=not settings.no_ssl_verify,
+                      stop_event=stop_event)
+
+def install_cli(update=False):
+    # Downloads wakatime-cli, or with update=True replaces the one we manage when a newer release exists.
+    # Runs on the warm-up thread; returns True when a new binary was installed.
+    updater = make_updater()
+    if update and (CLI_PATH != updater.binary_path or not updater.check_due()): return False
+    try:
+        installed = updater.update(CLI_VERSION if update else None)
+    except Exception as e:
+        logger.warning('Could not download wakatime-cli: %s', e)
+        return False
+    if not installed: return False
+    cli_locator.invalidate()
+    return find_cli_path() is not None
 
 def get_wakatime_config_path(): 
     return os.path.join(str(Path.home()), '.wakatime.cfg')
 
-def get_config_encoding(config_path):
+wakatime_config = ConfigService(get_wakatime_config_path(), CONFIG_SECTION, check_interval=CONFIG_CHECK_INTERVAL)
+
+def log_to_console(message, level):
+    # Only warnings and errors reach Fusion's Text Commands window, from ConsoleLogHandler on the UI thread.
+    app.log(message, adsk.core.LogLevels.ErrorLogLevel if level > WARNING else adsk.core.LogLevels.WarningLogLevel)
+
+def apply_config(settings):
+    # Runs whenever ~/.wakatime.cfg changes. Add-in specific settings live in its [fusion360] section.
+    metrics.enabled = settings.metrics
+    logger.configure(level=DEBUG if settings.debug else INFO)
+    activity_tracker.idle_timeout = settings.idle_timeout
+    # The rate limiter, classifier and entity resolver are used by the event handlers, so they are updated
+    # on the UI thread.
+    app.fireCustomEvent(CONFIG_CHANGED_EVENT_ID)
+    compactor.epsilon = settings.compaction_epsilon
+    # The executor bakes the key, server and proxy into its session, so a change to them takes a new one.
+    if executor is not None and transport_settings(settings) != executor_settings: swap_executor()
+    # A fixed API key or config is worth trying right away.
+    breaker.reset()
+
+wakatime_config.on_change(apply_config)
+
+def log_current_config():
+    settings = wakatime_config.settings
+    logger.info("--- WakaTime Configuration ---")
+    api_key = settings.api_key or "Not found"
+    logger.info("API Key: %s", f'{api_key[:4]}...{api_key[-4:]}' if len(api_key) > 8 else 'Set, but too short.')
+    logger.info("API URL: %s", settings.api_url or 'Default (WakaTime.com)')
+    logger.info("Heartbeat rate limit: %ss", settings.heartbeat_rate_limit_seconds)
+    logger.info("----------------------------")
+
+def transport_settings(settings):
+    return settings.transport, settings.api_key, settings.api_url, settings.proxy, settings.no_ssl_verify
+
+def make_executor():
+    # [fusion360] transport = http posts heartbeats with requests, falling back to the CLI.
+    global executor_settings
+    cli_executor = create_executor(
+        'cli', cli=CLI_PATH, plugin=PLUGIN, timeout=CLI_TIMEOUT, max_concurrency=CLI_CONCURRENCY
+    )
+    settings = wakatime_config.settings
+    executor_settings = transport_settings(settings)
+    if settings.transport == 'cli': return cli_executor
     try:
-        with open(config_path, 'rb') as f: raw_data = f.read()
-        result = chardet.detect(raw_data)
-        return result['encoding'] if result['encoding'] else 'utf-8'
+        return create_executor(
+            settings.transport, api_key=settings.api_key, plugin=PLUGIN, api_url=settings.api_url,
+            timeout=CLI_TIMEOUT, max_concurrency=CLI_CONCURRENCY, fallback=cli_executor,
+            proxy=settings.proxy, verify=not settings.no_ssl_verify
+        )
     except Exception as e:
-        app.log(f"Config encoding detection failed: {e}")
-        return 'utf-8'
+        logger.warning('Could not set up the configured transport, using wakatime-cli: %s', e)
+        return cli_executor
 
-def log_current_config():
-    config_file = get_wakatime_config_path()
-    app.log("--- WakaTime Configuration ---")
+def swap_executor():
+    # Runs on the config timer's thread. The dispatcher reads `executor` for every batch, so the next
+    # batch goes through the new one; a batch already in flight finishes on the old one first.
+    global executor, executor_settings
+    previous_settings = executor_settings
+    new_executor = make_executor()
     try:
-        parser = configparser.ConfigParser()
-        parser.read(config_file, encoding=get_config_encoding(config_file))
-        api_key = parser.get('settings', 'api_key', fallback="Not found")
-        app.log(f"API Key: {f'{api_key[:4]}...{api_key[-4:]}' if len(api_key) > 8 else 'Set, but too short.'}")
-        app.log(f"API URL: {parser.get('settings', 'api_url', fallback='Default (WakaTime.com)')}")
-    except Exception as e: app.log(f"Could not read config file: {e}")
-    app.log("----------------------------")
+        new_executor.start()
+    except Exception:
+        # Keep sending through the old executor; restoring its settings makes the next change try again.
+        executor_settings = previous_settings
+        logger.exception('Starting the heartbeat executor for the new connection settings failed; keeping %s.',
+                         executor.name)
+        return
+    old_executor, executor = executor, new_executor
+    logger.info('Connection settings changed; heartbeats now go through %s.', new_executor.name)
+    with executor_lock: old_executor.shutdown()
 
 # --- Heartbeat Sending ---
-def send_heartbeat(is_write=False):
-    global last_heartbeat_time
-    if not is_write and (time.time() - last_heartbeat_time < HEARTBEAT_INTERVAL): return
-    cli = CLI_PATH
+entity_resolver = EntityResolver(app)
+classifier = CategoryClassifier()
+rate_limiter = HeartbeatRateLimiter(HEARTBEAT_INTERVAL)
+
+def send_heartbeat(is_write=False, timestamp=None):
+    # Heartbeats sent before the warm-up finishes wait in the coordinator's queue.
+    if startup_failed.is_set(): return
     try:
         doc = app.activeDocument
         if not doc or not doc.isValid: return
     except RuntimeError: return
-    if not cli: return
 
-    app.log("--- Heartbeat Resolution Start ---")
-    project = "Fusion 360"
-    entity = doc.name if doc else "Untitled"
-    try:
-        if doc and doc.dataFile:
-            app.log("Document has a dataFile. Entity set to dataFile.name.")
-            entity = doc.dataFile.name
-            app.log("Checking for parentFolder...")
-            if doc.dataFile.parentFolder:
-                project = doc.dataFile.parentFolder.name
-                app.log(f"SUCCESS: Project set from parentFolder: {project}")
-            else:
-                app.log("parentFolder is None. Checking for activeProject.")
-                active_proj = app.data.activeProject
-                if active_proj:
-                    project = active_proj.name
-                    app.log(f"SUCCESS: Project set from activeProject: {project}")
-                else:
-                    app.log("WARNING: activeProject is also None. Using default project name.")
-        elif app.data.activeProject:
-            app.log("Document is unsaved. Checking for activeProject.")
-            active_proj = app.data.activeProject
-            if active_proj:
-                project = active_proj.name
-                app.log(f"SUCCESS: Project for unsaved file set from activeProject: {project}")
-            else:
-                app.log("WARNING: activeProject is None for unsaved file.")
-        else:
-            app.log("No dataFile and no activeProject. Using default names.")
-    except Exception as e:
-        app.log(f"CRITICAL ERROR during project/entity resolution: {e}")
-        app.log(traceback.format_exc())
-
-    app.log(f"--- Final Values: Project='{project}', Entity='{entity}' ---")
-    
-    command_list = [
-        cli, '--entity', entity, '--plugin', f'fusion-360-wakatime/{ADDIN_VERSION}',
-        '--project', project, '--language', 'Fusion360', '--category', 'designing'
-    ]
-    if is_write: command_list.append('--write')
-    elif not doc or not doc.dataFile: command_list.append('--is-unsaved-entity')
+    project, entity, is_unsaved, product, component = entity_resolver.resolve(doc)
+    if wakatime_config.settings.is_excluded(entity):
+        metrics.inc('heartbeats.excluded')
+        return
+    if component: entity = f'{entity}/{component}'
+    now = timestamp or time.time()
+    if not rate_limiter.allow((project, entity, is_write), now, force=is_write):
+        metrics.inc('heartbeats.rate_limited')
+        return
+    metrics.inc('heartbeats.queued')
+
+    category, language = classifier.kind(product)
+    coordinator.submit({
+        'entity': entity, 'project': project, 'language': language, 'category': category,
+        'is_write': is_write, 'is_unsaved_entity': not is_write and is_unsaved,
+        'timestamp': now
+    })
+
+activity_tracker = ActivityTracker(lambda timestamp: send_heartbeat(is_write=False, timestamp=timestamp))
+metrics.gauge('activity.events', lambda: activity_tracker.events)
+metrics.gauge('activity.flushes', lambda: activity_tracker.flushes)
+metrics.gauge('activity.active_seconds', lambda: round(activity_tracker.active_seconds))
+metrics.gauge('activity.idle_seconds', lambda: round(activity_tracker.idle_seconds))
+metrics.gauge('activity.active', lambda: activity_tracker.is_active)
+for index, kind in enumerate(activity.ACTIVITY_KINDS):
+    metrics.gauge(f'activity.events.{kind}', lambda index=index: activity_tracker.counts[index])
+flush_timer = PeriodicTimer(FLUSH_INTERVAL, lambda: app.fireCustomEvent(FLUSH_EVENT_ID))
+
+def flush_logs():
+    # The log file is written from the timer's thread; Fusion's console has to be written from the UI thread.
+    logger.flush()
+    if logger.console_pending: app.fireCustomEvent(LOG_CONSOLE_EVENT_ID)
+
+log_flush_timer = PeriodicTimer(LOG_FLUSH_INTERVAL, flush_logs)
+config_timer = PeriodicTimer(CONFIG_CHECK_INTERVAL, wakatime_config.refresh)
+
+def submit_heartbeats(heartbeats):
+    # Held while a batch is sent, so an executor replaced by swap_executor() is only shut down between batches.
+    with executor_lock: return executor.submit(heartbeats)
+
+def dispatch_heartbeats(heartbeats):
+    # Runs on the dispatcher's worker thread, never on the Fusion UI thread.
     try:
-        creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-        process = subprocess.Popen(
-            command_list, creationflags=creationflags,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        stdout, stderr = process.communicate(timeout=15)
-        if stderr: app.log(f"Heartbeat CLI stderr: {stderr.strip()}")
-        last_heartbeat_time = time.time()
-        app.log("--> Heartbeat command executed.")
+        return submit_heartbeats(heartbeats)
+    except DeliveryError:
+        raise
     except Exception as e:
-        app.log(f'Error executing heartbeat command: {e}')
+        logger.error('Error executing heartbeat command: %s', e)
+        return False
+
+stats_store = StatsStore(STATS_PATH, totals=today_totals)
+breaker = CircuitBreaker()
+compactor = HeartbeatCompactor()
+dispatcher = HeartbeatDispatcher(
+    dispatch_heartbeats, batch_window=BATCH_WINDOW, max_batch_size=MAX_BATCH_SIZE,
+    journal=HeartbeatJournal(JOURNAL_PATH), stats=stats_store, breaker=breaker, compactor=compactor
+)
+# With several Fusion 360 instances running, only the leading one runs the dispatcher; the others forward to it.
+coordinator = InstanceCoordinator(
+    LEADER_LOCK_PATH, leader_address(os.path.dirname(LEADER_LOCK_PATH)), deliver=dispatcher.submit,
+    on_leader=lambda: dispatcher.start(stop_event)
+)
+
+def refresh_totals():
+    # The leader's stats store holds every instance's time; the others read today's totals from it.
+    if not coordinator.is_leader: stats_store.refresh_totals()
+
+totals_timer = PeriodicTimer(TOTALS_REFRESH_INTERVAL, refresh_totals)
 
 # --- Event Handlers ---
 class CommandStartingHandler(adsk.core.ApplicationCommandEventHandler):
     def __init__(self): super().__init__()
+    @metrics.timed('handler.command_starting')
     def notify(self, args: adsk.core.ApplicationCommandEventArgs):
-        try: send_heartbeat(is_write=False)
-        except: app.log(traceback.format_exc())
+        try:
+            classifier.command(args.commandId)
+            activity_tracker.touch(activity.COMMAND)
+        except: logger.exception('Command starting handler failed.')
+class WorkspaceActivatedHandler(adsk.core.WorkspaceEventHandler):
+    def __init__(self): super().__init__()
+    @metrics.timed('handler.workspace_activated')
+    def notify(self, args: adsk.core.WorkspaceEventArgs):
+        try:
+            classifier.workspace(args.workspace.id)
+            entity_resolver.workspace_changed()
+        except: logger.exception('Workspace activated handler failed.')
+class SelectionHandler(adsk.core.ActiveSelectionEventHandler):
+    def __init__(self): super().__init__()
+    @metrics.timed('handler.selection_changed')
+    def notify(self, args: adsk.core.ActiveSelectionEventArgs):
+        try: activity_tracker.touch(activity.SELECTION)
+        except: logger.exception('Selection changed handler failed.')
+class CameraHandler(adsk.core.CameraEventHandler):
+    def __init__(self): super().__init__()
+    @metrics.timed('handler.camera_changed')
+    def notify(self, args: adsk.core.CameraEventArgs):
+        try: activity_tracker.touch(activity.CAMERA)
+        except: logger.exception('Camera changed handler failed.')
+class FlushActivityHandler(adsk.core.CustomEventHandler):
+    def __init__(self): super().__init__()
+    @metrics.timed('handler.flush_activity')
+    def notify(self, args: adsk.core.CustomEventArgs):
+        try: activity_tracker.flush()
+        except: logger.exception('Flush activity handler failed.')
 class SaveHandler(adsk.core.DocumentEventHandler):
     def __init__(self): super().__init__()
+    @metrics.timed('handler.document_saved')
     def notify(self, args: adsk.core.DocumentEventArgs):
-        try: send_heartbeat(is_write=True)
-        except: app.log(traceback.format_exc())
+        try:
+            entity_resolver.invalidate(args.document)
+            send_heartbeat(is_write=True)
+        except: logger.exception('Document saved handler failed.')
 class DocumentOpenedHandler(adsk.core.DocumentEventHandler):
     def __init__(self): super().__init__()
+    @metrics.timed('handler.document_opened')
     def notify(self, args: adsk.core.DocumentEventArgs):
-        try: send_heartbeat(is_write=False)
-        except: app.log(traceback.format_exc())
+        try:
+            entity_resolver.invalidate(args.document)
+            send_heartbeat(is_write=False)
+        except: logger.exception('Document opened handler failed.')
+class DocumentActivatedHandler(adsk.core.DocumentEventHandler):
+    def __init__(self): super().__init__()
+    @metrics.timed('handler.document_activated')
+    def notify(self, args: adsk.core.DocumentEventArgs):
+        try:
+            entity_resolver.invalidate(args.document)
+            activity_tracker.touch(activity.DOCUMENT)
+        except: logger.exception('Document activated handler failed.')
+class ConsoleLogHandler(adsk.core.CustomEventHandler):
+    def __init__(self): super().__init__()
+    def notify(self, args: adsk.core.CustomEventArgs):
+        logger.flush_console()
+class ConfigChangedHandler(adsk.core.CustomEventHandler):
+    def __init__(self): super().__init__()
+    def notify(self, args: adsk.core.CustomEventArgs):
+        try:
+            settings = wakatime_config.settings
+            if settings.heartbeat_rate_limit_seconds != rate_limiter.interval:
+                # Times recorded under the old interval say nothing about the new one.
+                rate_limiter.interval = settings.heartbeat_rate_limit_seconds
+                rate_limiter.reset()
+            classifier.load(settings.category_rules)
+            entity_resolver.component_paths = settings.component_entities
+        except: logger.exception('Config changed handler failed.')
+class StartupFailedHandler(adsk.core.CustomEventHandler):
+    def __init__(self): super().__init__()
+    def notify(self, args: adsk.core.CustomEventArgs):
+        try: ui.messageBox(f"{ADDIN_NAME} Error: {args.additionalInfo}")
+        except: logger.exception('Startup failed handler failed.')
 handlers = []
 
+def add_handler(event, handler):
+    event.add(handler)
+    handlers.append((event, handler))
+
+def add_custom_event(event_id, handler):
+    app.unregisterCustomEvent(event_id)
+    add_handler(app.registerCustomEvent(event_id), handler)
+
+# --- Background Warm-up ---
+def fail_startup(message):
+    # Message boxes have to be shown from the UI thread, so hand the error over to it.
+    startup_failed.set()
+    logger.error('%s', message)
+    app.fireCustomEvent(STARTUP_FAILED_EVENT_ID, message)
+
+def warm_up():
+    # Everything run() does not need to register its handlers, off Fusion's main thread.
+    global executor
+    try:
+        with startup.phase('config'):
+            if not os.path.exists(get_wakatime_config_path()):
+                return fail_startup("WakaTime config file (~/.wakatime.cfg) not found.")
+            wakatime_config.refresh(force=True)
+        with startup.phase('cli_discovery'): found = find_cli_path()
+        if not found:
+            with startup.phase('cli_download'): found = install_cli()
+            if not found and not stop_event.is_set():
+                return fail_startup("WakaTime command-line tool not found and could not be downloaded.")
+        if stop_event.is_set(): return
+        with startup.phase('executor'):
+            executor = make_executor()
+            executor.start()
+        with startup.phase('coordinator'): coordinator.start(stop_event)
+        logger.info('Using CLI %s from: %s', CLI_VERSION, CLI_PATH)
+        log_current_config()
+        startup.report_background()
+        if wakatime_config.settings.auto_update: install_cli(update=True)
+    except:
+        logger.exception('Add-in warm-up failed.')
+        fail_startup("Starting the add-in failed, see the log for details.")
+
+startup.record('import', import_started)
+
 # --- Add-in Main Functions ---
 def run(context):
+    global warm_up_thread
     try:
-        if not os.path.exists(get_wakatime_config_path()):
-            ui.messageBox(f"{ADDIN_NAME} Error: WakaTime config file (~/.wakatime.cfg) not found.")
-            return
-        if not find_cli_path():
-            ui.messageBox(f"{ADDIN_NAME} Error: WakaTime command-line tool not found.")
-            return
-        on_command_starting = CommandStartingHandler()
-        ui.commandStarting.add(on_command_starting)
-        handlers.append((ui.commandStarting, on_command_starting))
-        on_save = SaveHandler()
-        app.documentSaved.add(on_save)
-        handlers.append((app.documentSaved, on_save))
-        on_document_opened = DocumentOpenedHandler()
-        app.documentOpened.add(on_document_opened)
-        handlers.append((app.documentOpened, on_document_opened))
-        app.log(f'{ADDIN_NAME} v{ADDIN_VERSION} started successfully.')
-        app.log(f"Using CLI from: {CLI_PATH}")
-        log_current_config()
+        startup.begin()
+        stop_event.clear()
+        startup_failed.clear()
+        with startup.phase('logger'): logger.configure(path=LOG_PATH, console=log_to_console)
+        with startup.phase('handlers'):
+            add_handler(ui.commandStarting, CommandStartingHandler())
+            add_handler(ui.workspaceActivated, WorkspaceActivatedHandler())
+            add_handler(ui.activeSelectionChanged, SelectionHandler())
+            add_handler(app.cameraChanged, CameraHandler())
+            add_handler(app.documentSaved, SaveHandler())
+            add_handler(app.documentOpened, DocumentOpenedHandler())
+            add_handler(app.documentActivated, DocumentActivatedHandler())
+            add_custom_event(FLUSH_EVENT_ID, FlushActivityHandler())
+            add_custom_event(STARTUP_FAILED_EVENT_ID, StartupFailedHandler())
+            add_custom_event(LOG_CONSOLE_EVENT_ID, ConsoleLogHandler())
+            add_custom_event(CONFIG_CHANGED_EVENT_ID, ConfigChangedHandler())
+        with startup.phase('timers'):
+            flush_timer.start(stop_event)
+            log_flush_timer.start(stop_event)
+            config_timer.start(stop_event)
+            totals_timer.start(stop_event)
+        with startup.phase('commands'):
+            commands.start(STATS_PATH, submit_heartbeats, lambda: executor is not None)
+        with startup.phase('warm_up_thread'):
+            warm_up_thread = threading.Thread(target=warm_up, name='WakaTimeWarmUp', daemon=True)
+            warm_up_thread.start()
+        logger.info('%s v%s started successfully.', ADDIN_NAME, ADDIN_VERSION)
+        startup.report_main_thread()
     except:
-        app.log(traceback.format_exc())
+        logger.exception('Starting the add-in failed.')
 def stop(context):
     try:
         for event, handler in handlers: event.remove(handler)
+        handlers.clear()
+        commands.stop()
         stop_event.set()
-        app.log(f'{ADDIN_NAME} stopped.')
+        if warm_up_thread: warm_up_thread.join(STOP_TIMEOUT)
+        activity_tracker.flush()
+        rate_limiter.reset()
+        coordinator.stop(timeout=STOP_TIMEOUT)
+        dispatcher.stop(timeout=STOP_TIMEOUT)
+        coordinator.release()
+        flush_timer.join(FLUSH_INTERVAL)
+        app.unregisterCustomEvent(FLUSH_EVENT_ID)
+        app.unregisterCustomEvent(STARTUP_FAILED_EVENT_ID)
+        log_flush_timer.join(LOG_FLUSH_INTERVAL)
+        app.unregisterCustomEvent(LOG_CONSOLE_EVENT_ID)
+        config_timer.join(CONFIG_CHECK_INTERVAL)
+        app.unregisterCustomEvent(CONFIG_CHANGED_EVENT_ID)
+        totals_timer.join(TOTALS_REFRESH_INTERVAL)
+        if executor:
+            logger.info('Heartbeat executor stats: %s', dict(executor.stats(), queue_depth=dispatcher.queue_depth))
+            executor.shutdown()
+        logger.info('%s stopped.', ADDIN_NAME)
     except:
-        app.log(traceback.format_exc())
+        logger.exception('Stopping the add-in failed.')
+    # stop() runs on the UI thread, so whatever is left can go to the console directly.
+    logger.flush_console()
+    logger.flush()
@@ -0,0 +1,199 @@
+"""Exercises the HTTP heartbeat executor against a local stand-in for the heartbeats API.
+
+Starts bench/fakes/api_server.py, points HttpExecutor at it and checks:
+
+  bulk_auth        heartbeats are posted to the bulk endpoint with the key as Basic auth
+  chunking         a batch is split into posts of at most 25 heartbeats
+  auth_failure     401 and 403 are raised as auth failures
+  fallback         429, 5xx and an unreachable API hand the chunk to the fallback executor;
+                   without one they are raised as outages
+  partial_failure  a chunk failing after earlier ones were accepted raises only the rest as
+                   unsent, and the dispatcher sends only that part again
+
+    python bench/api_check.py [--json]
+
+Exits with status 1 if any check fails.
+"""
+import base64
+import contextlib
+import os
+import sys
+import threading
+import time
+
+import run_bench
+
+sys.path.insert(0, run_bench.FAKES_DIR)
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib'))
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib', 'requests', 'src'))
+
+from api_server import BULK_PATH, ApiServer
+from wakatimeUtils import (
+    BULK_LIMIT, FAILURE_AUTH, FAILURE_OFFLINE, DeliveryError, HeartbeatDispatcher, HeartbeatExecutor, api_heartbeat,
+    create_executor
+)
+
+API_KEY = 'waka_00000000-0000-0000-0000-000000000000'
+
+
+class RecordingExecutor(HeartbeatExecutor):
+    """A fallback that accepts every batch and keeps it."""
+
+    name = 'recording'
+
+    def __init__(self):
+        self.batches = []
+
+    def submit(self, heartbeats: list) -> bool:
+        self.batches.append(heartbeats)
+        return True
+
+
+def heartbeats(count: int) -> list:
+    now = time.time()
+    return [{'entity': f'Design {i}', 'project': 'Bench', 'language': 'Fusion360', 'category': 'designing',
+             'is_write': i % 2 == 0, 'is_unsaved_entity': False, 'timestamp': now + i} for i in range(count)]
+
+
+def http_executor(server: ApiServer, fallback: HeartbeatExecutor = None) -> HeartbeatExecutor:
+    executor = create_executor('http', api_key=API_KEY, plugin='bench', api_url=server.url, timeout=5,
+                               fallback=fallback)
+    executor.start()
+    return executor
+
+
+def wait_for_requests(server: ApiServer, count: int, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while len(server.requests) < count and time.monotonic() < deadline: time.sleep(0.01)
+
+
+def expect_failure(executor: HeartbeatExecutor, batch: list, kind: str):
+    try:
+        executor.submit(batch)
+    except DeliveryError as e:
+        assert e.kind == kind, f'{e.kind} instead of {kind}'
+    else:
+        raise AssertionError(f'no {kind} failure raised')
+
+
+@run_bench.check
+def bulk_auth(server):
+    batch = heartbeats(3)
+    executor = http_executor(server)
+    try:
+        assert executor.submit(batch)
+    finally:
+        executor.shutdown()
+    assert len(server.requests) == 1, server.requests
+    path, authorization, body = server.requests[0]
+    assert path == BULK_PATH, path
+    assert authorization == 'Basic ' + base64.b64encode(API_KEY.encode()).decode(), authorization
+    assert body == [api_heartbeat(heartbeat) for heartbeat in batch], body
+
+
+@run_bench.check
+def chunking(server):
+    executor = http_executor(server)
+    try:
+        assert executor.submit(heartbeats(2 * BULK_LIMIT + 10))
+    finally:
+        executor.shutdown()
+    sizes = [len(body) for _, _, body in server.requests]
+    assert sizes == [BULK_LIMIT, BULK_LIMIT, 10], sizes
+    assert executor.stats()['posts'] == 3
+
+
+@run_bench.check
+def auth_failure(server):
+    executor = http_executor(server)
+    try:
+        for status in (401, 403):
+            server.statuses.append(status)
+            expect_failure(executor, heartbeats(1), FAILURE_AUTH)
+    finally:
+        executor.shutdown()
+
+
+@run_bench.check
+def fallback(server):
+    recording = RecordingExecutor()
+    executor = http_executor(server, fallback=recording)
+    try:
+        for status in (429, 500, 503):
+            # Only the first chunk fails: it goes to the fallback, the second is still posted.
+            server.statuses.append(status)
+            batch = heartbeats(BULK_LIMIT + 1)
+            assert executor.submit(batch)
+            assert recording.batches[-1] == batch[:BULK_LIMIT], f'status {status}: wrong chunk handed over'
+        assert len(recording.batches) == 3 and len(server.requests) == 6
+        assert executor.stats()['fallbacks'] == 3
+    finally:
+        executor.shutdown()
+
+    executor = http_executor(server)
+    try:
+        server.statuses.append(502)
+        expect_failure(executor, heartbeats(1), FAILURE_OFFLINE)
+    finally:
+        executor.shutdown()
+
+    url = server.url
+    server.stop()
+    executor = create_executor('http', api_key=API_KEY, plugin='bench', api_url=url, timeout=2, fallback=recording)
+    executor.start()
+    try:
+        assert executor.submit(heartbeats(1)) and len(recording.batches) == 4, 'an unreachable API was not a fallback'
+    finally:
+        executor.shutdown()
+
+
+@run_bench.check
+def partial_failure(server):
+    batch = heartbeats(2 * BULK_LIMIT + 10)
+    executor = http_executor(server)
+    try:
+        server.statuses.extend([201, 503])
+        try:
+            executor.submit(batch)
+        except DeliveryError as e:
+            assert e.unsent == batch[BULK_LIMIT:], f'{len(e.unsent or ())} unsent instead of {len(batch) - BULK_LIMIT}'
+        else:
+            raise AssertionError('no failure raised')
+
+        # Through the dispatcher: the accepted chunk is not sent again once the rest goes out.
+        del server.requests[:]
+        server.statuses.extend([201, 503])
+        stop_event = threading.Event()
+        dispatcher = HeartbeatDispatcher(executor.submit, max_batch_size=len(batch))
+        dispatcher.start(stop_event)
+        for heartbeat in batch: dispatcher.submit(heartbeat)
+        wait_for_requests(server, 2)
+        # Held heartbeats are sent after the next batch that goes through.
+        last = heartbeats(1)[0]
+        dispatcher.submit(dict(last, timestamp=last['timestamp'] + len(batch)))
+        wait_for_requests(server, 5)
+        dispatcher.stop(timeout=5)
+    finally:
+        executor.shutdown()
+    accepted = [heartbeat['time'] for i, (_, _, body) in enumerate(server.requests) if i != 1 for heartbeat in body]
+    assert sorted(accepted) == sorted(set(accepted)), 'accepted heartbeats were sent again'
+    assert len(accepted) == len(batch) + 1, f'{len(accepted)} of {len(batch) + 1} heartbeats accepted'
+
+
+@contextlib.contextmanager
+def api_server(directory: str, details: dict):
+    server = ApiServer().start()
+    try:
+        yield (server,)
+    finally:
+        # The fallback check stops its server early.
+        if server.socket.fileno() != -1: server.stop()
+        details['requests'] = len(server.requests)
+
+
+def main():
+    run_bench.run_checks(run_bench.check_parser(__doc__).parse_args().json, fixture=api_server)
+
+
+if __name__ == '__main__':
+    main()
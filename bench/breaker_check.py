@@ -0,0 +1,164 @@
+"""Exercises the dispatcher's circuit breaker against the stand-in wakatime-cli.
+
+Runs the real HeartbeatDispatcher, HeartbeatJournal and CliExecutor with the
+fake CLI from bench/fakes, whose exit code is switched through
+$FAKE_WAKATIME_EXIT, and checks:
+
+  backoff            delays double per failed probe, are capped and jittered
+  outage             after the threshold, heartbeats cost no CLI spawns
+  bad_key            an auth error opens the breaker at once; reset() closes it
+  timeout            a CLI that hangs counts as an outage
+  recovery           once a probe succeeds, every held heartbeat is sent in batches
+
+    python bench/breaker_check.py [--json]
+
+Exits with status 1 if any check fails.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+import run_bench
+
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib'))
+
+from wakatimeUtils import (
+    CLOSED, FAILURE_AUTH, FAILURE_OFFLINE, OPEN, CircuitBreaker, HeartbeatDispatcher, HeartbeatJournal,
+    create_executor
+)
+
+BATCH_SIZE = 10
+
+class Harness:
+    """A dispatcher wired to the fake CLI, with a fast breaker and a journal in a temporary directory."""
+
+    def __init__(self, directory: str, exit_code: int = 0, delay: float = 0, timeout: float = 5,
+                 base_delay: float = 0.3):
+        self.log_path = os.path.join(directory, 'cli-invocations.jsonl')
+        os.environ.update(FAKE_WAKATIME_LOG=self.log_path, FAKE_WAKATIME_EXIT=str(exit_code),
+                          FAKE_WAKATIME_DELAY=str(delay))
+        self.executor = create_executor('cli', cli=run_bench.FAKE_CLI, plugin='bench', timeout=timeout)
+        self.breaker = CircuitBreaker(failure_threshold=3, base_delay=base_delay, max_delay=2, jitter=0.1)
+        self.journal = HeartbeatJournal(os.path.join(directory, 'journal.db'))
+        self.dispatcher = HeartbeatDispatcher(self.executor.submit, max_batch_size=BATCH_SIZE, journal=self.journal,
+                                              breaker=self.breaker)
+        self.stop_event = threading.Event()
+        self.count = 0
+
+    def __enter__(self):
+        self.dispatcher.start(self.stop_event)
+        return self
+
+    def __exit__(self, *exc):
+        self.dispatcher.stop(timeout=10)
+
+    def set_exit(self, code: int):
+        os.environ['FAKE_WAKATIME_EXIT'] = str(code)
+
+    def submit(self, count: int = 1, wait: float = 0.2):
+        for _ in range(count):
+            self.count += 1
+            self.dispatcher.submit({'entity': f'Design {self.count}', 'project': 'Bench', 'language': 'Fusion360',
+                                    'category': 'designing', 'is_write': False, 'timestamp': time.time()})
+        time.sleep(wait)
+
+    def invocations(self) -> list:
+        if not os.path.exists(self.log_path): return []
+        with open(self.log_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def pending(self) -> int:
+        # The journal's connection belongs to the worker thread, so read it with a second one.
+        check_journal = HeartbeatJournal(self.journal.path)
+        check_journal.open()
+        try: return check_journal.pending_count()
+        finally: check_journal.close()
+
+
+def wait_for(condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline: raise AssertionError('timed out waiting')
+        time.sleep(0.05)
+
+
+@run_bench.check
+def backoff(directory):
+    now = [0.0]
+    rolls = iter([0.0, 1.0, 0.5, 0.5, 0.5, 0.5])
+    breaker = CircuitBreaker(failure_threshold=2, base_delay=10, max_delay=60, jitter=0.2,
+                             clock=lambda: now[0], rng=lambda: next(rolls))
+    breaker.record_failure(FAILURE_OFFLINE)
+    assert breaker.state == CLOSED and breaker.allow()
+    delays = []
+    breaker.record_failure(FAILURE_OFFLINE)
+    for _ in range(5):
+        assert breaker.state == OPEN and not breaker.allow()
+        delays.append(round(breaker.retry_in, 6))
+        now[0] += breaker.retry_in
+        assert breaker.allow() and not breaker.allow(), 'more than one probe let through'
+        breaker.record_failure(FAILURE_OFFLINE)
+    assert delays == [8, 24, 40, 60, 60], delays
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+@run_bench.check
+def outage(directory):
+    with Harness(directory, exit_code=1, base_delay=5) as harness:
+        for _ in range(3): harness.submit()
+        assert harness.breaker.state == OPEN
+        spawned = len(harness.invocations())
+        assert spawned == 3, f'{spawned} spawns before opening'
+        harness.submit(50, wait=0)
+        for _ in range(5): harness.submit(wait=0.02)
+        time.sleep(0.1)
+        assert len(harness.invocations()) == spawned, 'the CLI was spawned while the breaker was open'
+        assert harness.pending() == harness.count, 'held heartbeats were not kept in the journal'
+
+
+@run_bench.check
+def bad_key(directory):
+    with Harness(directory, exit_code=104) as harness:
+        harness.submit()
+        assert harness.breaker.state == OPEN and harness.breaker.last_failure == FAILURE_AUTH
+        assert harness.breaker.retry_in > 1, 'an auth error should back off for long'
+        harness.submit(5)
+        assert len(harness.invocations()) == 1
+        harness.set_exit(0)
+        harness.breaker.reset()
+        harness.submit()
+        wait_for(lambda: harness.pending() == 0)
+        assert sum(entry['heartbeats'] for entry in harness.invocations()) == 1 + harness.count
+
+
+@run_bench.check
+def timeout(directory):
+    with Harness(directory, delay=1, timeout=0.2, base_delay=5) as harness:
+        for _ in range(3): harness.submit(wait=0.5)
+        assert harness.breaker.state == OPEN and harness.breaker.last_failure == FAILURE_OFFLINE
+
+
+@run_bench.check
+def recovery(directory):
+    with Harness(directory, exit_code=1) as harness:
+        for _ in range(3): harness.submit()
+        harness.submit(45, wait=0)
+        failed_spawns = len(harness.invocations())
+        harness.set_exit(0)
+        # Nothing new is submitted: the worker probes on its own once the backoff has passed.
+        wait_for(lambda: harness.pending() == 0)
+        delivered = harness.invocations()[failed_spawns:]
+        assert sum(entry['heartbeats'] for entry in delivered) == harness.count, 'held heartbeats were lost'
+        assert len(delivered) == -(-harness.count // BATCH_SIZE), f'{len(delivered)} spawns to drain'
+        assert harness.breaker.state == CLOSED
+
+
+def main():
+    run_bench.run_checks(run_bench.check_parser(__doc__).parse_args().json)
+
+
+if __name__ == '__main__':
+    main()
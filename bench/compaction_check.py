@@ -0,0 +1,150 @@
+"""Checks that heartbeat compaction merges storms without changing computed durations.
+
+  durations_unchanged  property check over --cases random heartbeat streams (bursts, exact
+                       duplicates, several designs and categories, writes, long gaps): the
+                       per-key durations WakaTime would compute are identical before and
+                       after compaction, for every timeout of at least the compaction epsilon
+  stats_store          the same streams recorded in two StatsStores, one compacted: daily
+                       totals match to the microsecond
+  storms               a save storm and a command storm shrink to a handful of heartbeats
+  dispatcher           a burst through HeartbeatDispatcher is sent compacted, and the
+                       compaction.ratio metric reports it
+
+    python bench/compaction_check.py [--cases 500] [--seed 1] [--json]
+
+Exits with status 1 if any check fails.
+"""
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import run_bench
+
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib'))
+
+from wakatimeUtils import DEFAULT_COMPACTION_EPSILON, HeartbeatCompactor, HeartbeatDispatcher, StatsStore, metrics
+
+TIMEOUTS = (DEFAULT_COMPACTION_EPSILON, 2 * DEFAULT_COMPACTION_EPSILON, 15 * 60)
+
+def key(heartbeat: dict) -> tuple:
+    return tuple(sorted((name, value) for name, value in heartbeat.items() if name != 'timestamp'))
+
+
+def durations(heartbeats: list, timeout: float) -> dict:
+    """Seconds per heartbeat key, as WakaTime computes them: each gap up to `timeout` goes to the earlier heartbeat."""
+    totals = defaultdict(float)
+    ordered = sorted(heartbeats, key=lambda heartbeat: heartbeat['timestamp'])
+    for previous, current in zip(ordered, ordered[1:]):
+        gap = current['timestamp'] - previous['timestamp']
+        if gap <= timeout: totals[key(previous)] += gap
+    return totals
+
+
+def same_totals(expected: dict, actual: dict) -> bool:
+    # A key credited only zero-length gaps may be missing from one side.
+    return all(abs(expected.get(name, 0) - actual.get(name, 0)) < 1e-6 for name in set(expected) | set(actual))
+
+
+def random_stream(rng: random.Random) -> list:
+    # Mostly short gaps with bursts of saves and the odd pause longer than any timeout.
+    entities = [f'Part {n}' for n in range(rng.randint(1, 4))]
+    categories = [('designing', 'Fusion360'), ('designing', 'Fusion360 Sketch'), ('building', 'Fusion360 CAM')]
+    now = 1_700_000_000.0 + rng.random() * 86400
+    heartbeats = []
+    for _ in range(rng.randint(1, 300)):
+        roll = rng.random()
+        if roll < 0.3: now += 0
+        elif roll < 0.8: now += rng.random() * 5
+        elif roll < 0.97: now += rng.random() * 300
+        else: now += rng.random() * 7200
+        category, language = rng.choice(categories)
+        heartbeats.append({
+            'entity': rng.choice(entities), 'project': 'Bench', 'language': language, 'category': category,
+            'is_write': rng.random() < 0.3, 'timestamp': round(now, rng.choice((0, 3, 6))),
+        })
+    # Batches are not always in time order once other instances forward theirs.
+    if rng.random() < 0.2: rng.shuffle(heartbeats)
+    return heartbeats
+
+
+@run_bench.check
+def durations_unchanged(directory, cases, seed):
+    rng = random.Random(seed)
+    compactor = HeartbeatCompactor()
+    for case in range(cases):
+        heartbeats = random_stream(rng)
+        compacted = compactor.compact(heartbeats)
+        assert len(compacted) <= len(heartbeats)
+        for timeout in TIMEOUTS:
+            expected, actual = durations(heartbeats, timeout), durations(compacted, timeout)
+            assert same_totals(expected, actual), f'case {case}, timeout {timeout}: {expected} != {actual}'
+        assert {key(heartbeat) for heartbeat in compacted} == {key(heartbeat) for heartbeat in heartbeats}
+        assert min(h['timestamp'] for h in compacted) == min(h['timestamp'] for h in heartbeats)
+        assert max(h['timestamp'] for h in compacted) == max(h['timestamp'] for h in heartbeats)
+
+
+@run_bench.check
+def stats_store(directory, cases, seed):
+    rng = random.Random(seed + 1)
+    compactor = HeartbeatCompactor()
+    for case in range(min(cases, 50)):
+        heartbeats = random_stream(rng)
+        totals = []
+        for name, batch in (('full', heartbeats), ('compacted', compactor.compact(heartbeats))):
+            store = StatsStore(os.path.join(directory, f'{case}-{name}.db'))
+            store.open()
+            try:
+                store.record(batch)
+                first = datetime.date.fromtimestamp(min(h['timestamp'] for h in heartbeats))
+                last = datetime.date.fromtimestamp(max(h['timestamp'] for h in heartbeats))
+                totals.append(dict(store.daily_totals(first, last)))
+            finally:
+                store.close()
+        assert same_totals(*totals), f'case {case}: {totals[0]} != {totals[1]}'
+
+
+@run_bench.check
+def storms(directory, cases, seed):
+    compactor = HeartbeatCompactor()
+    now = time.time()
+    save_storm = [{'entity': 'Housing', 'project': 'Enclosures', 'language': 'Fusion360', 'category': 'designing',
+                   'is_write': True, 'timestamp': now + i * 0.2} for i in range(50)]
+    assert len(compactor.compact(save_storm)) == 2
+    command_storm = [{'entity': 'Bracket', 'project': 'Brackets', 'language': 'Fusion360 Sketch' if i % 20 < 10
+                      else 'Fusion360', 'category': 'designing', 'is_write': False, 'timestamp': now + i * 0.1}
+                     for i in range(100)]
+    assert len(compactor.compact(command_storm)) == 20, 'each run of 10 should keep its first and last'
+    assert len(compactor.compact(save_storm * 3)) == 2, 'exact duplicates should merge'
+
+
+@run_bench.check
+def dispatcher(directory, cases, seed):
+    sent = []
+    compactor = HeartbeatCompactor()
+    stop_event = threading.Event()
+    worker = HeartbeatDispatcher(lambda batch: sent.append(batch) or True, batch_window=0.5, max_batch_size=100,
+                                 compactor=compactor)
+    worker.start(stop_event)
+    now = time.time()
+    for i in range(60):
+        worker.submit({'entity': 'Housing', 'project': 'Enclosures', 'language': 'Fusion360',
+                       'category': 'designing', 'is_write': True, 'timestamp': now + i * 0.01})
+    worker.stop(timeout=5)
+    assert [len(batch) for batch in sent] == [2], [len(batch) for batch in sent]
+    assert metrics.snapshot()['compaction.ratio'] == 30.0, metrics.snapshot()['compaction.ratio']
+
+
+def main():
+    parser = run_bench.check_parser(__doc__)
+    parser.add_argument('--cases', type=int, default=500, help='Random heartbeat streams to check.')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the random streams.')
+    args = parser.parse_args()
+    run_bench.run_checks(args.json, args.cases, args.seed)
+
+
+if __name__ == '__main__':
+    main()
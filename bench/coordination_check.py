@@ -0,0 +1,218 @@
+"""Checks that concurrent add-in instances elect one leader and share its dispatcher.
+
+  single_leader   three coordinators in one process: one leads, the others forward to it
+  failover        the leader stops: a follower takes over and nothing forwarded after that is lost
+  leader_crash    the leader reads a heartbeat and dies before delivering it: the follower
+                  still holds it, and delivers it once it takes over
+  follower_totals a follower's stats store, never opened, reloads today's totals from the file
+                  the leader's store records into, and reports only what moved
+  processes       several add-in processes sharing a home directory, each saving its own
+                  design: every heartbeat queued reaches the fake wakatime-cli, less those
+                  the leader's compactor merged, in fewer spawns than one per instance
+
+Coordinators talk over a Unix domain socket here (a named pipe on Windows).
+
+    python bench/coordination_check.py [--instances 3] [--json]
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import run_bench
+
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib'))
+
+from wakatimeUtils import FOLLOWER, LEADER, InstanceCoordinator, StatsStore, TodayTotals, leader_address
+
+SAVES_PER_INSTANCE = 5
+
+class Instance:
+    """An InstanceCoordinator that records what it was handed as leader."""
+
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        self.received = []
+        self.stop_event = threading.Event()
+        lock_path = os.path.join(directory, 'fusion360-leader.lock')
+        self.coordinator = InstanceCoordinator(lock_path, leader_address(directory), deliver=self.received.append,
+                                               retry_interval=0.1)
+        self.coordinator.start(self.stop_event)
+
+    def stop(self):
+        self.coordinator.stop(timeout=5)
+        self.coordinator.release()
+
+
+class CrashingLeader(InstanceCoordinator):
+    """Reads each forwarded heartbeat and drops the connection before delivering or acknowledging it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dropped = 0
+
+    def _receive(self, connection):
+        connection.recv_bytes()
+        self.dropped += 1
+        raise EOFError('crashed')
+
+
+def wait_for(condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline: raise AssertionError('timed out waiting')
+        time.sleep(0.02)
+
+
+def leaders(instances: list) -> list:
+    return [instance for instance in instances if instance.coordinator.role == LEADER]
+
+
+@run_bench.check
+def single_leader(directory, instance_count):
+    instances = [Instance(directory, f'instance-{i}') for i in range(instance_count)]
+    try:
+        wait_for(lambda: len(leaders(instances)) == 1)
+        for instance in instances:
+            for i in range(10): instance.coordinator.submit({'from': instance.name, 'n': i})
+        leader = leaders(instances)[0]
+        wait_for(lambda: len(leader.received) == 10 * instance_count)
+        assert len(leaders(instances)) == 1, 'more than one leader'
+        assert all(not instance.received for instance in instances if instance is not leader)
+    finally:
+        for instance in instances: instance.stop()
+
+
+@run_bench.check
+def failover(directory, instance_count):
+    instances = [Instance(directory, f'instance-{i}') for i in range(instance_count)]
+    try:
+        wait_for(lambda: len(leaders(instances)) == 1)
+        old_leader = leaders(instances)[0]
+        followers = [instance for instance in instances if instance is not old_leader]
+        wait_for(lambda: all(instance.coordinator.role != 'electing' for instance in followers))
+        old_leader.stop()
+        for instance in followers:
+            for i in range(10): instance.coordinator.submit({'from': instance.name, 'n': i})
+        wait_for(lambda: len(leaders(followers)) == 1)
+        new_leader = leaders(followers)[0]
+        wait_for(lambda: len(new_leader.received) == 10 * len(followers))
+    finally:
+        for instance in instances: instance.stop()
+
+
+@run_bench.check
+def leader_crash(directory, instance_count):
+    stop_event = threading.Event()
+    crashing = CrashingLeader(os.path.join(directory, 'fusion360-leader.lock'), leader_address(directory),
+                              deliver=lambda heartbeat: None, retry_interval=0.1)
+    crashing.start(stop_event)
+    follower = None
+    try:
+        wait_for(lambda: crashing.role == LEADER)
+        follower = Instance(directory, 'follower')
+        wait_for(lambda: follower.coordinator.role == FOLLOWER)
+        for i in range(5): follower.coordinator.submit({'from': follower.name, 'n': i})
+        wait_for(lambda: crashing.dropped >= 1)
+        crashing.stop(timeout=5)
+        crashing.release()
+        wait_for(lambda: len(follower.received) == 5)
+        assert [heartbeat['n'] for heartbeat in follower.received] == list(range(5)), follower.received
+    finally:
+        crashing.stop(timeout=5)
+        crashing.release()
+        if follower is not None: follower.stop()
+
+
+@run_bench.check
+def follower_totals(directory, instance_count):
+    path = os.path.join(directory, 'fusion360-stats.db')
+    leader = StatsStore(path, totals=TodayTotals())
+    follower = StatsStore(path, totals=TodayTotals())
+    follower.refresh_totals()
+    assert follower.totals.drain() == {}, 'totals loaded from a store that does not exist yet'
+    leader.open()
+    try:
+        now = time.time()
+        leader.record([{'entity': f'Design {i % 2}', 'project': f'Project {i % 2}', 'category': 'designing',
+                        'timestamp': now - 600 + i * 60} for i in range(10)])
+        follower.refresh_totals()
+        expected = leader.totals.snapshot()
+        delta = follower.totals.drain()
+        assert follower.totals.snapshot() == expected, f'{follower.totals.snapshot()} != {expected}'
+        assert delta['projects'] == expected['projects'] and delta['total'] == expected['total'], delta
+        follower.refresh_totals()
+        assert follower.totals.drain() == {}, 'an unchanged store reported changes'
+        leader.record([{'entity': 'Design 1', 'project': 'Project 1', 'category': 'designing', 'timestamp': now}])
+        follower.refresh_totals()
+        delta = follower.totals.drain()
+        assert set(delta['projects']) == {'Project 1'} and set(delta['entities']) == {'Design 1'}, delta
+        assert follower.totals.snapshot() == leader.totals.snapshot()
+    finally:
+        leader.close()
+
+
+@run_bench.check
+def processes(directory, instance_count):
+    import subprocess
+    with run_bench.bench_home() as env:
+        children = [
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', f'Design {i}',
+                              '--instances', str(instance_count)], env=env, stdout=subprocess.PIPE, text=True)
+            for i in range(instance_count)
+        ]
+        results = [json.loads(child.communicate(timeout=60)[0].strip().splitlines()[-1]) for child in children]
+        with open(env['FAKE_WAKATIME_LOG'], encoding='utf-8') as f:
+            invocations = [json.loads(line) for line in f]
+    assert [result['role'] for result in results].count(LEADER) >= 1, results
+    queued = sum(result['queued'] for result in results)
+    # A follower's saves can reach the leader as one run of identical heartbeats, which compaction cuts down.
+    merged = sum(result['merged'] for result in results)
+    heartbeats = sum(invocation['heartbeats'] for invocation in invocations)
+    assert heartbeats == queued - merged, f'{heartbeats} of {queued} heartbeats arrived, {merged} merged'
+    assert len(invocations) < instance_count, f'{len(invocations)} CLI spawns for {instance_count} instances'
+
+
+def run_child(name: str, instance_count: int) -> dict:
+    # One add-in instance: saves its design a few times while the others do the same.
+    sys.path.insert(0, run_bench.FAKES_DIR)
+    import adsk
+    addin = run_bench.load_addin()
+    app = adsk.core.Application.get()
+    driver = run_bench.Driver(adsk)
+    addin.run(None)
+    addin.warm_up_thread.join()
+    doc = driver.saved_document(name, 'Coordination')
+    app.open_document(doc)
+    wait_for(lambda: addin.coordinator.role != 'electing')
+    role = addin.coordinator.role
+    for _ in range(SAVES_PER_INSTANCE):
+        driver.fire(app.documentSaved, driver.document_args(doc))
+        time.sleep(0.05)
+    if role == LEADER:
+        # The leader stays up until the followers have forwarded everything.
+        received = addin.metrics.counter('coordinator.received')
+        wait_for(lambda: received.value >= (instance_count - 1) * SAVES_PER_INSTANCE, timeout=30)
+    addin.stop(None)
+    return {'instance': name, 'role': role, 'queued': addin.metrics.counter('heartbeats.queued').value,
+            'merged': addin.metrics.counter('compaction.merged').value}
+
+
+def main():
+    parser = run_bench.check_parser(__doc__)
+    parser.add_argument('--instances', type=int, default=3, help='Instances to run in each check.')
+    parser.add_argument('--child', metavar='DESIGN', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.instances)))
+        return
+    run_bench.run_checks(args.json, args.instances)
+
+
+if __name__ == '__main__':
+    main()
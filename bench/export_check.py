@@ -0,0 +1,171 @@
+"""Checks that the stats export and import stream, round-trip and batch correctly.
+
+  jsonl, csv       exports a stats database with --rows heartbeats, reads it back and
+                   compares; peak Python memory stays under a fixed bound however many
+                   rows there are
+  import_batches   re-submits an export: every heartbeat arrives, in full batches
+  import_cli       re-submits an export through the fake wakatime-cli: one spawn per batch
+  cancel           setting the stop event ends an export without leaving a file behind
+
+    python bench/export_check.py [--rows 200000] [--json]
+
+Exits with status 1 if any check fails.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+import run_bench
+
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib'))
+
+from wakatimeUtils import (
+    IMPORT_BATCH_SIZE, StatsStore, create_executor, export_stats, import_heartbeats, read_rows, sessions_path,
+    to_heartbeat
+)
+
+# Far less than the rows would take if they were ever all held at once.
+MAX_PEAK_BYTES = 8 * 1024 * 1024
+CLI_IMPORT_ROWS = 2500
+
+def make_store(directory: str, rows: int) -> str:
+    # Creates the schema through StatsStore, then inserts rows directly: recording them one by one
+    # would only measure session bookkeeping.
+    path = os.path.join(directory, 'stats.db')
+    store = StatsStore(path)
+    store.open()
+    store.close()
+    import sqlite3
+    db = sqlite3.connect(path)
+    rng = random.Random(rows)
+    started = time.time() - rows * 30
+
+    def heartbeats():
+        for i in range(rows):
+            yield (started + i * 30 + rng.random(), f'Project {i % 7}', f'Part {i % 113}', 'Fusion360',
+                   'designing', i % 10 == 0)
+
+    with db: db.executemany(
+        'INSERT INTO heartbeats (time, project, entity, language, category, is_write) VALUES (?, ?, ?, ?, ?, ?)',
+        heartbeats()
+    )
+    with db: db.executemany(
+        'INSERT INTO sessions (project, entity, category, start, end, heartbeats) VALUES (?, ?, ?, ?, ?, ?)',
+        ((f'Project {i % 7}', f'Part {i % 113}', 'designing', started + i * 600, started + i * 600 + 300, 10)
+         for i in range(rows // 20))
+    )
+    db.close()
+    return path
+
+
+def first_and_last(db_path: str) -> list:
+    import sqlite3
+    db = sqlite3.connect(db_path)
+    try:
+        return [db.execute(f'SELECT time, entity, is_write FROM heartbeats ORDER BY time {order} LIMIT 1').fetchone()
+                for order in ('ASC', 'DESC')]
+    finally:
+        db.close()
+
+
+def measured(func, *args, **kwargs):
+    """Runs func and returns (result, peak traced bytes)."""
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def round_trip(directory: str, rows: int, extension: str):
+    db_path = make_store(directory, rows)
+    path = os.path.join(directory, f'export.{extension}')
+    (heartbeats, sessions), peak = measured(export_stats, db_path, path)
+    assert (heartbeats, sessions) == (rows, rows // 20), (heartbeats, sessions)
+    assert peak < MAX_PEAK_BYTES, f'export peaked at {peak} bytes'
+    count, peak = measured(lambda: sum(1 for _ in read_rows(sessions_path(path))))
+    assert count == rows // 20
+    previous, count, first, last = None, 0, None, None
+    for row in read_rows(path):
+        heartbeat = to_heartbeat(row)
+        assert heartbeat is not None, row
+        assert previous is None or heartbeat['timestamp'] >= previous, 'rows out of order'
+        previous = heartbeat['timestamp']
+        first = first or heartbeat
+        last = heartbeat
+        count += 1
+    assert count == rows, f'{count} of {rows} rows read back'
+    expected = first_and_last(db_path)
+    actual = [(heartbeat['timestamp'], heartbeat['entity'], int(heartbeat['is_write'])) for heartbeat in (first, last)]
+    assert actual == [tuple(row) for row in expected], f'{actual} != {expected}'
+
+
+@run_bench.check
+def jsonl(directory, rows):
+    round_trip(directory, rows, 'jsonl')
+
+
+@run_bench.check
+def csv(directory, rows):
+    round_trip(directory, rows, 'csv')
+
+
+@run_bench.check
+def import_batches(directory, rows):
+    path = os.path.join(directory, 'export.jsonl')
+    export_stats(make_store(directory, rows), path)
+    sizes = []
+
+    def submit(batch):
+        sizes.append(len(batch))
+        return True
+
+    sent, peak = measured(import_heartbeats, path, submit)
+    assert sent == rows == sum(sizes), f'{sent} sent, {sum(sizes)} submitted of {rows}'
+    assert all(size == IMPORT_BATCH_SIZE for size in sizes[:-1]), 'a batch before the last was not full'
+    assert peak < MAX_PEAK_BYTES, f'import peaked at {peak} bytes'
+
+
+@run_bench.check
+def import_cli(directory, rows):
+    path = os.path.join(directory, 'export.csv')
+    export_stats(make_store(directory, CLI_IMPORT_ROWS), path)
+    log_path = os.path.join(directory, 'cli-invocations.jsonl')
+    os.environ.update(FAKE_WAKATIME_LOG=log_path, FAKE_WAKATIME_EXIT='0', FAKE_WAKATIME_DELAY='0')
+    executor = create_executor('cli', cli=run_bench.FAKE_CLI, plugin='bench', timeout=30)
+    assert import_heartbeats(path, executor.submit) == CLI_IMPORT_ROWS
+    with open(log_path, encoding='utf-8') as f:
+        invocations = [json.loads(line) for line in f]
+    assert sum(invocation['heartbeats'] for invocation in invocations) == CLI_IMPORT_ROWS
+    assert len(invocations) == -(-CLI_IMPORT_ROWS // IMPORT_BATCH_SIZE), f'{len(invocations)} spawns'
+
+
+@run_bench.check
+def cancel(directory, rows):
+    path = os.path.join(directory, 'export.jsonl')
+    stop_event = threading.Event()
+    stop_event.set()
+    try:
+        export_stats(make_store(directory, 1000), path, stop_event=stop_event)
+    except InterruptedError:
+        pass
+    else:
+        raise AssertionError('the export was not cancelled')
+    left = [name for name in os.listdir(directory) if name.startswith('export')]
+    assert not left, f'left behind: {left}'
+
+
+def main():
+    parser = run_bench.check_parser(__doc__)
+    parser.add_argument('--rows', type=int, default=200000, help='Heartbeats in the generated stats database.')
+    args = parser.parse_args()
+    run_bench.run_checks(args.json, args.rows)
+
+
+if __name__ == '__main__':
+    main()
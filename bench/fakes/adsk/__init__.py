@@ -0,0 +1,20 @@
+"""Headless stand-in for the parts of Fusion's adsk package the add-in uses.
+
+Only meant for benchmarks on machines without Fusion: objects behave like
+their Fusion counterparts closely enough to drive FusionWakaTime.py, and
+data-model lookups are counted so the cost of a code path can be measured.
+"""
+import queue
+
+_custom_events = queue.Queue()
+
+
+def doEvents():
+    """Delivers custom events fired since the last call, like Fusion's UI loop does."""
+    while True:
+        try: event, args = _custom_events.get_nowait()
+        except queue.Empty: return
+        event.fire(args)
+
+
+from . import core, fusion  # noqa: E402
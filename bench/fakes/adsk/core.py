@@ -0,0 +1,494 @@
+import itertools
+import threading
+from collections import Counter
+
+import adsk
+
+# Number of simulated cross-process data-model lookups, by attribute.
+api_calls = Counter()
+_ids = itertools.count(1)
+
+
+class LogLevels:
+    InfoLogLevel = 0
+    WarningLogLevel = 1
+    ErrorLogLevel = 2
+
+
+class LogTypes:
+    ConsoleLogType = 0
+    FileLogType = 1
+
+
+class PaletteDockingStates:
+    PaletteDockStateFloating = 0
+    PaletteDockStateLeft = 1
+    PaletteDockStateRight = 2
+
+
+class DialogResults:
+    DialogError = -1
+    DialogOK = 0
+    DialogCancel = 1
+    DialogYes = 2
+    DialogNo = 3
+
+
+class MessageBoxButtonTypes:
+    OKButtonType = 0
+    OKCancelButtonType = 1
+    RetryCancelButtonType = 2
+    YesNoButtonType = 3
+    YesNoCancelButtonType = 4
+
+
+# --- Events ---
+class Event:
+    def __init__(self, name: str):
+        self.name = name
+        self._handlers = []
+
+    def add(self, handler) -> bool:
+        self._handlers.append(handler)
+        return True
+
+    def remove(self, handler) -> bool:
+        if handler in self._handlers: self._handlers.remove(handler)
+        return True
+
+    def fire(self, args=None):
+        """Bench helper: calls every handler the way Fusion would."""
+        for handler in list(self._handlers): handler.notify(args)
+
+
+# Like the real API, add() is annotated with the name of the handler class,
+# which fusionAddInUtils.add_handler relies on.
+class ApplicationCommandEvent(Event):
+    def add(self, handler: 'ApplicationCommandEventHandler') -> bool: return super().add(handler)
+
+
+class WorkspaceEvent(Event):
+    def add(self, handler: 'WorkspaceEventHandler') -> bool: return super().add(handler)
+
+
+class DocumentEvent(Event):
+    def add(self, handler: 'DocumentEventHandler') -> bool: return super().add(handler)
+
+
+class ActiveSelectionEvent(Event):
+    def add(self, handler: 'ActiveSelectionEventHandler') -> bool: return super().add(handler)
+
+
+class CameraEvent(Event):
+    def add(self, handler: 'CameraEventHandler') -> bool: return super().add(handler)
+
+
+class CustomEvent(Event):
+    def add(self, handler: 'CustomEventHandler') -> bool: return super().add(handler)
+
+
+class CommandCreatedEvent(Event):
+    def add(self, handler: 'CommandCreatedEventHandler') -> bool: return super().add(handler)
+
+
+class CommandEvent(Event):
+    def add(self, handler: 'CommandEventHandler') -> bool: return super().add(handler)
+
+
+class UserInterfaceGeneralEvent(Event):
+    def add(self, handler: 'UserInterfaceGeneralEventHandler') -> bool: return super().add(handler)
+
+
+class NavigationEvent(Event):
+    def add(self, handler: 'NavigationEventHandler') -> bool: return super().add(handler)
+
+
+class HTMLEvent(Event):
+    def add(self, handler: 'HTMLEventHandler') -> bool: return super().add(handler)
+
+
+class EventHandler:
+    def notify(self, args): pass
+
+
+class ApplicationCommandEventHandler(EventHandler): pass
+class DocumentEventHandler(EventHandler): pass
+class WorkspaceEventHandler(EventHandler): pass
+class ActiveSelectionEventHandler(EventHandler): pass
+class CameraEventHandler(EventHandler): pass
+class CustomEventHandler(EventHandler): pass
+class CommandCreatedEventHandler(EventHandler): pass
+class CommandEventHandler(EventHandler): pass
+class UserInterfaceGeneralEventHandler(EventHandler): pass
+class NavigationEventHandler(EventHandler): pass
+class HTMLEventHandler(EventHandler): pass
+
+
+class EventArgs:
+    firingEvent = None
+
+
+class ApplicationCommandEventArgs(EventArgs):
+    def __init__(self, commandId: str = 'SelectCommand', terminationReason: int = 0):
+        self.commandId = commandId
+        self.terminationReason = terminationReason
+        self.isCanceled = False
+
+
+class WorkspaceEventArgs(EventArgs):
+    def __init__(self, workspace=None):
+        self.workspace = workspace
+
+
+class DocumentEventArgs(EventArgs):
+    def __init__(self, document=None, fullPath: str = ''):
+        self.document = document
+        self.fullPath = fullPath
+        self.isComplete = True
+
+
+class ActiveSelectionEventArgs(EventArgs):
+    def __init__(self, currentSelection: list = None):
+        self.currentSelection = currentSelection or []
+
+
+class CameraEventArgs(EventArgs):
+    def __init__(self, viewport=None):
+        self.viewport = viewport
+
+
+class CustomEventArgs(EventArgs):
+    def __init__(self, additionalInfo: str = ''):
+        self.additionalInfo = additionalInfo
+
+
+class CommandCreatedEventArgs(EventArgs):
+    def __init__(self, command):
+        self.command = command
+
+
+class CommandEventArgs(EventArgs):
+    def __init__(self, command):
+        self.command = command
+
+
+class UserInterfaceGeneralEventArgs(EventArgs):
+    pass
+
+
+class NavigationEventArgs(EventArgs):
+    def __init__(self, navigationURL: str):
+        self.navigationURL = navigationURL
+        self.launchExternally = False
+
+
+class HTMLEventArgs(EventArgs):
+    def __init__(self, action: str, data: str = ''):
+        self.action = action
+        self.data = data
+        self.returnData = ''
+
+
+# --- Commands and toolbars ---
+class Command:
+    def __init__(self, definition):
+        self.parentCommandDefinition = definition
+        self.execute = CommandEvent('execute')
+        self.destroy = CommandEvent('destroy')
+
+
+class CommandDefinition:
+    def __init__(self, collection, id: str, name: str, tooltip: str, resourceFolder: str):
+        self._collection = collection
+        self.id = id
+        self.name = name
+        self.tooltip = tooltip
+        self.resourceFolder = resourceFolder
+        self.commandCreated = CommandCreatedEvent('commandCreated')
+
+    def execute(self):
+        """Bench helper: runs the command like a click on its button."""
+        command = Command(self)
+        self.commandCreated.fire(CommandCreatedEventArgs(command))
+        command.execute.fire(CommandEventArgs(command))
+        command.destroy.fire(CommandEventArgs(command))
+
+    def deleteMe(self) -> bool:
+        self._collection._items.pop(self.id, None)
+        return True
+
+
+class _Collection:
+    def __init__(self):
+        self._items = {}
+
+    def itemById(self, id: str):
+        return self._items.get(id)
+
+    @property
+    def count(self) -> int:
+        return len(self._items)
+
+
+class CommandDefinitions(_Collection):
+    def addButtonDefinition(self, id: str, name: str, tooltip: str, resourceFolder: str = ''):
+        if id in self._items: raise RuntimeError(f'3 : A command definition with the id "{id}" already exists.')
+        self._items[id] = CommandDefinition(self, id, name, tooltip, resourceFolder)
+        return self._items[id]
+
+
+class CommandControl:
+    def __init__(self, collection, definition):
+        self._collection = collection
+        self.id = definition.id
+        self.commandDefinition = definition
+        self.isPromoted = False
+
+    def deleteMe(self) -> bool:
+        self._collection._items.pop(self.id, None)
+        return True
+
+
+class ToolbarControls(_Collection):
+    def addCommand(self, commandDefinition, positionID: str = '', isBefore: bool = True):
+        self._items[commandDefinition.id] = CommandControl(self, commandDefinition)
+        return self._items[commandDefinition.id]
+
+
+class ToolbarPanel:
+    def __init__(self, id: str):
+        self.id = id
+        self.controls = ToolbarControls()
+
+
+class _AutoCollection(_Collection):
+    # Workspaces and panels exist in Fusion before any add-in runs.
+    def __init__(self, factory):
+        super().__init__()
+        self._factory = factory
+
+    def itemById(self, id: str):
+        return self._items.setdefault(id, self._factory(id))
+
+
+class Workspace:
+    def __init__(self, id: str):
+        self.id = id
+        self.toolbarPanels = _AutoCollection(ToolbarPanel)
+
+
+# --- Palettes ---
+class Palette:
+    def __init__(self, collection, id: str, name: str, htmlFileURL: str, isVisible: bool = True, **kwargs):
+        self._collection = collection
+        self.id = id
+        self.name = name
+        self.htmlFileURL = htmlFileURL
+        self.isVisible = isVisible
+        self.dockingState = PaletteDockingStates.PaletteDockStateFloating
+        self.closed = UserInterfaceGeneralEvent('closed')
+        self.navigatingURL = NavigationEvent('navigatingURL')
+        self.incomingFromHTML = HTMLEvent('incomingFromHTML')
+        # Bench helper: every (action, data) sent to the page.
+        self.sent = []
+
+    def sendInfoToHTML(self, action: str, data: str) -> str:
+        self.sent.append((action, data))
+        return 'OK'
+
+    def deleteMe(self) -> bool:
+        self._collection._items.pop(self.id, None)
+        return True
+
+    # --- Bench helpers ---
+    def send_from_html(self, action: str, data: str = '') -> str:
+        args = HTMLEventArgs(action, data)
+        self.incomingFromHTML.fire(args)
+        return args.returnData
+
+    def close(self):
+        self.isVisible = False
+        self.closed.fire(UserInterfaceGeneralEventArgs())
+
+
+class Palettes(_Collection):
+    def add(self, id: str, name: str, htmlFileURL: str, isVisible: bool = True, showCloseButton: bool = True,
+            isResizable: bool = True, width: int = 0, height: int = 0, useNewWebBrowser: bool = False):
+        if id in self._items: raise RuntimeError(f'3 : A palette with the id "{id}" already exists.')
+        self._items[id] = Palette(self, id, name, htmlFileURL, isVisible)
+        return self._items[id]
+
+
+# --- Data model ---
+class DataProject:
+    def __init__(self, name: str):
+        self.name = name
+        self.id = f'project-{next(_ids)}'
+
+
+class DataFolder:
+    def __init__(self, name: str, project: DataProject = None):
+        self.name = name
+        self.id = f'folder-{next(_ids)}'
+        self.parentProject = project
+
+
+class DataFile:
+    def __init__(self, name: str, folder: DataFolder = None):
+        self.name = name
+        self.id = f'file-{next(_ids)}'
+        self._folder = folder
+
+    @property
+    def parentFolder(self):
+        api_calls['DataFile.parentFolder'] += 1
+        return self._folder
+
+
+class Product:
+    def __init__(self, productType: str):
+        self.productType = productType
+
+
+class Document:
+    def __init__(self, name: str, data_file: DataFile = None):
+        from .fusion import Design
+        self.name = name
+        self.creationId = f'doc-{next(_ids)}'
+        self.isValid = True
+        self.active_product = Design()
+        self._data_file = data_file
+
+    @property
+    def dataFile(self):
+        api_calls['Document.dataFile'] += 1
+        return self._data_file
+
+    def save(self, folder: DataFolder = None):
+        """Bench helper: turns an unsaved document into a saved one."""
+        self._data_file = DataFile(self.name, folder)
+
+
+class Data:
+    def __init__(self):
+        self._active_project = None
+
+    @property
+    def activeProject(self):
+        api_calls['Data.activeProject'] += 1
+        return self._active_project
+
+    @activeProject.setter
+    def activeProject(self, project):
+        self._active_project = project
+
+
+# --- Dialogs ---
+class FileDialog:
+    def __init__(self, ui):
+        self._ui = ui
+        self.title = ''
+        self.filter = ''
+        self.initialFilename = ''
+        self.isMultiSelectEnabled = False
+        self.filename = ''
+
+    def showOpen(self) -> int:
+        return self._show()
+
+    def showSave(self) -> int:
+        return self._show()
+
+    def _show(self) -> int:
+        # Bench helper: the file the simulated user picks, or None to cancel.
+        if self._ui.dialog_filename is None: return DialogResults.DialogCancel
+        self.filename = self._ui.dialog_filename
+        return DialogResults.DialogOK
+
+
+class UserInterface:
+    def __init__(self):
+        self.commandStarting = ApplicationCommandEvent('commandStarting')
+        self.commandTerminated = ApplicationCommandEvent('commandTerminated')
+        self.activeSelectionChanged = ActiveSelectionEvent('activeSelectionChanged')
+        self.workspaceActivated = WorkspaceEvent('workspaceActivated')
+        self.commandDefinitions = CommandDefinitions()
+        self.workspaces = _AutoCollection(Workspace)
+        self.palettes = Palettes()
+        self.messages = []
+        # Bench helpers: what the simulated user answers to message boxes and file dialogs.
+        self.message_result = DialogResults.DialogOK
+        self.dialog_filename = None
+
+    def messageBox(self, text: str, *args):
+        self.messages.append(text)
+        return self.message_result
+
+    def createFileDialog(self):
+        return FileDialog(self)
+
+
+class Application:
+    _instance = None
+
+    def __init__(self):
+        self.userInterface = UserInterface()
+        self.data = Data()
+        self.documents = []
+        self.activeDocument = None
+        self.documentSaved = DocumentEvent('documentSaved')
+        self.documentOpened = DocumentEvent('documentOpened')
+        self.documentActivated = DocumentEvent('documentActivated')
+        self.documentClosed = DocumentEvent('documentClosed')
+        self.cameraChanged = CameraEvent('cameraChanged')
+        self.logged = []
+        # Messages logged from threads other than the UI thread, which Fusion does not allow.
+        self.logged_off_thread = []
+        self.log_to_stdout = False
+        self._custom_events = {}
+        self._lock = threading.Lock()
+
+    @property
+    def activeProduct(self):
+        api_calls['Application.activeProduct'] += 1
+        return self.activeDocument.active_product if self.activeDocument else None
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None: cls._instance = cls()
+        return cls._instance
+
+    def log(self, message: str, level: int = LogLevels.InfoLogLevel, type: int = LogTypes.ConsoleLogType):
+        self.logged.append(message)
+        if threading.current_thread() is not threading.main_thread(): self.logged_off_thread.append(message)
+        if self.log_to_stdout: print(message)
+
+    def registerCustomEvent(self, event_id: str):
+        with self._lock:
+            return self._custom_events.setdefault(event_id, CustomEvent(event_id))
+
+    def unregisterCustomEvent(self, event_id: str) -> bool:
+        with self._lock:
+            return self._custom_events.pop(event_id, None) is not None
+
+    def fireCustomEvent(self, event_id: str, additionalInfo: str = '') -> bool:
+        # Like Fusion, handlers run later on the UI thread; see adsk.doEvents().
+        with self._lock: event = self._custom_events.get(event_id)
+        if event is None: return False
+        adsk._custom_events.put((event, CustomEventArgs(additionalInfo)))
+        return True
+
+    # --- Bench helpers ---
+    def open_document(self, document: Document):
+        self.documents.append(document)
+        self.activeDocument = document
+        self.documentOpened.fire(DocumentEventArgs(document))
+        self.documentActivated.fire(DocumentEventArgs(document))
+
+    def activate_document(self, document: Document):
+        self.activeDocument = document
+        self.documentActivated.fire(DocumentEventArgs(document))
+
+    def save_document(self, document: Document, folder: DataFolder = None):
+        if document.dataFile is None: document.save(folder)
+        self.documentSaved.fire(DocumentEventArgs(document))
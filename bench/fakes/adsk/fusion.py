@@ -0,0 +1,21 @@
+from .core import Product, api_calls
+
+
+class Occurrence:
+    def __init__(self, fullPathName: str):
+        self.fullPathName = fullPathName
+
+
+class Design(Product):
+    def __init__(self):
+        super().__init__('DesignProductType')
+        self._active_occurrence = None
+
+    @property
+    def activeOccurrence(self):
+        api_calls['Design.activeOccurrence'] += 1
+        return self._active_occurrence
+
+    @activeOccurrence.setter
+    def activeOccurrence(self, occurrence):
+        self._active_occurrence = occurrence
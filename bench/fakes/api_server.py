@@ -0,0 +1,56 @@
+"""Stand-in for the WakaTime heartbeats API.
+
+Accepts POST /api/v1/users/current/heartbeats.bulk and records each
+request's path, Authorization header and JSON body. Replies 201 unless
+`statuses` holds status codes, which are used up one per request.
+"""
+import http.server
+import json
+import threading
+
+BULK_PATH = '/api/v1/users/current/heartbeats.bulk'
+
+
+class ApiServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ApiHandler)
+        self.statuses = []
+        self.requests = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/api/v1'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def next_status(self) -> int:
+        with self._lock: return self.statuses.pop(0) if self.statuses else 201
+
+
+class ApiHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'null')
+        server.requests.append((self.path, self.headers.get('Authorization'), body))
+        status = server.next_status() if self.path == BULK_PATH else 404
+        # The real API answers a bulk post with one [body, status] pair per heartbeat.
+        reply = json.dumps({'responses': [[{}, status]] * len(body or [])} if status < 300 else {'error': 'nope'})
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply.encode())
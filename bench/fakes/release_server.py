@@ -0,0 +1,106 @@
+"""Stand-in for the wakatime-cli release downloads on GitHub.
+
+Serves, for a single release:
+
+    /latest                                   {"tag_name": <version>}
+    /releases/download/<version>/checksums.txt
+    /releases/download/<version>/<asset>.zip  the fake wakatime-cli, zipped
+
+Archive downloads honour Range requests. `truncate_after` makes the next
+archive response stop after that many bytes, to simulate a dropped
+connection, and `corrupt_checksum` publishes a wrong checksum.
+"""
+import hashlib
+import http.server
+import io
+import json
+import os
+import threading
+import zipfile
+
+FAKE_CLI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wakatime-cli')
+
+
+def build_asset(binary_name: str, version: str) -> bytes:
+    with open(FAKE_CLI, encoding='utf-8') as f: script = f.read()
+    script = script.replace("VERSION = 'v0.0.0-fake'", f'VERSION = {version!r}')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        # Pad the archive so downloads span several chunks.
+        archive.writestr(binary_name, script + '#' * 256 * 1024 + '\n')
+    return buffer.getvalue()
+
+
+class ReleaseServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, binary_name: str, version: str = 'v9.9.9'):
+        super().__init__(('127.0.0.1', 0), ReleaseHandler)
+        self.version = version
+        self.asset_name = (binary_name[:-len('.exe')] if binary_name.endswith('.exe') else binary_name) + '.zip'
+        self.asset = build_asset(binary_name, version)
+        self.truncate_after = None
+        self.corrupt_checksum = False
+        self.requests = []
+        self.bytes_sent = 0
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ReleaseHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get('Range')))
+        base = f'/releases/download/{server.version}/'
+        if self.path == '/latest':
+            self._reply(200, json.dumps({'tag_name': server.version}).encode())
+        elif self.path == base + 'checksums.txt':
+            digest = hashlib.sha256(server.asset + (b'x' if server.corrupt_checksum else b'')).hexdigest()
+            self._reply(200, f'{digest}  {server.asset_name}\n'.encode())
+        elif self.path == base + server.asset_name:
+            self._send_asset()
+        else:
+            self._reply(404, b'not found')
+
+    def _send_asset(self):
+        server = self.server
+        asset = server.asset
+        start = 0
+        status = 200
+        requested = self.headers.get('Range')
+        if requested and requested.startswith('bytes='):
+            start = int(requested[len('bytes='):].split('-')[0])
+            if start >= len(asset):
+                self._reply(416, b'', {'Content-Range': f'bytes */{len(asset)}'})
+                return
+            status = 206
+        body = asset[start:]
+        headers = {'Content-Range': f'bytes {start}-{len(asset) - 1}/{len(asset)}'} if status == 206 else {}
+        limit, server.truncate_after = server.truncate_after, None
+        self._reply(status, body, headers, limit)
+
+    def _reply(self, status: int, body: bytes, headers: dict = None, limit: int = None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        for name, value in (headers or {}).items(): self.send_header(name, value)
+        self.end_headers()
+        sent = body if limit is None else body[:limit]
+        self.wfile.write(sent)
+        self.server.bytes_sent += len(sent)
+        if limit is not None: self.close_connection = True
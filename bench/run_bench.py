@@ -0,0 +1,343 @@
+"""Headless benchmarks for FusionWakaTime.py.
+
+Drives the add-in's event handlers with synthetic event streams, using the
+stand-in adsk package in bench/fakes and a fake wakatime-cli, and reports
+handler latency percentiles, CLI spawns, data-model calls and memory growth.
+Each scenario runs in its own process with a throwaway home directory.
+
+    python bench/run_bench.py [--seconds 5] [--cli-delay 0.05] [--setting metrics=false] [--json] [scenario ...]
+"""
+import argparse
+import contextlib
+import gc
+import importlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+FAKES_DIR = os.path.join(BENCH_DIR, 'fakes')
+FAKE_CLI = os.path.join(FAKES_DIR, 'wakatime-cli')
+ADDIN_PACKAGE = 'FusionWakaTimeAddIn'
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+# --- Scenarios ---
+# Each one gets the add-in module, the fake Application and a Driver, and
+# fires events for roughly `seconds` seconds of wall time.
+
+@scenario
+def command_storm(addin, app, driver, seconds):
+    """10k commandStarting events per minute in a single saved document."""
+    doc = driver.saved_document('Bracket', 'Brackets')
+    app.open_document(doc)
+    command_ids = ['SelectCommand', 'SketchCreate', 'OrbitCommand', 'ExtrudeCommand', 'SketchLineCommand']
+    for i in driver.paced(10000, seconds):
+        driver.fire(app.userInterface.commandStarting, driver.command_args(command_ids[i % len(command_ids)]))
+
+
+@scenario
+def save_storm(addin, app, driver, seconds):
+    """An autosave or manual save every second between bursts of commands."""
+    doc = driver.saved_document('Housing', 'Enclosures')
+    app.open_document(doc)
+    for i in driver.paced(3000, seconds):
+        if i % 50 == 0: driver.fire(app.documentSaved, driver.document_args(doc))
+        else: driver.fire(app.userInterface.commandStarting, driver.command_args('ExtrudeCommand'))
+
+
+@scenario
+def document_switching(addin, app, driver, seconds):
+    """Ten open documents, switching to the next one every few commands."""
+    docs = [driver.saved_document(f'Part {n}', f'Project {n % 3}') for n in range(10)]
+    for doc in docs: app.open_document(doc)
+    for i in driver.paced(6000, seconds):
+        if i % 20 == 0:
+            doc = docs[(i // 20) % len(docs)]
+            app.activeDocument = doc
+            driver.fire(app.documentActivated, driver.document_args(doc))
+        else:
+            driver.fire(app.userInterface.commandStarting, driver.command_args('SketchLineCommand'))
+
+
+@scenario
+def workspace_switching(addin, app, driver, seconds):
+    """Moving between the Design and Manufacture workspaces, with the commands of each."""
+    doc = driver.saved_document('Fixture Plate', 'Fixtures')
+    app.open_document(doc)
+    workspaces = ['FusionSolidEnvironment', 'CAMEnvironment']
+    products = [doc.active_product, driver.adsk.core.Product('CAMProductType')]
+    command_ids = [['SketchCreate', 'SketchLineCommand', 'SketchStop', 'ExtrudeCommand'],
+                   ['IronSetup', 'IronAdaptive2D', 'IronSimulate', 'IronPostProcess']]
+    for i in driver.paced(6000, seconds):
+        workspace = (i // 200) % len(workspaces)
+        if i % 200 == 0:
+            doc.active_product = products[workspace]
+            driver.fire(app.userInterface.workspaceActivated, driver.workspace_args(workspaces[workspace]))
+        else: driver.fire(app.userInterface.commandStarting, driver.command_args(command_ids[workspace][i % 4]))
+
+
+@scenario
+def component_switching(addin, app, driver, seconds):
+    """Activating another component of an assembly every few commands, without leaving the Design workspace."""
+    doc = driver.saved_document('Gearbox', 'Gearboxes')
+    app.open_document(doc)
+    # As with component_entities = true; nothing else in the config changes meanwhile.
+    addin.entity_resolver.component_paths = True
+    occurrences = [None] + [driver.adsk.fusion.Occurrence(f'Housing:1+Shaft:{n}') for n in range(1, 5)]
+    for i in driver.paced(6000, seconds):
+        if i % 100 == 0:
+            occurrence = occurrences[(i // 100) % len(occurrences)]
+            doc.active_product.activeOccurrence = occurrence
+            expected = occurrence.fullPathName.replace('+', '/') if occurrence else None
+            component = addin.entity_resolver.resolve(doc).component
+            if component != expected: raise AssertionError(f'heartbeats tagged {component!r} in {expected!r}')
+        driver.fire(app.userInterface.commandStarting, driver.command_args('ExtrudeCommand'))
+
+
+@scenario
+def reading(addin, app, driver, seconds):
+    """Orbiting and selecting in a drawing without running any commands."""
+    doc = driver.saved_document('Assembly Drawing', 'Drawings')
+    app.open_document(doc)
+    for i in driver.paced(12000, seconds):
+        if i % 40 == 0: driver.fire(app.userInterface.activeSelectionChanged, driver.adsk.core.ActiveSelectionEventArgs())
+        else: driver.fire(app.cameraChanged, driver.adsk.core.CameraEventArgs())
+
+
+# --- Child process side ---
+class Driver:
+    def __init__(self, adsk):
+        self.adsk = adsk
+        self.latencies = []
+
+    def fire(self, event, args):
+        started = time.perf_counter_ns()
+        event.fire(args)
+        self.latencies.append(time.perf_counter_ns() - started)
+
+    def paced(self, per_minute: int, seconds: float):
+        """Yields event indexes at `per_minute`, pumping Fusion's event loop in between."""
+        interval = 60.0 / per_minute
+        started = time.perf_counter()
+        count = int(seconds * per_minute / 60)
+        for i in range(count):
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0: time.sleep(delay)
+            self.adsk.doEvents()
+            yield i
+        self.adsk.doEvents()
+
+    def saved_document(self, name: str, folder: str):
+        core = self.adsk.core
+        project = core.DataProject(folder)
+        return core.Document(name, core.DataFile(name, core.DataFolder(folder, project)))
+
+    def command_args(self, command_id: str):
+        return self.adsk.core.ApplicationCommandEventArgs(command_id)
+
+    def document_args(self, doc):
+        return self.adsk.core.DocumentEventArgs(doc)
+
+    def workspace_args(self, workspace_id: str):
+        core = self.adsk.core
+        return core.WorkspaceEventArgs(core.Workspace(workspace_id))
+
+
+def cli_filename() -> str:
+    os_name = 'windows' if sys.platform == 'win32' else ('darwin' if sys.platform == 'darwin' else 'linux')
+    machine = platform.machine().lower()
+    arch_name = 'arm64' if 'arm64' in machine or 'aarch64' in machine else 'amd64'
+    return f'wakatime-cli-{os_name}-{arch_name}' + ('.exe' if os_name == 'windows' else '')
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def load_addin():
+    # Fusion imports an add-in as a package so its main file can use relative
+    # imports; do the same under a fixed package name.
+    package = types.ModuleType(ADDIN_PACKAGE)
+    package.__path__ = [ROOT]
+    sys.modules[ADDIN_PACKAGE] = package
+    return importlib.import_module(f'{ADDIN_PACKAGE}.FusionWakaTime')
+
+
+def run_child(name: str, seconds: float) -> dict:
+    sys.path.insert(0, FAKES_DIR)
+    import adsk
+    addin = load_addin()
+
+    app = adsk.core.Application.get()
+    driver = Driver(adsk)
+    addin.run(None)
+    addin.warm_up_thread.join()
+    # The election finishes on the coordinator's thread, and the leader's dispatcher then opens
+    # its journal and stats store on its own; let both settle before measuring.
+    while addin.coordinator.role == 'electing': time.sleep(0.01)
+    time.sleep(0.5)
+    adsk.doEvents()
+    if app.userInterface.messages: raise RuntimeError(f'run() failed: {app.userInterface.messages}')
+    adsk.core.api_calls.clear()
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+
+    started = time.perf_counter()
+    SCENARIOS[name](addin, app, driver, seconds)
+    elapsed = time.perf_counter() - started
+    addin.stop(None)
+    if app.logged_off_thread: raise RuntimeError(f'app.log called off the UI thread: {app.logged_off_thread}')
+    gc.collect()
+
+    spawns = heartbeats = 0
+    if os.path.exists(os.environ['FAKE_WAKATIME_LOG']):
+        with open(os.environ['FAKE_WAKATIME_LOG'], encoding='utf-8') as f:
+            for line in f:
+                spawns += 1
+                heartbeats += json.loads(line)['heartbeats']
+    latencies = sorted(driver.latencies)
+    return {
+        'scenario': name,
+        'events': len(latencies),
+        'seconds': round(elapsed, 2),
+        'p50_us': round(percentile(latencies, 0.50) / 1000, 2),
+        'p95_us': round(percentile(latencies, 0.95) / 1000, 2),
+        'p99_us': round(percentile(latencies, 0.99) / 1000, 2),
+        'max_us': round((latencies[-1] if latencies else 0) / 1000, 2),
+        'cli_spawns': spawns,
+        'heartbeats': heartbeats,
+        'data_model_calls': sum(adsk.core.api_calls.values()),
+        'alloc_blocks_delta': sys.getallocatedblocks() - blocks_before,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+# --- Parent process side ---
+@contextlib.contextmanager
+def bench_home(settings: list = (), cli_delay: float = 0.05):
+    """Yields the environment for a child process with a throwaway home, config and fake CLI."""
+    home = tempfile.mkdtemp(prefix='wakatime-bench-')
+    try:
+        os.makedirs(os.path.join(home, '.wakatime'))
+        shutil.copy(FAKE_CLI, os.path.join(home, '.wakatime', cli_filename()))
+        with open(os.path.join(home, '.wakatime.cfg'), 'w', encoding='utf-8') as f:
+            f.write('[settings]\napi_key = waka_00000000-0000-0000-0000-000000000000\n')
+            # Never reach out to GitHub for wakatime-cli updates from a benchmark.
+            f.write('[fusion360]\nauto_update = false\n' + ''.join(f'{setting}\n' for setting in settings))
+        yield dict(os.environ, HOME=home, USERPROFILE=home, FAKE_WAKATIME_DELAY=str(cli_delay),
+                   FAKE_WAKATIME_LOG=os.path.join(home, 'cli-invocations.jsonl'))
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+
+def run_child_process(script: str, args: list, env: dict) -> dict:
+    result = subprocess.run([sys.executable, script, *args], env=env, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_scenario(name: str, seconds: float, cli_delay: float, settings: list = ()) -> dict:
+    with bench_home(settings, cli_delay) as env:
+        return run_child_process(os.path.abspath(__file__), ['--child', name, '--seconds', str(seconds)], env)
+
+
+def print_table(results: list):
+    columns = list(results[0])
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print('  '.join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+# --- Checks ---
+# The bench/*_check.py scripts register their checks with @check, build their
+# command line with check_parser() and hand over to run_checks().
+CHECKS = {}
+
+
+def check(func):
+    CHECKS[func.__name__] = func
+    return func
+
+
+def check_parser(doc: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=doc.split('\n\n')[0])
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines.')
+    return parser
+
+
+def run_check(name: str, *args, fixture=None) -> dict:
+    """Runs one check in a throwaway directory and returns its result row.
+
+    The check is called with the directory and `args`. With `fixture`, a
+    context manager called with the directory and a dict of extra result
+    columns, it is called with what the fixture yields followed by `args`.
+    """
+    directory = tempfile.mkdtemp(prefix='wakatime-check-')
+    details = {}
+    started = time.perf_counter()
+    try:
+        if fixture is None:
+            CHECKS[name](directory, *args)
+        else:
+            with fixture(directory, details) as fixture_args: CHECKS[name](*fixture_args, *args)
+        error = ''
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return dict({'check': name, 'ok': not error, 'seconds': round(time.perf_counter() - started, 3)}, **details,
+                error=error)
+
+
+def run_checks(as_json: bool, *args, fixture=None):
+    """Runs every registered check, prints the results and exits with status 1 if any failed."""
+    results = [run_check(name, *args, fixture=fixture) for name in CHECKS]
+    if as_json:
+        for result in results: print(json.dumps(result))
+    else:
+        print_table(results)
+    sys.exit(0 if all(result['ok'] for result in results) else 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)}).")
+    parser.add_argument('--seconds', type=float, default=5, help='Wall time per scenario.')
+    parser.add_argument('--cli-delay', type=float, default=0.05, help='Seconds the fake CLI takes per run.')
+    parser.add_argument('--setting', action='append', default=[], metavar='KEY=VALUE',
+                        help='Add-in setting written to the [fusion360] section of the config (repeatable).')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines.')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.seconds)))
+        return
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown: parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    results = [run_scenario(name, args.seconds, args.cli_delay, args.setting) for name in args.scenarios or SCENARIOS]
+    if args.json:
+        for result in results: print(json.dumps(result))
+    else:
+        print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Startup benchmarks for FusionWakaTime.py.
+
+Every measurement runs in a fresh interpreter so import costs are paid cold,
+the way they are when Fusion 360 launches and loads the add-in, and reports
+the median and worst of `--runs` runs in milliseconds.
+
+    python bench/startup_bench.py [--runs 10] [--json]
+
+  config_encoding  detecting ~/.wakatime.cfg's encoding with the add-in's detector
+  chardet_detect   the previous approach: importing chardet and scanning the whole file
+  addin_import     importing the add-in module
+  addin_run        run(), from the call until it returns to Fusion
+  main.<phase>     the add-in's own breakdown of its main-thread time, import included
+  main.total       the main-thread total the add-in logs and checks against its budget
+  warm_up.<phase>  the background warm-up that follows
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import run_bench
+
+CHILDREN = {}
+
+
+def child(func):
+    CHILDREN[func.__name__] = func
+    return func
+
+
+def read_config() -> bytes:
+    with open(os.path.join(os.environ['HOME'], '.wakatime.cfg'), 'rb') as f: return f.read()
+
+
+# --- Child process side ---
+@child
+def encoding(raw: bytes) -> dict:
+    sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib'))
+    from wakatimeUtils.settings import detect_encoding
+    started = time.perf_counter()
+    detect_encoding(raw)
+    return {'config_encoding': (time.perf_counter() - started) * 1000}
+
+
+@child
+def legacy_encoding(raw: bytes) -> dict:
+    started = time.perf_counter()
+    import chardet
+    chardet.detect(raw)
+    return {'chardet_detect': (time.perf_counter() - started) * 1000}
+
+
+@child
+def addin(raw: bytes) -> dict:
+    sys.path.insert(0, run_bench.FAKES_DIR)
+    import adsk
+    started = time.perf_counter()
+    module = run_bench.load_addin()
+    imported = time.perf_counter()
+    module.run(None)
+    ran = time.perf_counter()
+    module.warm_up_thread.join()
+    adsk.doEvents()
+    module.stop(None)
+    if adsk.core.Application.get().userInterface.messages: raise RuntimeError('run() failed')
+    result = {'addin_import': (imported - started) * 1000, 'addin_run': (ran - imported) * 1000}
+    for name, ms, on_main in module.startup.phases:
+        result[f"{'main' if on_main else 'warm_up'}.{name}"] = ms
+    result['main.total'] = module.startup.main_thread_ms
+    return result
+
+
+# --- Parent process side ---
+def measure(runs: int) -> list:
+    samples = {}
+    with run_bench.bench_home() as env:
+        for _ in range(runs):
+            for name in CHILDREN:
+                result = run_bench.run_child_process(os.path.abspath(__file__), ['--child', name], env)
+                for phase, ms in result.items(): samples.setdefault(phase, []).append(ms)
+    return [
+        {'phase': phase, 'runs': len(values), 'median_ms': round(statistics.median(values), 2),
+         'max_ms': round(max(values), 2)}
+        for phase, values in samples.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters per measurement.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines.')
+    parser.add_argument('--child', choices=list(CHILDREN), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(CHILDREN[args.child](read_config())))
+        return
+    results = measure(args.runs)
+    if args.json:
+        for result in results: print(json.dumps(result))
+    else:
+        run_bench.print_table(results)
+
+
+if __name__ == '__main__':
+    main()
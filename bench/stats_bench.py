@@ -0,0 +1,115 @@
+"""Benchmarks the local stats store over a year of synthetic heartbeats.
+
+Records a heartbeat every two minutes through an eight hour working day, in
+batches the way the dispatcher hands them over, then times the aggregate
+queries the add-in answers locally. Totals read from the daily rollups are
+cross-checked against the sessions they were built from.
+
+    python bench/stats_bench.py [--days 365] [--projects 12] [--json]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import run_bench
+
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib'))
+
+from wakatimeUtils import StatsStore
+
+BATCH_SIZE = 50
+QUERY_RUNS = 20
+
+
+def synthetic_heartbeats(days: int, projects: int, seed: int = 1):
+    rng = random.Random(seed)
+    first_day = datetime.date.today() - datetime.timedelta(days=days - 1)
+    for offset in range(days):
+        day = first_day + datetime.timedelta(days=offset)
+        timestamp = time.mktime(datetime.datetime(day.year, day.month, day.day, 9).timetuple())
+        end = timestamp + 8 * 3600
+        project = rng.randrange(projects)
+        while timestamp < end:
+            if rng.random() < 0.02: project = rng.randrange(projects)
+            # Now and then a lunch break or meeting longer than the session timeout.
+            timestamp += 120 if rng.random() > 0.01 else 3600
+            yield {
+                'entity': f'Design {project}-{rng.randrange(5)}', 'project': f'Project {project}',
+                'language': 'Fusion360', 'category': 'designing', 'is_write': rng.random() < 0.05,
+                'is_unsaved_entity': False, 'timestamp': timestamp,
+            }
+
+
+def timed(func, runs: int = QUERY_RUNS) -> tuple:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(samples), max(samples)
+
+
+def run(days: int, projects: int) -> list:
+    directory = tempfile.mkdtemp(prefix='wakatime-stats-')
+    try:
+        store = StatsStore(os.path.join(directory, 'stats.db'))
+        store.open()
+        heartbeats = list(synthetic_heartbeats(days, projects))
+        batch_ms = []
+        for start in range(0, len(heartbeats), BATCH_SIZE):
+            started = time.perf_counter()
+            store.record(heartbeats[start:start + BATCH_SIZE])
+            batch_ms.append((time.perf_counter() - started) * 1000)
+
+        today = datetime.date.today()
+        week_start = today - datetime.timedelta(days=today.weekday())
+        year_start = today - datetime.timedelta(days=days - 1)
+        results = [{
+            'operation': f'record batch of {BATCH_SIZE}', 'rows': len(heartbeats),
+            'median_ms': round(statistics.median(batch_ms), 3), 'max_ms': round(max(batch_ms), 3),
+        }]
+        queries = {
+            'project totals, this week': lambda: store.project_totals(week_start, today),
+            'project totals, whole range': lambda: store.project_totals(year_start, today),
+            'daily totals, one project': lambda: store.daily_totals(year_start, today, 'Project 0'),
+            'category totals, whole range': lambda: store.category_totals(year_start, today),
+            'sessions, last 7 days': lambda: store.sessions(time.time() - 7 * 86400),
+        }
+        for name, query in queries.items():
+            rows, median_ms, max_ms = timed(query)
+            results.append({'operation': name, 'rows': len(rows),
+                            'median_ms': round(median_ms, 3), 'max_ms': round(max_ms, 3)})
+
+        rolled_up = sum(seconds for _, seconds in store.project_totals(year_start, today))
+        from_sessions = sum(end - start for _, _, _, start, end, _ in store.sessions(0))
+        store.close()
+        if abs(rolled_up - from_sessions) > 1:
+            raise AssertionError(f'daily totals ({rolled_up:.0f}s) disagree with sessions ({from_sessions:.0f}s)')
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--days', type=int, default=365, help='Days of history to generate.')
+    parser.add_argument('--projects', type=int, default=12, help='Number of projects to spread them over.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines.')
+    args = parser.parse_args()
+
+    results = run(args.days, args.projects)
+    if args.json:
+        for result in results: print(json.dumps(result))
+    else:
+        run_bench.print_table(results)
+
+
+if __name__ == '__main__':
+    main()
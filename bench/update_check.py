@@ -0,0 +1,116 @@
+"""Exercises the wakatime-cli download and update manager against a local stand-in.
+
+Starts bench/fakes/release_server.py, points CliUpdater at it and runs:
+
+  fresh_install    nothing installed yet: download, verify, extract, swap in
+  up_to_date       the installed version is current: nothing is downloaded
+  update           an older version is installed and gets replaced
+  resume           the first download is cut off halfway and the retry resumes it
+  stale_part       a partial download of an older release is discarded, not resumed
+  bad_checksum     a wrong published checksum: nothing is installed
+
+    python bench/update_check.py [--json]
+
+Exits with status 1 if any check fails.
+"""
+import contextlib
+import os
+import subprocess
+import sys
+
+import run_bench
+
+sys.path.insert(0, run_bench.FAKES_DIR)
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib'))
+sys.path.insert(0, os.path.join(run_bench.ROOT, 'lib', 'requests', 'src'))
+
+from release_server import ReleaseServer
+from wakatimeUtils import CliUpdater, UpdateError, cli_filename
+
+
+def installed_version(updater: CliUpdater) -> str:
+    if not os.path.exists(updater.binary_path): return None
+    result = subprocess.run([sys.executable, updater.binary_path, '--version'], stdout=subprocess.PIPE, text=True)
+    return result.stdout.strip()
+
+
+@run_bench.check
+def fresh_install(server, updater):
+    assert updater.update() == server.version
+    assert installed_version(updater) == server.version
+
+
+@run_bench.check
+def up_to_date(server, updater):
+    updater.update()
+    sent = server.bytes_sent
+    assert updater.update(server.version) is None
+    assert server.bytes_sent - sent < 100, 'downloaded although already up to date'
+
+
+@run_bench.check
+def update(server, updater):
+    assert updater.update('v1.0.0') == server.version
+    assert installed_version(updater) == server.version
+
+
+@run_bench.check
+def resume(server, updater):
+    server.truncate_after = len(server.asset) // 2
+    try:
+        updater.update()
+        raise AssertionError('the truncated download was accepted')
+    except AssertionError:
+        raise
+    except Exception:
+        pass
+    part_path = updater.part_path(server.version)
+    assert os.path.getsize(part_path) > 0, 'no partial download kept'
+    assert updater.update() == server.version
+    ranges = [requested for path, requested in server.requests if path.endswith('.zip')]
+    assert ranges[-1] is not None and ranges[-1] != 'bytes=0-', f'retry did not resume: {ranges}'
+    assert installed_version(updater) == server.version
+
+
+@run_bench.check
+def stale_part(server, updater):
+    os.makedirs(updater.install_dir, exist_ok=True)
+    stale_path = updater.part_path('v1.0.0')
+    with open(stale_path, 'wb') as f: f.write(server.asset[:len(server.asset) // 2])
+    assert updater.update() == server.version
+    ranges = [requested for path, requested in server.requests if path.endswith('.zip')]
+    assert ranges == [None], f'an older partial download was resumed: {ranges}'
+    assert not os.path.exists(stale_path), 'the older partial download was kept'
+    assert installed_version(updater) == server.version
+
+
+@run_bench.check
+def bad_checksum(server, updater):
+    server.corrupt_checksum = True
+    try:
+        updater.update()
+        raise AssertionError('a corrupt download was installed')
+    except UpdateError:
+        pass
+    assert not os.path.exists(updater.binary_path)
+    assert not os.listdir(updater.install_dir) or os.listdir(updater.install_dir) == ['fusion360-cli-update-check']
+
+
+@contextlib.contextmanager
+def release_server(install_dir: str, details: dict):
+    # Each check gets its own server and an updater pointed at it; the server's traffic goes in the results.
+    server = ReleaseServer(cli_filename()).start()
+    try:
+        yield server, CliUpdater(install_dir, releases_url=f'{server.url}/releases',
+                                 latest_release_url=f'{server.url}/latest')
+    finally:
+        server.stop()
+        details.update(requests=len(server.requests), bytes_sent=server.bytes_sent)
+
+
+def main():
+    run_bench.run_checks(run_bench.check_parser(__doc__).parse_args().json, fixture=release_server)
+
+
+if __name__ == '__main__':
+    main()
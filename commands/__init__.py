@@ -3,24 +3,29 @@
 # TODO Import the modules corresponding to the commands you created.
 # If you want to add an additional command, duplicate one of the existing directories and import it here.
 # You need to use aliases (import "entry" as "my_module") assuming you have the default module named "entry".
-from .commandDialog import entry as commandDialog
+from .metricsDump import entry as metricsDump
 from .paletteShow import entry as paletteShow
-from .paletteSend import entry as paletteSend
+from .statsExport import entry as statsExport
+from .statsImport import entry as statsImport
 
 # TODO add your imported modules to this list.
 # Fusion will automatically call the start() and stop() functions.
 commands = [
-    commandDialog,
+    metricsDump,
     paletteShow,
-    paletteSend
+    statsExport,
+    statsImport
 ]
 
 
 # Assumes you defined a "start" function in each of your modules.
-# The start function will be run when the add-in is started.
-def start():
-    for command in commands:
-        command.start()
+# The start function will be run when the add-in is started. The stats commands
+# are handed the parts of the add-in they use, since they cannot import it back.
+def start(stats_path: str, submit, can_submit):
+    metricsDump.start()
+    paletteShow.start()
+    statsExport.start(stats_path)
+    statsImport.start(submit, can_submit)
 
 
 # Assumes you defined a "stop" function in each of your modules.
@@ -0,0 +1,70 @@
+import adsk.core
+import os
+from ...lib import fusionAddInUtils as futil
+from ... import config
+from wakatimeUtils import format_snapshot, metrics
+
+app = adsk.core.Application.get()
+ui = app.userInterface
+
+CMD_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_metrics_dump'
+CMD_NAME = 'WakaTime Metrics'
+CMD_Description = 'Write the WakaTime add-in metrics to the Text Commands window'
+IS_PROMOTED = False
+
+# The button goes in the Add-Ins panel of the Utilities tab, next to Scripts and Add-Ins.
+WORKSPACE_ID = 'FusionSolidEnvironment'
+PANEL_ID = 'SolidScriptsAddinsPanel'
+COMMAND_BESIDE_ID = 'ScriptsManagerCommand'
+
+# Resource location for command icons, here we assume a sub folder in this directory named "resources".
+ICON_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', '')
+
+# Local list of event handlers used to maintain a reference so
+# they are not released and garbage collected.
+local_handlers = []
+
+
+# Executed when add-in is run.
+def start():
+    cmd_def = ui.commandDefinitions.addButtonDefinition(CMD_ID, CMD_NAME, CMD_Description, ICON_FOLDER)
+    futil.add_handler(cmd_def.commandCreated, command_created)
+
+    workspace = ui.workspaces.itemById(WORKSPACE_ID)
+    panel = workspace.toolbarPanels.itemById(PANEL_ID)
+    control = panel.controls.addCommand(cmd_def, COMMAND_BESIDE_ID, False)
+    control.isPromoted = IS_PROMOTED
+
+
+# Executed when add-in is stopped.
+def stop():
+    workspace = ui.workspaces.itemById(WORKSPACE_ID)
+    panel = workspace.toolbarPanels.itemById(PANEL_ID)
+    command_control = panel.controls.itemById(CMD_ID)
+    command_definition = ui.commandDefinitions.itemById(CMD_ID)
+
+    if command_control:
+        command_control.deleteMe()
+
+    if command_definition:
+        command_definition.deleteMe()
+
+
+# No command inputs are created, so the execute event fires immediately.
+def command_created(args: adsk.core.CommandCreatedEventArgs):
+    futil.add_handler(args.command.execute, command_execute, local_handlers=local_handlers)
+    futil.add_handler(args.command.destroy, command_destroy, local_handlers=local_handlers)
+
+
+# Dumps the current metrics snapshot to the Text Commands window.
+def command_execute(args: adsk.core.CommandEventArgs):
+    if not metrics.enabled:
+        futil.log('WakaTime metrics are disabled ([fusion360] metrics = false).', force_console=True)
+        return
+    futil.log(f'--- WakaTime Metrics ---\n{format_snapshot(metrics.snapshot())}', force_console=True)
+
+
+# This event handler is called when the command terminates.
+def command_destroy(args: adsk.core.CommandEventArgs):
+    global local_handlers
+    local_handlers = []
@@ -1,39 +1,94 @@
-function getDateString() {
-    const today = new Date();
-    const date = `${today.getDate()}/${today.getMonth() + 1}/${today.getFullYear()}`;
-    const time = `${today.getHours()}:${today.getMinutes()}:${today.getSeconds()}`;
-    return `Date: ${date}, Time: ${time}`;
+// The add-in sends the full state once, when the page asks for it, and after
+// that only deltas: the keys whose values changed. Rows are kept in a map and
+// updated in place, and only a table whose values changed is re-sorted.
+const MAX_ROWS = 15;
+const tables = {
+    projects: {values: new Map(), rows: new Map()},
+    entities: {values: new Map(), rows: new Map()},
+};
+
+function formatDuration(seconds) {
+    const minutes = Math.floor(seconds / 60);
+    if (minutes < 60) return `${minutes} min`;
+    return `${Math.floor(minutes / 60)} h ${minutes % 60} min`;
 }
 
-function sendInfoToFusion() {
-    const args = {
-        arg1: document.getElementById("sampleData").value,
-        arg2: getDateString()
-    };
+function formatMs(value) {
+    return value === null || value === undefined ? "-" : `${value} ms`;
+}
 
-    // Send the data to Fusion as a JSON string. The return value is a Promise.
-    adsk.fusionSendData("messageFromPalette", JSON.stringify(args)).then((result) =>
-        document.getElementById("returnValue").innerHTML = `${result}`
-    );
+function resetTable(name) {
+    const table = tables[name];
+    table.values.clear();
+    table.rows.clear();
+    document.getElementById(name).replaceChildren();
+}
 
+function updateTable(name, changes) {
+    const table = tables[name];
+    const element = document.getElementById(name);
+    for (const [key, seconds] of Object.entries(changes)) {
+        table.values.set(key, seconds);
+        let row = table.rows.get(key);
+        if (!row) {
+            row = element.insertRow();
+            row.insertCell().textContent = key;
+            row.insertCell().className = "time";
+            table.rows.set(key, row);
+        }
+        row.cells[1].textContent = formatDuration(seconds);
+    }
+    // Keep the longest on top and only the top rows visible.
+    const order = [...table.values.keys()].sort((a, b) => table.values.get(b) - table.values.get(a));
+    order.forEach((key, index) => {
+        const row = table.rows.get(key);
+        row.hidden = index >= MAX_ROWS;
+        element.tBodies[0].appendChild(row);
+    });
 }
 
-function updateMessage(messageString) {
-    // Message is sent from the add-in as a JSON string.
-    const messageData = JSON.parse(messageString);
+// The dispatcher's circuit breaker: open while the API or wakatime-cli keeps failing.
+const BREAKER_STATES = {"closed": "OK", "open": "Paused, retrying later", "half-open": "Retrying"};
+
+// With several Fusion 360 instances open, only the leading one sends heartbeats and keeps their counts.
+const ROLES = {"leader": "This instance", "follower": "Another Fusion 360 instance", "electing": "-"};
 
-    // Update a paragraph with the data passed in.
-    document.getElementById("fusionMessage").innerHTML =
-        `<b>Your text</b>: ${messageData.myText} <br/>` +
-        `<b>Your expression</b>: ${messageData.myExpression} <br/>` +
-        `<b>Your value</b>: ${messageData.myValue}`;
+function updateHealth(health) {
+    for (const [key, value] of Object.entries(health)) {
+        const cell = document.getElementById(key);
+        if (!cell) continue;
+        if (key === "role") {
+            cell.textContent = ROLES[value] || "-";
+            for (const row of document.querySelectorAll("tr.sender")) row.hidden = value === "follower";
+            continue;
+        }
+        if (key === "breaker") {
+            cell.textContent = BREAKER_STATES[value] || "-";
+            cell.className = value === "closed" ? "time" : "time warning";
+            continue;
+        }
+        cell.textContent = key.endsWith("_ms") ? formatMs(value) : `${value}`;
+        if (key === "failed") cell.className = value > 0 ? "time warning" : "time";
+    }
+}
+
+function applyDelta(delta) {
+    if (delta.reset) {
+        resetTable("projects");
+        resetTable("entities");
+    }
+    if (delta.day !== undefined) document.getElementById("day").textContent = delta.day;
+    if (delta.total !== undefined) document.getElementById("total").textContent = formatDuration(delta.total);
+    if (delta.projects) updateTable("projects", delta.projects);
+    if (delta.entities) updateTable("entities", delta.entities);
+    if (delta.health) updateHealth(delta.health);
 }
 
 window.fusionJavaScriptHandler = {
     handle: function (action, data) {
         try {
-            if (action === "updateMessage") {
-                updateMessage(data);
+            if (action === "dashboardDelta") {
+                applyDelta(JSON.parse(data));
             } else if (action === "debugger") {
                 debugger;
             } else {
@@ -46,3 +101,14 @@ window.fusionJavaScriptHandler = {
         return "OK";
     },
 };
+
+// adsk.fusionSendData is only injected once the page has loaded.
+window.addEventListener("load", () => {
+    const requestState = () => {
+        if (!window.adsk) return setTimeout(requestState, 100);
+        adsk.fusionSendData("dashboardReady", "{}").then((result) => {
+            if (result) applyDelta(JSON.parse(result));
+        });
+    };
+    requestState();
+});
@@ -0,0 +1,125 @@
+import datetime
+import threading
+import adsk.core
+import os
+from ...lib import fusionAddInUtils as futil
+from ... import config
+from wakatimeUtils import export_stats, logger, sessions_path
+
+app = adsk.core.Application.get()
+ui = app.userInterface
+
+CMD_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_stats_export'
+CMD_NAME = 'WakaTime Export'
+CMD_Description = 'Export the heartbeats and sessions recorded on this computer to a JSONL or CSV file'
+IS_PROMOTED = False
+
+# The export runs on a background thread, which reports back to the UI thread with this event.
+DONE_EVENT_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_stats_export_done'
+STOP_TIMEOUT = 5
+
+# The button goes in the Add-Ins panel of the Utilities tab, next to Scripts and Add-Ins.
+WORKSPACE_ID = 'FusionSolidEnvironment'
+PANEL_ID = 'SolidScriptsAddinsPanel'
+COMMAND_BESIDE_ID = 'ScriptsManagerCommand'
+
+# Resource location for command icons, here we assume a sub folder in this directory named "resources".
+ICON_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', '')
+
+# Local list of event handlers used to maintain a reference so
+# they are not released and garbage collected.
+local_handlers = []
+done_handlers = []
+export_thread = None
+export_stopped = threading.Event()
+# The add-in's local stats database, set by start().
+stats_path = None
+
+
+# Executed when add-in is run.
+def start(path: str):
+    global stats_path
+    stats_path = path
+    cmd_def = ui.commandDefinitions.addButtonDefinition(CMD_ID, CMD_NAME, CMD_Description, ICON_FOLDER)
+    futil.add_handler(cmd_def.commandCreated, command_created)
+
+    app.unregisterCustomEvent(DONE_EVENT_ID)
+    futil.add_handler(app.registerCustomEvent(DONE_EVENT_ID), export_done, local_handlers=done_handlers)
+
+    workspace = ui.workspaces.itemById(WORKSPACE_ID)
+    panel = workspace.toolbarPanels.itemById(PANEL_ID)
+    control = panel.controls.addCommand(cmd_def, COMMAND_BESIDE_ID, False)
+    control.isPromoted = IS_PROMOTED
+
+
+# Executed when add-in is stopped.
+def stop():
+    global done_handlers, export_thread
+    # A running export is cancelled and leaves no partial file behind.
+    export_stopped.set()
+    if export_thread is not None: export_thread.join(STOP_TIMEOUT)
+    export_thread = None
+    app.unregisterCustomEvent(DONE_EVENT_ID)
+    done_handlers = []
+
+    workspace = ui.workspaces.itemById(WORKSPACE_ID)
+    panel = workspace.toolbarPanels.itemById(PANEL_ID)
+    command_control = panel.controls.itemById(CMD_ID)
+    command_definition = ui.commandDefinitions.itemById(CMD_ID)
+
+    if command_control:
+        command_control.deleteMe()
+
+    if command_definition:
+        command_definition.deleteMe()
+
+
+# No command inputs are created, so the execute event fires immediately.
+def command_created(args: adsk.core.CommandCreatedEventArgs):
+    futil.add_handler(args.command.execute, command_execute, local_handlers=local_handlers)
+    futil.add_handler(args.command.destroy, command_destroy, local_handlers=local_handlers)
+
+
+# Asks where to export to, then streams the local stats there off the UI thread.
+def command_execute(args: adsk.core.CommandEventArgs):
+    global export_thread
+    if export_thread is not None and export_thread.is_alive():
+        ui.messageBox('An export is already running.', CMD_NAME)
+        return
+    if not os.path.exists(stats_path):
+        ui.messageBox('Nothing to export yet: no heartbeats have been recorded on this computer.', CMD_NAME)
+        return
+
+    dialog = ui.createFileDialog()
+    dialog.title = 'Export WakaTime heartbeats'
+    dialog.filter = 'JSON Lines (*.jsonl);;CSV (*.csv)'
+    dialog.initialFilename = f'fusion360-wakatime-{datetime.date.today().isoformat()}.jsonl'
+    if dialog.showSave() != adsk.core.DialogResults.DialogOK: return
+
+    export_stopped.clear()
+    export_thread = threading.Thread(target=run_export, args=(stats_path, dialog.filename),
+                                     name='WakaTimeExport', daemon=True)
+    export_thread.start()
+
+
+def run_export(db_path: str, path: str):
+    try:
+        heartbeats, sessions = export_stats(db_path, path, stop_event=export_stopped)
+        message = f'Exported {heartbeats} heartbeat(s) to {path} and {sessions} session(s) to {sessions_path(path)}.'
+    except InterruptedError:
+        return
+    except Exception as e:
+        logger.exception('Exporting heartbeats failed.')
+        message = f'Exporting heartbeats failed: {e}'
+    app.fireCustomEvent(DONE_EVENT_ID, message)
+
+
+# Message boxes have to be shown from the UI thread.
+def export_done(args: adsk.core.CustomEventArgs):
+    ui.messageBox(args.additionalInfo, CMD_NAME)
+
+
+# This event handler is called when the command terminates.
+def command_destroy(args: adsk.core.CommandEventArgs):
+    global local_handlers
+    local_handlers = []
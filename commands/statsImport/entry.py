@@ -0,0 +1,133 @@
+import threading
+import adsk.core
+import os
+from ...lib import fusionAddInUtils as futil
+from ... import config
+from wakatimeUtils import DeliveryError, import_heartbeats, logger
+
+app = adsk.core.Application.get()
+ui = app.userInterface
+
+CMD_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_stats_import'
+CMD_NAME = 'WakaTime Import'
+CMD_Description = 'Send the heartbeats of a WakaTime Export file to WakaTime again'
+IS_PROMOTED = False
+
+# The import runs on a background thread, which reports back to the UI thread with this event.
+DONE_EVENT_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_stats_import_done'
+STOP_TIMEOUT = 20
+
+# The button goes in the Add-Ins panel of the Utilities tab, next to Scripts and Add-Ins.
+WORKSPACE_ID = 'FusionSolidEnvironment'
+PANEL_ID = 'SolidScriptsAddinsPanel'
+COMMAND_BESIDE_ID = 'ScriptsManagerCommand'
+
+# Resource location for command icons, here we assume a sub folder in this directory named "resources".
+ICON_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', '')
+
+# Local list of event handlers used to maintain a reference so
+# they are not released and garbage collected.
+local_handlers = []
+done_handlers = []
+import_thread = None
+import_stopped = threading.Event()
+# Set by start(): sends a batch through the add-in's executor, and tells whether it has one yet.
+submit_heartbeats = None
+can_submit = None
+
+
+# Executed when add-in is run.
+def start(submit, ready):
+    global submit_heartbeats, can_submit
+    submit_heartbeats, can_submit = submit, ready
+    cmd_def = ui.commandDefinitions.addButtonDefinition(CMD_ID, CMD_NAME, CMD_Description, ICON_FOLDER)
+    futil.add_handler(cmd_def.commandCreated, command_created)
+
+    app.unregisterCustomEvent(DONE_EVENT_ID)
+    futil.add_handler(app.registerCustomEvent(DONE_EVENT_ID), import_done, local_handlers=done_handlers)
+
+    workspace = ui.workspaces.itemById(WORKSPACE_ID)
+    panel = workspace.toolbarPanels.itemById(PANEL_ID)
+    control = panel.controls.addCommand(cmd_def, COMMAND_BESIDE_ID, False)
+    control.isPromoted = IS_PROMOTED
+
+
+# Executed when add-in is stopped.
+def stop():
+    global done_handlers, import_thread
+    # A running import stops after the batch in flight.
+    import_stopped.set()
+    if import_thread is not None: import_thread.join(STOP_TIMEOUT)
+    import_thread = None
+    app.unregisterCustomEvent(DONE_EVENT_ID)
+    done_handlers = []
+
+    workspace = ui.workspaces.itemById(WORKSPACE_ID)
+    panel = workspace.toolbarPanels.itemById(PANEL_ID)
+    command_control = panel.controls.itemById(CMD_ID)
+    command_definition = ui.commandDefinitions.itemById(CMD_ID)
+
+    if command_control:
+        command_control.deleteMe()
+
+    if command_definition:
+        command_definition.deleteMe()
+
+
+# No command inputs are created, so the execute event fires immediately.
+def command_created(args: adsk.core.CommandCreatedEventArgs):
+    futil.add_handler(args.command.execute, command_execute, local_handlers=local_handlers)
+    futil.add_handler(args.command.destroy, command_destroy, local_handlers=local_handlers)
+
+
+# Asks for an export file and, once confirmed, sends it through the add-in's executor off the UI thread.
+def command_execute(args: adsk.core.CommandEventArgs):
+    global import_thread
+    if import_thread is not None and import_thread.is_alive():
+        ui.messageBox('An import is already running.', CMD_NAME)
+        return
+    if not can_submit():
+        ui.messageBox('The add-in has not finished starting; try again in a moment.', CMD_NAME)
+        return
+
+    dialog = ui.createFileDialog()
+    dialog.title = 'Import WakaTime heartbeats'
+    dialog.filter = 'WakaTime exports (*.jsonl *.csv);;JSON Lines (*.jsonl);;CSV (*.csv)'
+    dialog.isMultiSelectEnabled = False
+    if dialog.showOpen() != adsk.core.DialogResults.DialogOK: return
+    path = dialog.filename
+    answer = ui.messageBox(
+        f'Send every heartbeat in {os.path.basename(path)} to WakaTime again?',
+        CMD_NAME, adsk.core.MessageBoxButtonTypes.YesNoButtonType
+    )
+    if answer != adsk.core.DialogResults.DialogYes: return
+
+    import_stopped.clear()
+    import_thread = threading.Thread(target=run_import, args=(path, submit_heartbeats),
+                                     name='WakaTimeImport', daemon=True)
+    import_thread.start()
+
+
+def run_import(path: str, submit):
+    try:
+        sent = import_heartbeats(path, submit, stop_event=import_stopped)
+        if import_stopped.is_set(): return
+        message = f'Sent {sent} heartbeat(s) from {path}.'
+    except DeliveryError as e:
+        logger.warning('Importing heartbeats stopped: %s', e)
+        message = f'Importing heartbeats stopped: {e}'
+    except Exception as e:
+        logger.exception('Importing heartbeats failed.')
+        message = f'Importing heartbeats failed: {e}'
+    app.fireCustomEvent(DONE_EVENT_ID, message)
+
+
+# Message boxes have to be shown from the UI thread.
+def import_done(args: adsk.core.CustomEventArgs):
+    ui.messageBox(args.additionalInfo, CMD_NAME)
+
+
+# This event handler is called when the command terminates.
+def command_destroy(args: adsk.core.CommandEventArgs):
+    global local_handlers
+    local_handlers = []
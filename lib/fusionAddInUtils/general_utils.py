@@ -23,6 +23,17 @@ try:
 except:
     DEBUG = False
 
+# Route messages through the add-in's buffered logger when it is available.
+try:
+    from wakatimeUtils import ERROR, INFO, WARNING, logger as _logger
+    _LOGGER_LEVELS = {
+        adsk.core.LogLevels.InfoLogLevel: INFO,
+        adsk.core.LogLevels.WarningLogLevel: WARNING,
+        adsk.core.LogLevels.ErrorLogLevel: ERROR,
+    }
+except ImportError:
+    _logger = None
+
 
 def log(message: str, level: adsk.core.LogLevels = adsk.core.LogLevels.InfoLogLevel, force_console: bool = False):
     """Utility function to easily handle logging in your app.
@@ -32,6 +43,15 @@ def log(message: str, level: adsk.core.LogLevels = adsk.core.LogLevels.InfoLogLe
     level -- The logging severity level.
     force_console -- Forces the message to be written to the Text Command window. 
     """    
+    if _logger is not None:
+        # The logger keeps the message for its log file and already sends
+        # warnings and errors to the Text Command window.
+        logger_level = _LOGGER_LEVELS.get(level, INFO)
+        _logger.log(logger_level, message)
+        if (DEBUG or force_console) and logger_level < WARNING:
+            app.log(message, level, adsk.core.LogTypes.ConsoleLogType)
+        return
+
     # Always print to console, only seen through IDE.
     print(message)  
 
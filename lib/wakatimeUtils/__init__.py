@@ -0,0 +1,22 @@
+from .cli import *
+from .breaker import *
+from .dispatcher import *
+from .coordination import *
+from .journal import *
+from .stats import *
+from .export import *
+from .dashboard import *
+from .entity import *
+from .categories import *
+from .timer import *
+from .compaction import *
+from .activity import *
+from .executor import *
+from .api import *
+from .ratelimit import *
+from .telemetry import *
+from .logs import *
+from .settings import *
+from .startup import *
+from .discovery import *
+from .updater import *
@@ -0,0 +1,103 @@
+import time
+from typing import Callable
+
+_monotonic = time.monotonic
+
+# Kinds of activity touch() records, as indexes into ActivityTracker.counts.
+COMMAND = 0
+SELECTION = 1
+CAMERA = 2
+DOCUMENT = 3
+ACTIVITY_KINDS = ('command', 'selection', 'camera', 'document')
+
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class ActivityTracker:
+    """Turns a stream of Fusion events into active and idle intervals.
+
+    touch() is all event handlers call. It counts the event by kind and
+    updates the current interval in O(1), keeping no per-event history, so
+    memory stays bounded however long Fusion runs.
+
+    An interval stays open while events arrive less than `idle_timeout`
+    seconds apart; a longer gap closes it and counts as idle time. A new
+    interval only becomes active once `confirm_events` events arrive within
+    `confirm_window` seconds of its start, so a single stray event after a
+    break is not mistaken for work.
+
+    flush() runs from a timer tick on the UI thread and calls `on_activity`
+    with the wall clock time of the most recent event, if there was new
+    activity in an active interval since the last flush.
+    """
+
+    def __init__(self, on_activity: Callable[[float], None], idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 confirm_events: int = 2, confirm_window: float = 60):
+        self._on_activity = on_activity
+        self.idle_timeout = idle_timeout
+        self.confirm_events = max(1, confirm_events)
+        self.confirm_window = confirm_window
+        self.counts = [0] * len(ACTIVITY_KINDS)
+        self.events = 0
+        self.flushes = 0
+        self.dirty = False
+        self.closed_active_seconds = 0.0
+        self.idle_seconds = 0.0
+        self._start = None
+        self._last = None
+        self._interval_events = 0
+        self._active = False
+
+    def touch(self, kind: int = COMMAND):
+        now = _monotonic()
+        self.counts[kind] += 1
+        self.events += 1
+
+        last = self._last
+        if last is None:
+            self._begin(now)
+        elif now - last > self.idle_timeout:
+            self._close()
+            self.idle_seconds += now - last
+            self._begin(now)
+        elif not self._active and now - self._start > self.confirm_window:
+            # The events so far were too sparse to count; start over from this one.
+            self.idle_seconds += now - self._start
+            self._begin(now)
+        self._interval_events += 1
+        self._last = now
+        if not self._active and self._interval_events >= self.confirm_events: self._active = True
+        if self._active: self.dirty = True
+
+    def flush(self) -> bool:
+        if not self.dirty: return False
+        self.dirty = False
+        self.flushes += 1
+        self._on_activity(self._wall_time(self._last))
+        return True
+
+    @property
+    def is_active(self) -> bool:
+        """True while in a confirmed interval whose last event is younger than idle_timeout."""
+        return self._active and _monotonic() - self._last <= self.idle_timeout
+
+    @property
+    def active_seconds(self) -> float:
+        """Active time so far, including the interval still open."""
+        current = self._last - self._start if self._active else 0.0
+        return self.closed_active_seconds + current
+
+    def _begin(self, now: float):
+        self._start = now
+        self._interval_events = 0
+        self._active = False
+
+    def _close(self):
+        if not self._active:
+            self.idle_seconds += self._last - self._start
+            return
+        self.closed_active_seconds += self._last - self._start
+
+    @staticmethod
+    def _wall_time(monotonic: float) -> float:
+        return time.time() - (_monotonic() - monotonic)
@@ -0,0 +1,147 @@
+import threading
+import time
+from .breaker import FAILURE_AUTH, FAILURE_ERROR, FAILURE_OFFLINE, DeliveryError
+from .executor import EXECUTORS, HeartbeatExecutor
+from .logs import logger
+from .telemetry import metrics
+
+DEFAULT_API_URL = 'https://api.wakatime.com/api/v1'
+BULK_LIMIT = 25
+
+
+class HttpExecutor(HeartbeatExecutor):
+    """Posts heartbeats straight to the bulk heartbeats API with the vendored requests.
+
+    One long-lived Session with a bounded HTTPAdapter pool keeps TLS
+    connections alive between batches. If requests cannot be imported or a
+    batch cannot be delivered, the batch is handed to `fallback` (normally
+    the CLI executor, which also has its own offline queue). Without a
+    fallback, failures are raised as DeliveryError. A batch goes out in
+    chunks of BULK_LIMIT, so the error carries only the chunks from the
+    failed one on as `unsent`; the ones before it were accepted.
+    """
+
+    name = 'http'
+
+    def __init__(self, api_key: str, plugin: str, api_url: str = None, timeout: float = 15,
+                 max_concurrency: int = 1, fallback: HeartbeatExecutor = None, proxy: str = None,
+                 verify: bool = True):
+        self.api_url = (api_url or DEFAULT_API_URL).rstrip('/')
+        self._api_key = api_key
+        self._plugin = plugin
+        self._timeout = timeout
+        self._max_concurrency = max(1, max_concurrency)
+        self._fallback = fallback
+        self._proxy = proxy
+        self._verify = verify
+        self._session = None
+        self._lock = threading.Lock()
+        self._posts = 0
+        self._fallbacks = 0
+        self._status_codes = {}
+
+    def start(self):
+        import base64
+        import platform
+        try:
+            import requests
+            from requests.adapters import HTTPAdapter
+        except ImportError as e:
+            logger.warning('requests is unavailable (%s); heartbeats will go through the fallback executor.', e)
+            if self._fallback: self._fallback.start()
+            return
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._max_concurrency, pool_block=True)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        token = base64.b64encode(self._api_key.encode('utf-8')).decode('ascii')
+        session.headers.update({
+            'Authorization': f'Basic {token}',
+            'User-Agent': f'wakatime/unset ({platform.system().lower()}-{platform.machine().lower()}) '
+                          f'python{platform.python_version()} {self._plugin}',
+        })
+        if self._proxy: session.proxies.update({'http': self._proxy, 'https': self._proxy})
+        session.verify = self._verify
+        self._session = session
+        if self._fallback: self._fallback.start()
+
+    def submit(self, heartbeats: list) -> bool:
+        if self._session is None: return self._submit_fallback(heartbeats)
+        for start in range(0, len(heartbeats), BULK_LIMIT):
+            chunk = heartbeats[start:start + BULK_LIMIT]
+            failure = self._post(chunk)
+            if failure is None: continue
+            if self._fallback is None:
+                raise DeliveryError(failure, 'the heartbeats API did not accept the batch', unsent=heartbeats[start:])
+            try:
+                if not self._submit_fallback(chunk):
+                    raise DeliveryError(FAILURE_ERROR, 'the fallback executor did not accept the batch')
+            except DeliveryError as e:
+                # Only this chunk and the ones after it are left, or just the ones after it once queued.
+                e.unsent = heartbeats[start + (len(chunk) if e.queued else 0):]
+                raise
+        return True
+
+    def shutdown(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        if self._fallback: self._fallback.shutdown()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                'backend': self.name,
+                'posts': self._posts,
+                'fallbacks': self._fallbacks,
+                'status_codes': dict(self._status_codes),
+            }
+        if self._fallback: stats['fallback'] = self._fallback.stats()
+        return stats
+
+    def _post(self, heartbeats: list) -> str:
+        # Returns None once the API accepted the heartbeats, otherwise the FAILURE_* kind.
+        started = time.perf_counter()
+        try:
+            response = self._session.post(
+                f'{self.api_url}/users/current/heartbeats.bulk',
+                json=[api_heartbeat(heartbeat) for heartbeat in heartbeats], timeout=self._timeout
+            )
+        except Exception as e:
+            metrics.inc('http.errors')
+            logger.warning('Heartbeat API request failed: %s', e)
+            return FAILURE_OFFLINE
+        metrics.observe('http.post', time.perf_counter() - started)
+        metrics.inc(f'http.status.{response.status_code}')
+        with self._lock:
+            self._posts += 1
+            self._status_codes[response.status_code] = self._status_codes.get(response.status_code, 0) + 1
+        if response.status_code in (200, 201, 202):
+            logger.info('Heartbeat API accepted %d heartbeat(s) (status %d).', len(heartbeats), response.status_code)
+            return None
+        logger.warning('Heartbeat API returned status %d: %s', response.status_code, response.text[:200])
+        if response.status_code in (401, 403): return FAILURE_AUTH
+        if response.status_code == 429 or response.status_code >= 500: return FAILURE_OFFLINE
+        return FAILURE_ERROR
+
+    def _submit_fallback(self, heartbeats: list) -> bool:
+        if self._fallback is None: return False
+        metrics.inc('http.fallbacks')
+        with self._lock: self._fallbacks += 1
+        return self._fallback.submit(heartbeats)
+
+
+def api_heartbeat(heartbeat: dict) -> dict:
+    """Converts a queued heartbeat into the JSON body the heartbeats API expects."""
+    return {
+        'entity': heartbeat['entity'],
+        'type': 'file',
+        'category': heartbeat['category'],
+        'time': heartbeat['timestamp'],
+        'project': heartbeat['project'],
+        'language': heartbeat['language'],
+        'is_write': bool(heartbeat.get('is_write')),
+    }
+
+
+EXECUTORS[HttpExecutor.name] = HttpExecutor
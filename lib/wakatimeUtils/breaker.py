@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+
+from .logs import logger
+from .telemetry import metrics
+
+# Why a batch could not be delivered.
+FAILURE_OFFLINE = 'offline'  # network down, API unreachable or timing out; clears up on its own
+FAILURE_AUTH = 'auth'        # the API key was rejected; only a config change fixes it
+FAILURE_CONFIG = 'config'    # wakatime-cli could not read its config; likewise
+FAILURE_ERROR = 'error'      # anything else, e.g. the CLI could not be started
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class DeliveryError(Exception):
+    """Raised by an executor when a batch failed for a reason worth backing off from.
+
+    `kind` is one of the FAILURE_* values. `queued` is True when
+    wakatime-cli kept the batch in its own offline queue, so it must not be
+    sent again even though the attempt counts as a failure. `unsent`, when
+    given, is the tail of the batch still to be sent: everything before it
+    was delivered (or queued) before the failure.
+    """
+
+    def __init__(self, kind: str, message: str, queued: bool = False, unsent: list = None):
+        super().__init__(message)
+        self.kind = kind
+        self.queued = queued
+        self.unsent = unsent
+
+
+class CircuitBreaker:
+    """Stops heartbeat submissions while the service keeps failing.
+
+    After `failure_threshold` consecutive failures (or a single FAILURE_AUTH
+    or FAILURE_CONFIG one) the breaker opens and allow() returns False, so
+    nothing is spawned or posted. Once the backoff has passed, allow() lets exactly one
+    probe through (half-open); its success closes the breaker, its failure
+    opens it again for twice as long, up to `max_delay`. Every delay is
+    jittered by up to `jitter` of itself so several Fusion instances do not
+    probe in step. Failures that only a config change fixes start at
+    `max_delay`, and reset() closes the breaker when the config changes.
+
+    Thread-safe; allow() and the record methods are called from the
+    dispatcher's worker thread and reset() from the UI thread.
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_delay: float = 15, max_delay: float = 900,
+                 jitter: float = 0.25, clock=time.monotonic, rng=random.random):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._clock = clock
+        self._rng = rng
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.last_failure = None
+        self._opened = 0
+        self._retry_at = 0.0
+
+    def allow(self) -> bool:
+        """True if a submission may go out now. Moves an expired open breaker to half-open."""
+        with self._lock:
+            if self.state == CLOSED: return True
+            if self.state == HALF_OPEN or self._clock() < self._retry_at: return False
+            self.state = HALF_OPEN
+            metrics.inc('breaker.probes')
+            return True
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next probe is due; 0 when closed or due now."""
+        with self._lock:
+            if self.state != OPEN: return 0.0
+            return max(0.0, self._retry_at - self._clock())
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED: logger.info('Heartbeats are going through again; resuming.')
+            self.state = CLOSED
+            self.failures = 0
+            self._opened = 0
+
+    def record_failure(self, kind: str = FAILURE_ERROR):
+        with self._lock:
+            self.failures += 1
+            self.last_failure = kind
+            metrics.inc(f'breaker.failures.{kind}')
+            needs_config = kind in (FAILURE_AUTH, FAILURE_CONFIG)
+            if self.state == CLOSED and self.failures < self.failure_threshold and not needs_config: return
+            self._opened += 1
+            delay = self.max_delay if needs_config else min(self.max_delay, self.base_delay * 2 ** (self._opened - 1))
+            delay *= 1 + self.jitter * (2 * self._rng() - 1)
+            self.state = OPEN
+            self._retry_at = self._clock() + delay
+            metrics.inc('breaker.opened')
+            logger.warning('Heartbeat submissions failing (%s, %d in a row); holding them and retrying in %.0fs.',
+                           kind, self.failures, delay)
+
+    def reset(self):
+        """Closes the breaker, e.g. after the config changed."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._opened = 0
@@ -0,0 +1,144 @@
+from .logs import logger
+from .telemetry import metrics
+
+DEFAULT_CATEGORY = 'designing'
+DEFAULT_LANGUAGE = 'Fusion360'
+
+# Categories wakatime-cli accepts for --category.
+CATEGORIES = frozenset((
+    'coding', 'building', 'indexing', 'debugging', 'running tests', 'writing tests', 'manual testing',
+    'writing docs', 'code reviewing', 'communicating', 'researching', 'learning', 'designing', 'planning',
+    'browsing', 'meeting', 'translating', 'supporting', 'ai coding',
+))
+
+SKETCHING = ('designing', 'Fusion360 Sketch')
+MODELING = (DEFAULT_CATEGORY, DEFAULT_LANGUAGE)
+MANUFACTURING = ('building', 'Fusion360 CAM')
+SIMULATION = ('running tests', 'Fusion360 Simulation')
+DRAWING = ('writing docs', 'Fusion360 Drawing')
+RENDERING = ('designing', 'Fusion360 Render')
+
+# Product types, workspace IDs and command-ID families of Fusion's own tools. A key ending in
+# '*' matches every ID starting with it, any other key only that ID; case is
+# ignored. Commands not listed here (selecting, orbiting, undo) keep whatever
+# the last classified command or workspace set.
+DEFAULT_RULES = {
+    'DesignProductType': MODELING,
+    'CAMProductType': MANUFACTURING,
+    'DrawingProductType': DRAWING,
+    'FusionSolidEnvironment': MODELING,
+    'CAMEnvironment': MANUFACTURING,
+    'SimulationEnvironment': SIMULATION,
+    'FusionDocumentationEnvironment': DRAWING,
+    'FusionRenderEnvironment': RENDERING,
+    'FusionAnimationEnvironment': DRAWING,
+    'GenerativeEnvironment': SIMULATION,
+    'Sketch*': SKETCHING,
+    'SketchStop': MODELING,
+    'Extrude*': MODELING,
+    'Primitive*': MODELING,
+    'Iron*': MANUFACTURING,
+    'CAM*': MANUFACTURING,
+    'Drawing*': DRAWING,
+    'Render*': RENDERING,
+    'InCanvasRender*': RENDERING,
+}
+
+_VALUE = ''  # Trie nodes are dicts of single characters, so the empty key can hold a node's value.
+_MISSING = object()
+
+
+def parse_rule(value: str) -> tuple:
+    """Parses a 'category' or 'category, language' config value into (category, language).
+
+    Raises ValueError for a category wakatime-cli would reject.
+    """
+    category, _, language = (part.strip() for part in value.partition(','))
+    category = category.lower()
+    if category not in CATEGORIES:
+        raise ValueError(f"unknown category '{category}', expected one of {', '.join(sorted(CATEGORIES))}")
+    return category, language or DEFAULT_LANGUAGE
+
+
+def parse_rules(items) -> dict:
+    """Parses (key, value) pairs of a categories config section, skipping invalid ones with a warning."""
+    rules = {}
+    for key, value in items:
+        try: rules[key] = parse_rule(value)
+        except ValueError as e: logger.warning('Ignoring category rule %r: %s', key, e)
+    return rules
+
+
+class CategoryClassifier:
+    """Maps Fusion command and workspace IDs to the (category, language) of heartbeats.
+
+    The rules are compiled once per config version into a dict of exact IDs
+    and a prefix trie for command families, and every ID seen is memoized,
+    so classifying the command of a commandStarting event is normally a
+    single dict probe on the UI thread.
+
+    workspace() and command() are fed from the event handlers and kind()
+    gives what the next heartbeat is sent with. A classified command
+    overrides the workspace's kind until the workspace changes; while neither
+    is known (before the first workspace switch, or in a third-party
+    workspace) the active product decides.
+    """
+
+    def __init__(self, rules: dict = None, max_cached: int = 4096):
+        self.max_cached = max_cached
+        self.current = None
+        self._exact = {}
+        self._trie = {}
+        self._cache = {}
+        self.load(rules)
+
+    def load(self, rules: dict = None):
+        """Compiles DEFAULT_RULES overridden by `rules`, whose values are (category, language) tuples."""
+        exact, trie = {}, {}
+        for key, kind in dict(DEFAULT_RULES, **(rules or {})).items():
+            key = key.strip().lower()
+            if key.endswith('*'):
+                node = trie
+                for char in key[:-1]: node = node.setdefault(char, {})
+                node[_VALUE] = kind
+            elif key:
+                exact[key] = kind
+        # Swapped in whole, so a handler running meanwhile sees either the old tables or the new ones.
+        self._exact, self._trie, self._cache = exact, trie, {}
+
+    def classify(self, identifier: str):
+        """Returns the (category, language) of a command or workspace ID, or None if no rule matches."""
+        cache = self._cache
+        kind = cache.get(identifier, _MISSING)
+        if kind is _MISSING:
+            metrics.inc('categories.cache_misses')
+            kind = self._lookup(identifier)
+            logger.debug('Category of %r: %s', identifier, kind or 'unchanged')
+            if len(cache) >= self.max_cached: cache.clear()
+            cache[identifier] = kind
+        return kind
+
+    def workspace(self, workspace_id: str):
+        self.current = self.classify(workspace_id)
+
+    def command(self, command_id: str):
+        kind = self.classify(command_id)
+        if kind is not None: self.current = kind
+
+    def kind(self, product: str = None) -> tuple:
+        """The (category, language) for a heartbeat in a document whose active product has type `product`."""
+        return self.current or self.classify(product) or MODELING
+
+    def _lookup(self, identifier: str):
+        if not identifier: return None
+        key = identifier.lower()
+        kind = self._exact.get(key)
+        if kind is not None: return kind
+        # The longest matching prefix wins.
+        node, kind = self._trie, None
+        for char in key:
+            node = node.get(char)
+            if node is None: break
+            kind = node.get(_VALUE, kind)
+        return kind
+
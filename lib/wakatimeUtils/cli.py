@@ -0,0 +1,105 @@
+import json
+import sys
+
+from .breaker import FAILURE_AUTH, FAILURE_CONFIG, FAILURE_ERROR, FAILURE_OFFLINE
+
+# wakatime-cli exit codes. On API and backoff errors the CLI has already
+# saved the heartbeats to its own offline queue, so they count as delivered.
+EXIT_SUCCESS = 0
+EXIT_API_ERROR = 102
+EXIT_CONFIG_PARSE_ERROR = 103
+EXIT_AUTH_ERROR = 104
+EXIT_CONFIG_READ_ERROR = 110
+EXIT_CONFIG_WRITE_ERROR = 111
+EXIT_BACKOFF = 112
+ACCEPTED_EXIT_CODES = (EXIT_SUCCESS, EXIT_API_ERROR, EXIT_BACKOFF)
+CONFIG_EXIT_CODES = (EXIT_CONFIG_PARSE_ERROR, EXIT_CONFIG_READ_ERROR, EXIT_CONFIG_WRITE_ERROR)
+
+# Lower-case stderr fragments that identify a failure when the exit code alone does not.
+_AUTH_MARKERS = ('invalid api key', 'api key not found', 'unauthorized', 'forbidden')
+_OFFLINE_MARKERS = (
+    'connection refused', 'no such host', 'network is unreachable', 'timeout', 'timed out',
+    'connection reset', 'tls handshake', 'temporary failure in name resolution',
+)
+
+
+def classify_failure(returncode: int, stderr: str = '') -> str:
+    """Returns the FAILURE_* kind for a wakatime-cli run that did not exit with EXIT_SUCCESS."""
+    if returncode == EXIT_AUTH_ERROR: return FAILURE_AUTH
+    if returncode in CONFIG_EXIT_CODES: return FAILURE_CONFIG
+    if returncode in (EXIT_API_ERROR, EXIT_BACKOFF): return FAILURE_OFFLINE
+    text = (stderr or '').lower()
+    if any(marker in text for marker in _AUTH_MARKERS): return FAILURE_AUTH
+    if any(marker in text for marker in _OFFLINE_MARKERS): return FAILURE_OFFLINE
+    return FAILURE_ERROR
+
+
+def build_command(cli: str, heartbeat: dict, plugin: str, extra_heartbeats: bool = False) -> list:
+    """Builds the wakatime-cli argument list for a single heartbeat.
+
+    Arguments:
+    cli -- Path to the wakatime-cli executable.
+    heartbeat -- The heartbeat dict built on the UI thread.
+    plugin -- The plugin identifier sent with --plugin.
+    extra_heartbeats -- Adds --extra-heartbeats so more heartbeats can be
+                        streamed to the CLI on stdin, see extra_heartbeats_input.
+    """
+    command = [
+        cli, '--entity', heartbeat['entity'], '--plugin', plugin,
+        '--project', heartbeat['project'], '--language', heartbeat['language'],
+        '--category', heartbeat['category'], '--time', f"{heartbeat['timestamp']:.6f}"
+    ]
+    if heartbeat.get('is_write'): command.append('--write')
+    elif heartbeat.get('is_unsaved_entity'): command.append('--is-unsaved-entity')
+    if extra_heartbeats: command.append('--extra-heartbeats')
+    return command
+
+
+def build_batch_command(cli: str, heartbeats: list, plugin: str):
+    """Builds a single CLI invocation for a batch of heartbeats.
+
+    The first heartbeat goes on the command line and the rest are returned as
+    the JSON array to write to the CLI's stdin. Returns (command, stdin), where
+    stdin is None for a batch of one.
+    """
+    if len(heartbeats) == 1:
+        return build_command(cli, heartbeats[0], plugin), None
+    return build_command(cli, heartbeats[0], plugin, extra_heartbeats=True), extra_heartbeats_input(heartbeats[1:])
+
+
+def extra_heartbeats_input(heartbeats: list) -> str:
+    """Serializes heartbeats in the JSON format --extra-heartbeats reads from stdin."""
+    return json.dumps(heartbeats) + '\n'
+
+
+def spawn_cli(command: list, piped_stdin: bool = False) -> 'subprocess.Popen':
+    """Starts wakatime-cli without waiting for it, hiding the console window on Windows."""
+    # subprocess is imported on first use so loading the add-in does not pay for it.
+    import subprocess
+    creationflags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+    return subprocess.Popen(
+        command, creationflags=creationflags,
+        stdin=subprocess.PIPE if piped_stdin else subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+
+
+def wait_cli(process: 'subprocess.Popen', timeout: float = 15, stdin: str = None):
+    """Feeds stdin to a spawned CLI and waits for it to exit.
+
+    Returns a (returncode, stdout, stderr) tuple. The process is killed if it
+    does not finish within the timeout and subprocess.TimeoutExpired is raised.
+    """
+    import subprocess
+    try:
+        stdout, stderr = process.communicate(input=stdin, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise
+    return process.returncode, stdout, stderr
+
+
+def run_cli(command: list, timeout: float = 15, stdin: str = None):
+    """Runs wakatime-cli and waits for it to exit, see wait_cli."""
+    return wait_cli(spawn_cli(command, piped_stdin=stdin is not None), timeout=timeout, stdin=stdin)
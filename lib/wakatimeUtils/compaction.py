@@ -0,0 +1,62 @@
+import threading
+
+from .telemetry import metrics
+
+DEFAULT_COMPACTION_EPSILON = 60
+
+
+class HeartbeatCompactor:
+    """Merges runs of equivalent heartbeats in a batch before it is sent.
+
+    Heartbeats are equivalent when every field but the timestamp matches
+    (entity, project, language, category, is_write, ...). After sorting a
+    batch by time, each run of consecutive equivalent heartbeats spanning no
+    more than `epsilon` seconds is cut down to its first and last heartbeat,
+    or to one when they share a timestamp.
+
+    WakaTime computes durations from the gaps between consecutive heartbeats,
+    crediting each gap no longer than its timeout to the earlier heartbeat.
+    The gaps inside a run sum to the run's span and are all credited to the
+    same key, and so is the single gap left after compaction, so durations
+    are unchanged for any timeout of at least `epsilon`. The gaps to the
+    heartbeats around a run are kept as they were. A save storm of identical
+    write heartbeats therefore goes out as two.
+
+    `ratio` is heartbeats received over heartbeats kept, since start.
+    compact() runs on the dispatcher's worker thread.
+    """
+
+    def __init__(self, epsilon: float = DEFAULT_COMPACTION_EPSILON):
+        self.epsilon = epsilon
+        self.received = 0
+        self.kept = 0
+        self._lock = threading.Lock()
+        metrics.gauge('compaction.ratio', lambda: self.ratio)
+
+    @property
+    def ratio(self) -> float:
+        return round(self.received / self.kept, 3) if self.kept else 1.0
+
+    def compact(self, heartbeats: list) -> list:
+        """Returns the heartbeats of a batch, sorted by time, with runs of equivalent ones merged."""
+        compacted = []
+        first = last = None
+        first_key = None
+        for heartbeat in sorted(heartbeats, key=lambda heartbeat: heartbeat['timestamp']):
+            key = {name: value for name, value in heartbeat.items() if name != 'timestamp'}
+            if first is not None and key == first_key and heartbeat['timestamp'] - first['timestamp'] <= self.epsilon:
+                last = heartbeat
+                continue
+            if first is not None: _close_run(compacted, first, last)
+            first, last, first_key = heartbeat, heartbeat, key
+        if first is not None: _close_run(compacted, first, last)
+        with self._lock:
+            self.received += len(heartbeats)
+            self.kept += len(compacted)
+        metrics.inc('compaction.merged', len(heartbeats) - len(compacted))
+        return compacted
+
+
+def _close_run(compacted: list, first: dict, last: dict):
+    compacted.append(first)
+    if last['timestamp'] != first['timestamp']: compacted.append(last)
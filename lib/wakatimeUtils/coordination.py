@@ -0,0 +1,287 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Callable
+
+from .logs import logger
+from .telemetry import metrics
+
+ELECTING = 'electing'
+LEADER = 'leader'
+FOLLOWER = 'follower'
+
+# How often the leader's connection threads check whether it is stopping.
+POLL_INTERVAL = 0.5
+# Attempts a stopping follower makes to hand over heartbeats its leader never got.
+FINAL_ATTEMPTS = 3
+# How long a follower waits for the leader to acknowledge a heartbeat before giving up on it.
+ACK_TIMEOUT = 10
+
+_ACK = b'ok'
+
+_STOP = object()
+
+
+def leader_address(directory: str) -> str:
+    """The local IPC address followers reach the leader at: a named pipe on Windows, a Unix socket elsewhere."""
+    if sys.platform == 'win32':
+        return r'\\.\pipe\wakatime-fusion360-' + (os.environ.get('USERNAME') or 'user')
+    return os.path.join(directory, 'fusion360-leader.sock')
+
+
+class InstanceCoordinator:
+    """Lets exactly one running add-in instance own the heartbeat dispatcher.
+
+    Leadership is an exclusive OS lock on `lock_path`, held for as long as the
+    instance runs and released by the OS if it dies. The leader calls
+    `on_leader` (which starts its dispatcher), listens at `address` with
+    multiprocessing.connection, and hands every heartbeat it receives to
+    `deliver`. Every other instance is a follower: it connects to the leader
+    and forwards its heartbeats there, so all instances share one batch
+    window and one wakatime-cli. A follower whose leader goes away runs the
+    election again, and one of them takes over.
+
+    The leader acknowledges each heartbeat once `deliver` has taken it. A
+    follower keeps a heartbeat until that acknowledgement arrives and sends
+    it again to whichever instance leads next, so a leader that crashes or
+    stops with heartbeats still in its socket loses none of them; at worst a
+    heartbeat arrives twice.
+
+    Connections are authenticated with a random key the leader writes next to
+    the lock file, readable only by the user; messages are JSON, never pickles.
+
+    submit() is called on the Fusion UI thread and never blocks. A follower
+    queues heartbeats for its forwarding thread and keeps up to `max_buffered`
+    of them while there is no leader to forward to.
+    """
+
+    def __init__(self, lock_path: str, address: str, deliver: Callable[[dict], None],
+                 on_leader: Callable[[], None] = None, retry_interval: float = 2, max_buffered: int = 1000):
+        self.lock_path = lock_path
+        self.key_path = os.path.splitext(lock_path)[0] + '.key'
+        self.address = address
+        self.role = ELECTING
+        self._deliver = deliver
+        self._on_leader = on_leader
+        self._retry_interval = retry_interval
+        self._max_buffered = max_buffered
+        self._queue = queue.Queue()
+        self._unsent = None
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._key = None
+        self._listener = None
+        self._serving = []
+        self._thread = None
+        self._stop_event = None
+        metrics.gauge('coordinator.role', lambda: self.role)
+        metrics.gauge('coordinator.buffered', self._queue.qsize)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.role == LEADER
+
+    def start(self, stop_event: threading.Event):
+        """Runs the election on a background thread. Setting `stop_event` ends it."""
+        if self._thread is not None:
+            # A thread that outlived stop()'s timeout may still hold the lock or the leader's socket.
+            logger.warning('Coordinator from the last run is still running; not starting another.')
+            return
+        self._stop_event = stop_event
+        self.role = ELECTING
+        self._thread = threading.Thread(target=self._run, name='WakaTimeCoordinator', daemon=True)
+        self._thread.start()
+
+    def submit(self, heartbeat: dict):
+        """Delivers a heartbeat locally on the leader, or queues it for forwarding. Never blocks."""
+        with self._lock:
+            if self.role == LEADER: return self._deliver(heartbeat)
+            if self._queue.qsize() >= self._max_buffered:
+                metrics.inc('coordinator.dropped')
+                return
+            self._queue.put_nowait(heartbeat)
+
+    def stop(self, timeout: float = None):
+        """Flushes what a follower still holds to its leader, stops listening and joins the thread.
+
+        A leader keeps its lock until release(), so that no other instance
+        takes over (and replays the shared journal) before this one's
+        dispatcher has drained.
+        """
+        if self._thread is None: return
+        self._stop_event.set()
+        self._queue.put_nowait(_STOP)
+        if self._listener is not None: self._wake_listener()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning('Coordinator did not finish within %ss.', timeout)
+        else:
+            self._thread = None
+        if self.role != LEADER and self._holding():
+            left = sum(item is not _STOP for item in list(self._queue.queue)) + (self._unsent is not None)
+            logger.warning('%d heartbeat(s) could not be forwarded to the leading instance.', left)
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                if self._acquire():
+                    self._lead()
+                    return
+                if not self._follow(): self._stop_event.wait(self._retry_interval)
+            # Stopping while the leader was away: take over just to send what we
+            # hold, or hand it to whoever leads by now.
+            for _ in range(FINAL_ATTEMPTS):
+                if not self._holding(): return
+                if self._acquire(): return self._lead()
+                if not self._follow(): time.sleep(POLL_INTERVAL)
+        except Exception:
+            logger.exception('Instance coordination failed.')
+        finally:
+            if self.role != LEADER: self.release()
+
+    def _holding(self) -> bool:
+        # True while heartbeats, not just the stop marker, wait to be forwarded.
+        return self._unsent is not None or any(item is not _STOP for item in list(self._queue.queue))
+
+    # --- Leader ---
+    def _lead(self):
+        with self._lock:
+            self.role = LEADER
+            self._flush_local()
+        if self._on_leader: self._on_leader()
+        if self._stop_event.is_set(): return
+        logger.info('Leading instance: heartbeats from other Fusion 360 instances are sent from here.')
+        self._listen()
+
+    def _listen(self):
+        from multiprocessing.connection import Listener
+        self._key = os.urandom(32)
+        self._write_key(self._key)
+        if not self.address.startswith('\\\\'):
+            # The lock is ours, so a socket file left behind is from a leader that is gone.
+            try: os.unlink(self.address)
+            except FileNotFoundError: pass
+        self._listener = Listener(self.address, backlog=16, authkey=self._key)
+        try:
+            while not self._stop_event.is_set():
+                try: connection = self._listener.accept()
+                except Exception as e:
+                    if self._stop_event.is_set(): break
+                    logger.warning('Rejected a connection from another instance: %s', e)
+                    continue
+                if self._stop_event.is_set():
+                    connection.close()
+                    break
+                thread = threading.Thread(target=self._serve, args=(connection,), name='WakaTimeFollower', daemon=True)
+                self._serving = [serving for serving in self._serving if serving.is_alive()] + [thread]
+                thread.start()
+        finally:
+            self._listener.close()
+            self._listener = None
+            for thread in self._serving: thread.join(2 * POLL_INTERVAL)
+
+    def _flush_local(self):
+        # Heartbeats queued while the election ran, or while following a leader that went away.
+        if self._unsent is not None:
+            self._deliver(self._unsent)
+            self._unsent = None
+        while True:
+            try: heartbeat = self._queue.get_nowait()
+            except queue.Empty: return
+            if heartbeat is not _STOP: self._deliver(heartbeat)
+
+    def _serve(self, connection):
+        # Polls rather than blocking in recv, so the connection is closed from
+        # this thread once we stop and the follower notices straight away.
+        try:
+            while not self._stop_event.is_set():
+                if connection.poll(POLL_INTERVAL): self._receive(connection)
+            # Whatever a follower sent before we stopped is still delivered.
+            while connection.poll(0): self._receive(connection)
+        except (EOFError, OSError):
+            pass
+        except Exception:
+            logger.exception('Dropped a connection from another instance.')
+        finally:
+            connection.close()
+
+    def _receive(self, connection):
+        self._deliver(json.loads(connection.recv_bytes()))
+        connection.send_bytes(_ACK)
+        metrics.inc('coordinator.received')
+
+    def _wake_listener(self):
+        # accept() cannot be interrupted from another thread, so connect to it instead.
+        from multiprocessing.connection import Client
+        try: Client(self.address, authkey=self._key).close()
+        except Exception: pass
+
+    def _write_key(self, key: bytes):
+        temporary_path = self.key_path + '.tmp'
+        fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f: f.write(key)
+        os.replace(temporary_path, self.key_path)
+
+    # --- Follower ---
+    def _follow(self) -> bool:
+        # Forwards queued heartbeats until the leader goes away or we stop.
+        # Returns False if no leader could be reached.
+        from multiprocessing.connection import Client
+        try:
+            with open(self.key_path, 'rb') as f: key = f.read()
+            connection = Client(self.address, authkey=key)
+        except Exception as e:
+            logger.debug('No leading instance to forward heartbeats to yet: %s', e)
+            return False
+        if self.role != FOLLOWER: logger.info('Forwarding heartbeats to the leading Fusion 360 instance.')
+        self.role = FOLLOWER
+        try:
+            while True:
+                heartbeat = self._unsent
+                if heartbeat is None: heartbeat = self._unsent = self._queue.get()
+                if heartbeat is _STOP:
+                    self._unsent = None
+                    if self._stop_event.is_set(): return True
+                    continue
+                connection.send_bytes(json.dumps(heartbeat).encode('utf-8'))
+                # Sent only means the bytes reached the socket; the heartbeat is the leader's once acknowledged.
+                if not connection.poll(ACK_TIMEOUT): raise TimeoutError('no acknowledgement from the leader')
+                connection.recv_bytes()
+                self._unsent = None
+                metrics.inc('coordinator.forwarded')
+        except (EOFError, OSError) as e:
+            logger.info('Lost the leading instance (%s); electing a new one.', e)
+            return True
+        finally:
+            connection.close()
+
+    # --- Lock ---
+    def _acquire(self) -> bool:
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if sys.platform == 'win32':
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def release(self):
+        """Gives up leadership, letting another instance take over."""
+        if self._lock_fd is None: return
+        if sys.platform == 'win32':
+            import msvcrt
+            os.lseek(self._lock_fd, 0, os.SEEK_SET)
+            try: msvcrt.locking(self._lock_fd, msvcrt.LK_UNLCK, 1)
+            except OSError: pass
+        os.close(self._lock_fd)
+        self._lock_fd = None
@@ -0,0 +1,173 @@
+import datetime
+import threading
+from typing import Callable
+
+from .telemetry import metrics
+
+
+class TodayTotals:
+    """Running totals for the current local day, by project and by document.
+
+    The stats store calls add() with each slice of time it credits, so the
+    totals are never recomputed; on an instance that does not record, sync()
+    reloads them from the store instead. Every key add() touches is remembered until
+    drain() hands the changed values to the dashboard, which is then only sent
+    what moved since its last update.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.day = datetime.date.today().isoformat()
+        self.total = 0.0
+        self.projects = {}
+        self.entities = {}
+        self._changed_projects = set()
+        self._changed_entities = set()
+        self._changed_total = False
+        self._reset = False
+
+    def seed(self, day: str, projects: dict, entities: dict):
+        """Replaces the totals with ones loaded from the store, for `day`."""
+        with self._lock:
+            self._start_day(day)
+            self.projects = dict(projects)
+            self.entities = dict(entities)
+            self.total = sum(self.projects.values())
+
+    def sync(self, day: str, projects: dict, entities: dict):
+        """Replaces the totals with ones reloaded from the store, remembering only the keys that moved."""
+        with self._lock:
+            if day != self.day or not (self.projects.keys() <= projects.keys()
+                                       and self.entities.keys() <= entities.keys()):
+                if day < self.day: return
+                self._start_day(day)
+            self._changed_projects.update(key for key, value in projects.items() if self.projects.get(key) != value)
+            self._changed_entities.update(key for key, value in entities.items() if self.entities.get(key) != value)
+            self.projects = dict(projects)
+            self.entities = dict(entities)
+            total = sum(self.projects.values())
+            if total != self.total: self._changed_total = True
+            self.total = total
+
+    def add(self, day: str, project: str, entity: str, seconds: float):
+        with self._lock:
+            if day != self.day:
+                if day < self.day: return
+                self._start_day(day)
+            self.total += seconds
+            self.projects[project] = self.projects.get(project, 0.0) + seconds
+            self.entities[entity] = self.entities.get(entity, 0.0) + seconds
+            self._changed_total = True
+            self._changed_projects.add(project)
+            self._changed_entities.add(entity)
+
+    def drain(self) -> dict:
+        """Returns what changed since the last drain(), or an empty dict when nothing did.
+
+        A delta carrying `reset` replaces everything the receiver has: the
+        day rolled over or the totals were reloaded.
+        """
+        with self._lock:
+            delta = {}
+            if self._reset: delta['reset'] = True
+            if self._changed_total or self._reset: delta.update(day=self.day, total=self.total)
+            if self._changed_projects:
+                delta['projects'] = {project: self.projects[project] for project in self._changed_projects}
+            if self._changed_entities:
+                delta['entities'] = {entity: self.entities[entity] for entity in self._changed_entities}
+            self._changed_projects = set()
+            self._changed_entities = set()
+            self._changed_total = False
+            self._reset = False
+            return delta
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'reset': True, 'day': self.day, 'total': self.total,
+                    'projects': dict(self.projects), 'entities': dict(self.entities)}
+
+    def _start_day(self, day: str):
+        self.day = day
+        self.total = 0.0
+        self.projects = {}
+        self.entities = {}
+        self._changed_projects = set()
+        self._changed_entities = set()
+        self._reset = True
+
+
+class DashboardFeed:
+    """Produces the small JSON-able deltas the dashboard palette is updated with.
+
+    Combines the day's totals with a handful of health values, each read from
+    a `sources` callable. A health value is only included when it differs
+    from what was last sent.
+    """
+
+    def __init__(self, totals: TodayTotals, sources: dict = None):
+        self._totals = totals
+        self._sources = sources if sources is not None else default_health_sources()
+        self._sent = {}
+
+    def delta(self) -> dict:
+        delta = self._totals.drain()
+        health = self._health(only_changed=True)
+        if health: delta['health'] = health
+        return delta
+
+    def full(self) -> dict:
+        """Everything, for a palette that has just loaded. Later deltas build on it."""
+        self._totals.drain()
+        self._sent = {}
+        return dict(self._totals.snapshot(), health=self._health(only_changed=False))
+
+    def _health(self, only_changed: bool) -> dict:
+        values = {}
+        for name, source in self._sources.items():
+            try: value = source()
+            except Exception: continue
+            if only_changed and self._sent.get(name) == value: continue
+            self._sent[name] = value
+            values[name] = value
+        return values
+
+
+def default_health_sources() -> dict:
+    # Read straight from the metrics the dispatcher and executors already keep.
+    send = metrics.histogram('dispatcher.send')
+    queue_depth = metrics.gauge('dispatcher.queue_depth')
+    sent = metrics.counter('heartbeats.sent')
+    failed = metrics.counter('heartbeats.failed')
+    breaker = metrics.gauge('dispatcher.breaker')
+    role = metrics.gauge('coordinator.role')
+    sources = {
+        # On a follower the heartbeats are sent, and counted, by the leading instance.
+        'role': role.snapshot,
+        'breaker': breaker.snapshot,
+        'queue_depth': queue_depth.snapshot,
+        'sent': lambda: sent.value,
+        'failed': lambda: failed.value,
+    }
+    sources.update(_histogram_sources('send', send))
+    return sources
+
+
+def _histogram_sources(prefix: str, histogram) -> dict:
+    # One snapshot serves all three values; it is only taken when the count moved.
+    cache = {'count': None, 'snapshot': None}
+
+    def read(key: str) -> Callable[[], float]:
+        def source():
+            count = histogram.count
+            if cache['count'] != count:
+                cache['count'] = count
+                cache['snapshot'] = histogram.snapshot()
+            value = cache['snapshot'][key]
+            # JSON has no infinity; the overflow bucket reads as unknown.
+            return None if value == float('inf') else value
+        return source
+    return {f'{prefix}_avg_ms': read('avg_ms'), f'{prefix}_p95_ms': read('p95_ms'), f'{prefix}_max_ms': read('max_ms')}
+
+
+# Today's totals, shared by the stats store that fills them and the dashboard palette.
+today_totals = TodayTotals()
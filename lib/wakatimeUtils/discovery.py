@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import sys
+from typing import NamedTuple
+
+from .cli import run_cli
+from .logs import logger
+from .telemetry import metrics
+
+GENERIC_CLI_NAME = 'wakatime-cli'
+PROBE_TIMEOUT = 10
+
+
+class CliInstall(NamedTuple):
+    path: str
+    size: int
+    mtime_ns: int
+    version: str
+
+
+def cli_filename() -> str:
+    """The platform specific name wakatime-cli releases are published under."""
+    import platform
+    os_name = 'windows' if sys.platform == 'win32' else ('darwin' if sys.platform == 'darwin' else 'linux')
+    machine = platform.machine().lower()
+    arch_name = 'arm64' if 'arm64' in machine or 'aarch64' in machine else 'amd64'
+    return f'wakatime-cli-{os_name}-{arch_name}' + ('.exe' if os_name == 'windows' else '')
+
+
+def wakatime_home() -> str:
+    """$WAKATIME_HOME when it is set, the user's home directory otherwise."""
+    return os.path.expanduser(os.environ.get('WAKATIME_HOME') or '~')
+
+
+class CliLocator:
+    """Finds a runnable wakatime-cli and remembers it across sessions.
+
+    Searches $WAKATIME_HOME/.wakatime, ~/.wakatime, the home directories
+    themselves and PATH, for both the platform specific and the generic
+    binary name, and runs `--version` on each candidate until one answers.
+    The winner's path, size, mtime and version are written to `cache_path`;
+    later sessions only stat that file to confirm nothing changed.
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+
+    def locate(self) -> CliInstall:
+        """Returns the CliInstall to use, or None when no runnable CLI was found."""
+        cached = self._load_cache()
+        if cached is not None and _stat_matches(cached):
+            metrics.inc('cli.discovery.cache_hits')
+            return cached
+        for path in self.candidates():
+            install = self.probe(path)
+            if install is not None:
+                self._save_cache(install)
+                return install
+        return None
+
+    def candidates(self) -> list:
+        names = [cli_filename(), GENERIC_CLI_NAME + ('.exe' if sys.platform == 'win32' else '')]
+        home = wakatime_home()
+        directories = [os.path.join(home, '.wakatime'), os.path.join(os.path.expanduser('~'), '.wakatime'),
+                       home, os.path.expanduser('~')]
+        paths = [os.path.join(directory, name) for directory in directories for name in names]
+        paths.extend(filter(None, (shutil.which(name) for name in names)))
+        return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+    def probe(self, path: str) -> CliInstall:
+        """Runs `path --version` and returns its CliInstall when it is a working CLI."""
+        if not os.path.isfile(path): return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        metrics.inc('cli.discovery.probes')
+        try:
+            returncode, stdout, stderr = run_cli([path, '--version'], timeout=PROBE_TIMEOUT)
+        except Exception as e:
+            logger.warning('Could not run %s: %s', path, e)
+            return None
+        if returncode != 0:
+            logger.warning('%s --version exited with code %s.', path, returncode)
+            return None
+        version = (stdout.strip() or stderr.strip()).splitlines()
+        return CliInstall(path, stat.st_size, stat.st_mtime_ns, version[0] if version else 'unknown')
+
+    def invalidate(self):
+        try: os.remove(self.cache_path)
+        except OSError: pass
+
+    def _load_cache(self) -> CliInstall:
+        try:
+            with open(self.cache_path, encoding='utf-8') as f: return CliInstall(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _save_cache(self, install: CliInstall):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temporary = self.cache_path + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as f: json.dump(install._asdict(), f)
+            os.replace(temporary, self.cache_path)
+        except OSError as e:
+            logger.warning('Could not cache the wakatime-cli location: %s', e)
+
+
+def _stat_matches(install: CliInstall) -> bool:
+    try:
+        stat = os.stat(install.path)
+    except OSError:
+        return False
+    return stat.st_size == install.size and stat.st_mtime_ns == install.mtime_ns
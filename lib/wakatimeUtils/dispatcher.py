@@ -0,0 +1,241 @@
+import collections
+import queue
+import threading
+import time
+from typing import Callable
+
+from .breaker import FAILURE_ERROR, OPEN, DeliveryError
+from .logs import logger
+from .telemetry import metrics
+
+_STOP = object()
+
+
+class HeartbeatDispatcher:
+    """Hands heartbeats from the Fusion UI thread to a long-lived worker thread.
+
+    Event handlers only pay for a queue put. The worker collects whatever
+    arrives within `batch_window` seconds of the first queued heartbeat (up to
+    `max_batch_size`) and calls `send` once with the whole batch, so a slow
+    wakatime-cli never blocks Fusion and bursts cost a single CLI run.
+
+    `send` returns True once the batch has been handed off. With a `journal`,
+    every batch is recorded before `send` runs and acknowledged after it
+    succeeds; whatever is left unacknowledged is replayed when the worker
+    starts again. With a `stats` store, new heartbeats are recorded there
+    before they are sent; replayed ones already were.
+
+    With a `breaker` (a CircuitBreaker), `send` is not called at all while
+    the breaker is open: batches are held in the journal (or in memory, up to
+    `max_held` heartbeats, without one) and the worker wakes up on its own
+    when the next probe is due. Once a batch goes through, whatever was held
+    is sent in batches, oldest first.
+
+    With a `compactor` (a HeartbeatCompactor), each new batch is compacted
+    after it has been recorded in the stats store and before it is journaled
+    and sent.
+    """
+
+    def __init__(self, send: Callable[[list], bool], batch_window: float = 0, max_batch_size: int = 1,
+                 journal=None, stats=None, breaker=None, max_held: int = 10000, compactor=None):
+        self._send = send
+        self._journal = journal
+        self._stats = stats
+        self._breaker = breaker
+        self._compactor = compactor
+        self._batch_window = batch_window
+        self._max_batch_size = max(1, max_batch_size)
+        self._queue = queue.Queue()
+        # Held heartbeats that could not be journaled; journaled ones stay unacknowledged in the journal.
+        self._held = collections.deque(maxlen=max_held)
+        self._backlog = False
+        metrics.gauge('dispatcher.queue_depth', self._queue.qsize)
+        metrics.gauge('dispatcher.held', lambda: len(self._held))
+        if breaker is not None: metrics.gauge('dispatcher.breaker', lambda: breaker.state)
+        self._thread = None
+        self._stop_event = None
+
+    def start(self, stop_event: threading.Event):
+        """Starts the worker thread. Setting `stop_event` makes it drain and exit."""
+        if self._thread is not None:
+            # A worker that outlived stop()'s timeout still owns the queue and journal; never run two.
+            logger.warning('Heartbeat worker from the last run is still running; not starting another.')
+            return
+        self._stop_event = stop_event
+        self._thread = threading.Thread(target=self._run, name='WakaTimeDispatcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, heartbeat: dict):
+        """Queues a heartbeat. Never blocks."""
+        self._queue.put_nowait(heartbeat)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self, timeout: float = None):
+        """Signals the worker, lets it drain what is already queued and joins it."""
+        if self._thread is None: return
+        self._stop_event.set()
+        self._queue.put_nowait(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning('Heartbeat worker did not finish within %ss; %d heartbeats left queued.', timeout, self._queue.qsize())
+            return
+        self._thread = None
+
+    def _run(self):
+        if self._stats is not None: self._open_stats()
+        if self._journal is not None: self._open_journal()
+        try:
+            while True:
+                try: heartbeat = self._queue.get(timeout=self._wait_timeout())
+                except queue.Empty:
+                    self._drain()
+                    continue
+                if heartbeat is _STOP:
+                    if self._stop_event.is_set(): return
+                    continue
+                batch = [heartbeat]
+                stopping = self._collect(batch)
+                if self._stats is not None: self._record(batch)
+                if self._compactor is not None: batch = self._compactor.compact(batch)
+                if self._deliver(batch) and self._has_backlog(): self._drain()
+                if stopping: return
+        finally:
+            if self._journal is not None: self._journal.close()
+            if self._stats is not None: self._stats.close()
+
+    def _open_journal(self):
+        try:
+            self._journal.open()
+        except Exception:
+            logger.exception('Heartbeat journal unavailable, continuing without it.')
+            self._journal = None
+            return
+        # Heartbeats left unacknowledged by a previous session are sent first.
+        self._backlog = True
+        self._drain()
+
+    def _open_stats(self):
+        try:
+            self._stats.open()
+        except Exception:
+            logger.exception('Local stats store unavailable, continuing without it.')
+            self._stats = None
+
+    def _record(self, batch: list):
+        try: self._stats.record(batch)
+        except Exception:
+            metrics.inc('stats.errors')
+            logger.exception('Could not record %d heartbeat(s) in the local stats store.', len(batch))
+
+    def _wait_timeout(self):
+        # While heartbeats are held, the worker wakes up for the next attempt even if nothing new arrives.
+        if self._breaker is None or not self._has_backlog(): return None
+        return self._breaker.retry_in if self._breaker.state == OPEN else self._breaker.base_delay
+
+    def _has_backlog(self) -> bool:
+        return self._backlog or bool(self._held)
+
+    def _drain(self):
+        # Sends held heartbeats a batch at a time, oldest first, and stops at
+        # the first batch that does not go out.
+        sent = 0
+        if self._journal is not None and self._backlog:
+            try: sent, self._backlog = self._drain_journal()
+            except Exception:
+                metrics.inc('journal.errors')
+                logger.exception('Could not read held heartbeats from the journal.')
+        while self._held and not self._stop_event.is_set():
+            batch = [self._held.popleft() for _ in range(min(self._max_batch_size, len(self._held)))]
+            if not self._deliver(batch, held=True): break
+            sent += len(batch)
+        if sent:
+            metrics.inc('heartbeats.replayed', sent)
+            logger.info('Sent %d held heartbeat(s).', sent)
+
+    def _drain_journal(self):
+        # Returns how many heartbeats went out and whether any are still pending.
+        after_id = 0
+        sent = 0
+        while not self._stop_event.is_set():
+            entries = self._journal.pending(after_id, self._max_batch_size)
+            if not entries: return sent, False
+            after_id = entries[-1][0]
+            if not self._deliver([heartbeat for _, heartbeat in entries], [entry_id for entry_id, _ in entries]):
+                return sent, True
+            sent += len(entries)
+        return sent, True
+
+    def _deliver(self, batch: list, ids: list = None, held: bool = False) -> bool:
+        # Returns True if the batch went out. One that did not is held for
+        # later, unless wakatime-cli queued it itself.
+        if self._journal is not None and ids is None and not held:
+            try: ids = self._journal.append(batch)
+            except Exception:
+                metrics.inc('journal.errors')
+                logger.exception('Could not journal %d heartbeat(s).', len(batch))
+        if self._breaker is not None and not self._breaker.allow():
+            metrics.inc('heartbeats.held', len(batch))
+            self._hold(batch, ids, held)
+            return False
+        started = time.perf_counter()
+        failure = None
+        queued = False
+        try:
+            sent = self._send(batch)
+            if not sent: failure = FAILURE_ERROR
+        except DeliveryError as e:
+            logger.warning('Sending %d heartbeat(s) failed (%s): %s', len(batch), e.kind, e)
+            sent, failure, queued = False, e.kind, e.queued
+            if e.unsent is not None and len(e.unsent) < len(batch):
+                # The start of the batch went out before the failure; only the rest is held.
+                done = len(batch) - len(e.unsent)
+                metrics.inc('heartbeats.sent', done)
+                if ids: self._ack(ids[:done])
+                batch, ids, queued = batch[done:], ids[done:] if ids else ids, not e.unsent
+        except Exception:
+            logger.exception('Sending %d heartbeat(s) failed.', len(batch))
+            sent, failure = False, FAILURE_ERROR
+        if metrics.enabled:
+            metrics.observe('dispatcher.send', time.perf_counter() - started)
+            metrics.inc('heartbeats.sent' if sent or queued else 'heartbeats.failed', len(batch))
+            metrics.inc('batches.sent' if sent or queued else 'batches.failed')
+        if self._breaker is not None:
+            if sent: self._breaker.record_success()
+            else: self._breaker.record_failure(failure)
+        if (sent or queued) and ids: self._ack(ids)
+        elif not sent and not queued:
+            self._hold(batch, ids, held)
+        return sent
+
+    def _ack(self, ids: list):
+        try: self._journal.ack(ids)
+        except Exception:
+            metrics.inc('journal.errors')
+            logger.exception('Could not acknowledge %d journaled heartbeat(s).', len(ids))
+
+    def _hold(self, batch: list, ids: list, held: bool):
+        if ids:
+            self._backlog = True
+        elif held:
+            # Back to the front, so held heartbeats keep their order.
+            self._held.extendleft(reversed(batch))
+        else:
+            self._held.extend(batch)
+
+    def _collect(self, batch: list) -> bool:
+        # Fills the batch until the window closes or it is full. Once stop has
+        # been requested the window is skipped and the queue is drained as is.
+        # Returns True when the stop marker was consumed.
+        deadline = time.monotonic() + self._batch_window
+        while len(batch) < self._max_batch_size:
+            remaining = 0 if self._stop_event.is_set() else deadline - time.monotonic()
+            try: heartbeat = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty: return False
+            if heartbeat is _STOP:
+                if self._stop_event.is_set(): return True
+                continue
+            batch.append(heartbeat)
+        return False
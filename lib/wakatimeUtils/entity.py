@@ -0,0 +1,146 @@
+from typing import NamedTuple
+
+from .logs import logger
+from .telemetry import metrics
+
+DESIGN_PRODUCT = 'DesignProductType'
+
+_UNKNOWN = object()
+
+
+class Resolution(NamedTuple):
+    project: str
+    entity: str
+    is_unsaved: bool
+    product: str  # productType of the active product, e.g. 'DesignProductType' or 'CAMProductType'
+    component: str  # Path of the active occurrence, e.g. 'Arm:1/Pin:1', when component_paths is on
+
+
+class EntityResolver:
+    """Resolves and caches the project, entity, product and component of Fusion documents.
+
+    Walking doc.dataFile, its parentFolder and app.data.activeProject crosses
+    into Fusion and can hit the cloud, so the result is cached per document
+    (keyed on its creationId) until invalidate() is called for it. The active
+    product type is looked up on the first resolve after a workspace or
+    document switch. When `component_paths` is set, the active component's
+    path is cached per (document, product) along with the occurrence it was
+    read from; activating another component fires no event, so every resolve
+    reads the design's activeOccurrence and only walks its path again when
+    that changed. Nothing is looked up from the event handlers themselves.
+    """
+
+    def __init__(self, app, default_project: str = 'Fusion 360', component_paths: bool = False):
+        self._app = app
+        self._default_project = default_project
+        self._component_paths = component_paths
+        self._documents = {}
+        self._cache = {}
+        self._product = _UNKNOWN
+
+    @property
+    def component_paths(self) -> bool:
+        return self._component_paths
+
+    @component_paths.setter
+    def component_paths(self, enabled: bool):
+        if enabled != self._component_paths: self._cache.clear()
+        self._component_paths = enabled
+
+    def resolve(self, doc) -> Resolution:
+        doc_key = _document_key(doc)
+        if self._product is _UNKNOWN: self._product = self._active_product()
+        key = (doc_key, self._product)
+        occurrence = self._active_occurrence() if self._component_paths and self._product == DESIGN_PRODUCT else None
+        cached = self._cache.get(key)
+        if cached is not None and cached[1] == occurrence: return cached[0]
+        document = self._documents.get(doc_key)
+        if document is None:
+            metrics.inc('resolve.cache_misses')
+            document = self._resolve(doc)
+            if doc_key is not None: self._documents[doc_key] = document
+        resolved = Resolution(*document, self._product, self._component(occurrence) if occurrence else None)
+        if doc_key is not None: self._cache[key] = (resolved, occurrence)
+        return resolved
+
+    def invalidate(self, doc=None):
+        """Forgets the cached resolution of `doc`, or of every document when omitted."""
+        self._product = _UNKNOWN
+        if doc is None:
+            self._documents.clear()
+            self._cache.clear()
+            return
+        doc_key = _document_key(doc)
+        self._documents.pop(doc_key, None)
+        for key in [key for key in self._cache if key[0] == doc_key]: del self._cache[key]
+
+    def workspace_changed(self):
+        """Forgets the active product and component, which switching workspaces changes."""
+        self._product = _UNKNOWN
+        self._cache.clear()
+
+    def _active_product(self):
+        try:
+            product = self._app.activeProduct
+            return product.productType if product else None
+        except Exception:
+            logger.exception('Reading the active product failed.')
+            return None
+
+    def _active_occurrence(self):
+        # None in the root component, which the design name already stands for.
+        try: return self._app.activeProduct.activeOccurrence
+        except Exception:
+            logger.exception('Reading the active component failed.')
+            return None
+
+    @metrics.timed('resolve.component')
+    def _component(self, occurrence):
+        try: return occurrence.fullPathName.replace('+', '/')
+        except Exception:
+            logger.exception('Reading the active component\'s path failed.')
+            return None
+
+    @metrics.timed('resolve.document')
+    def _resolve(self, doc) -> tuple:
+        log = logger.debug
+        log('--- Heartbeat Resolution Start ---')
+        project = self._default_project
+        entity = doc.name
+        is_unsaved = True
+        try:
+            data_file = doc.dataFile
+            if data_file:
+                is_unsaved = False
+                log('Document has a dataFile. Entity set to dataFile.name.')
+                entity = data_file.name
+                log('Checking for parentFolder...')
+                parent_folder = data_file.parentFolder
+                if parent_folder:
+                    project = parent_folder.name
+                    log('SUCCESS: Project set from parentFolder: %s', project)
+                else:
+                    log('parentFolder is None. Checking for activeProject.')
+                    active_proj = self._app.data.activeProject
+                    if active_proj:
+                        project = active_proj.name
+                        log('SUCCESS: Project set from activeProject: %s', project)
+                    else:
+                        logger.warning('activeProject is also None. Using default project name.')
+            else:
+                log('Document is unsaved. Checking for activeProject.')
+                active_proj = self._app.data.activeProject
+                if active_proj:
+                    project = active_proj.name
+                    log('SUCCESS: Project for unsaved file set from activeProject: %s', project)
+                else:
+                    log('No dataFile and no activeProject. Using default names.')
+        except Exception:
+            logger.exception('Project/entity resolution failed.')
+        log("--- Final Values: Project='%s', Entity='%s' ---", project, entity)
+        return project, entity, is_unsaved
+
+
+def _document_key(doc):
+    try: return doc.creationId
+    except RuntimeError: return None
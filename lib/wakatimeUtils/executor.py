@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import Counter
+
+from .breaker import FAILURE_ERROR, FAILURE_OFFLINE, DeliveryError
+from .cli import ACCEPTED_EXIT_CODES, EXIT_SUCCESS, build_batch_command, classify_failure, spawn_cli, wait_cli
+from .logs import logger
+from .telemetry import metrics
+
+
+class HeartbeatExecutor:
+    """Delivers batches of heartbeats. Subclasses implement a transport.
+
+    submit() is called from worker threads, never from the Fusion UI thread,
+    and returns True once the batch has been handed off. A failure that says
+    something about the service (it is unreachable, the key is rejected) is
+    raised as a DeliveryError so the dispatcher can back off.
+    """
+
+    name = 'base'
+
+    def start(self):
+        pass
+
+    def submit(self, heartbeats: list) -> bool:
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+    def stats(self) -> dict:
+        return {'backend': self.name}
+
+
+class CliExecutor(HeartbeatExecutor):
+    """Runs wakatime-cli for each batch, with at most `max_concurrency` processes alive at once.
+
+    wakatime-cli has no long-running mode, so each batch still costs a spawn.
+    start() warms the binary up once in the background (a --version run pages
+    it in and gets antivirus scanning out of the way before the first real
+    heartbeat), and the executor tracks spawn latency, run time, exit codes
+    and how many callers are waiting for a free slot.
+    """
+
+    name = 'cli'
+
+    def __init__(self, cli: str, plugin: str, timeout: float = 15, max_concurrency: int = 1):
+        self.cli = cli
+        self._plugin = plugin
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._lock = threading.Lock()
+        self._max_concurrency = max(1, max_concurrency)
+        self._spawns = 0
+        self._spawn_seconds = 0.0
+        self._spawn_max = 0.0
+        self._run_seconds = 0.0
+        self._exit_codes = Counter()
+        self._waiting = 0
+        self._in_flight = 0
+
+    def start(self):
+        threading.Thread(target=self._warm_up, name='WakaTimeCliWarmUp', daemon=True).start()
+
+    def submit(self, heartbeats: list) -> bool:
+        import subprocess
+        command, stdin = build_batch_command(self.cli, heartbeats, self._plugin)
+        try:
+            returncode, stdout, stderr = self._run(command, stdin)
+        except subprocess.TimeoutExpired:
+            raise DeliveryError(FAILURE_OFFLINE, f'wakatime-cli did not finish within {self._timeout}s')
+        except OSError as e:
+            raise DeliveryError(FAILURE_ERROR, f'could not start wakatime-cli: {e}')
+        if stderr: logger.warning('Heartbeat CLI stderr: %s', stderr.strip())
+        logger.info('Heartbeat command executed for %d heartbeat(s) (exit code %s).', len(heartbeats), returncode)
+        if returncode == EXIT_SUCCESS: return True
+        # Failures are raised so the dispatcher's circuit breaker can tell an outage from a bad key.
+        raise DeliveryError(classify_failure(returncode, stderr), f'wakatime-cli exited with {returncode}',
+                            queued=returncode in ACCEPTED_EXIT_CODES)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'backend': self.name,
+                'max_concurrency': self._max_concurrency,
+                'spawns': self._spawns,
+                'spawn_ms_avg': round(1000 * self._spawn_seconds / self._spawns, 2) if self._spawns else 0.0,
+                'spawn_ms_max': round(1000 * self._spawn_max, 2),
+                'run_ms_avg': round(1000 * self._run_seconds / self._spawns, 2) if self._spawns else 0.0,
+                'exit_codes': dict(self._exit_codes),
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+            }
+
+    def _warm_up(self):
+        try:
+            returncode, stdout, stderr = self._run([self.cli, '--version'], None)
+            logger.info('wakatime-cli %s ready (exit code %s).', stdout.strip() or stderr.strip(), returncode)
+        except Exception:
+            logger.exception('wakatime-cli warm-up failed.')
+
+    def _run(self, command: list, stdin: str):
+        with self._lock: self._waiting += 1
+        with self._slots:
+            with self._lock:
+                self._waiting -= 1
+                self._in_flight += 1
+            import subprocess
+            try:
+                started = time.perf_counter()
+                process = spawn_cli(command, piped_stdin=stdin is not None)
+                spawned = time.perf_counter()
+                self._record_spawn(spawned - started)
+                try:
+                    result = wait_cli(process, timeout=self._timeout, stdin=stdin)
+                except subprocess.TimeoutExpired:
+                    self._record_exit('timeout', time.perf_counter() - spawned)
+                    raise
+                self._record_exit(result[0], time.perf_counter() - spawned)
+                return result
+            finally:
+                with self._lock: self._in_flight -= 1
+
+    def _record_spawn(self, seconds: float):
+        metrics.observe('cli.spawn', seconds)
+        with self._lock:
+            self._spawns += 1
+            self._spawn_seconds += seconds
+            self._spawn_max = max(self._spawn_max, seconds)
+
+    def _record_exit(self, code, seconds: float):
+        metrics.observe('cli.run', seconds)
+        metrics.inc(f'cli.exit.{code}')
+        with self._lock:
+            self._run_seconds += seconds
+            self._exit_codes[code] += 1
+
+
+EXECUTORS = {
+    CliExecutor.name: CliExecutor,
+}
+
+
+def create_executor(backend: str, **options) -> HeartbeatExecutor:
+    """Creates the executor registered under `backend` in EXECUTORS."""
+    if backend not in EXECUTORS:
+        raise ValueError(f"Unknown heartbeat executor '{backend}', expected one of {sorted(EXECUTORS)}")
+    return EXECUTORS[backend](**options)
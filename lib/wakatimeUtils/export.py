@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+
+from .breaker import FAILURE_ERROR, DeliveryError
+from .categories import DEFAULT_CATEGORY, DEFAULT_LANGUAGE
+from .logs import logger
+from .telemetry import metrics
+
+EXPORT_FORMATS = ('jsonl', 'csv')
+HEARTBEAT_FIELDS = ('time', 'project', 'entity', 'language', 'category', 'is_write')
+SESSION_FIELDS = ('project', 'entity', 'category', 'start', 'end', 'heartbeats')
+# Columns exported from each StatsStore table, and the one rows are ordered and filtered by.
+EXPORT_TABLES = {
+    'heartbeats': (HEARTBEAT_FIELDS, 'time'),
+    'sessions': (SESSION_FIELDS, 'start'),
+}
+IMPORT_BATCH_SIZE = 1000
+
+# json.dumps() builds a new encoder per call when given options.
+_encoder = json.JSONEncoder(separators=(',', ':'))
+
+
+def export_format(path: str) -> str:
+    """The format implied by a file's extension, 'jsonl' or 'csv'. Raises ValueError for anything else."""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'json': extension = 'jsonl'
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Cannot export to '{path}', expected a .jsonl or .csv file")
+    return extension
+
+
+def sessions_path(path: str) -> str:
+    """Where export_stats() writes the sessions that go with heartbeats exported to `path`."""
+    stem, extension = os.path.splitext(path)
+    return f'{stem}-sessions{extension}'
+
+
+def iter_table(db_path: str, table: str, since: float = None, until: float = None):
+    """Yields the rows of a StatsStore table as dicts, oldest first.
+
+    Rows are stepped out of SQLite as the generator is consumed, on a
+    read-only connection of its own, so memory stays flat however large the
+    table is and the store keeps recording meanwhile.
+    """
+    import pathlib
+    import sqlite3
+    fields, order = EXPORT_TABLES[table]
+    db = sqlite3.connect(pathlib.Path(db_path).absolute().as_uri() + '?mode=ro', uri=True)
+    try:
+        # Stores written before a column existed export it as empty.
+        columns = {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+        selected = ', '.join(field if field in columns else f'NULL AS {field}' for field in fields)
+        cursor = db.execute(
+            f'SELECT {selected} FROM {table} WHERE {order} >= ? AND {order} < ? ORDER BY {order}',
+            (since if since is not None else float('-inf'), until if until is not None else float('inf'))
+        )
+        for row in cursor: yield dict(zip(fields, row))
+    finally:
+        db.close()
+
+
+def write_rows(rows, path: str, fields: tuple, file_format: str = None) -> int:
+    """Streams dict rows to a JSONL or CSV file and returns how many were written.
+
+    The rows go to a temporary file that replaces `path` once complete, so a
+    failed or cancelled export never leaves half a file behind.
+    """
+    import csv
+    file_format = file_format or export_format(path)
+    temporary_path = path + '.tmp'
+    count = 0
+    try:
+        with open(temporary_path, 'w', encoding='utf-8', newline='') as f:
+            if file_format == 'csv':
+                writer = csv.DictWriter(f, fields, extrasaction='ignore')
+                writer.writeheader()
+                for count, row in enumerate(rows, 1): writer.writerow(row)
+            else:
+                for count, row in enumerate(rows, 1): f.write(_encoder.encode(row) + '\n')
+        os.replace(temporary_path, path)
+    except BaseException:
+        try: os.remove(temporary_path)
+        except OSError: pass
+        raise
+    return count
+
+
+def read_rows(path: str, file_format: str = None):
+    """Yields the rows of a JSONL or CSV file as dicts, reading one line at a time."""
+    import csv
+    file_format = file_format or export_format(path)
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for number, line in enumerate(f, 1):
+            if not line.strip(): continue
+            try: yield json.loads(line)
+            except ValueError as e:
+                metrics.inc('import.invalid')
+                logger.warning('Skipping line %d of %s: %s', number, path, e)
+
+
+def to_heartbeat(row: dict):
+    """Turns an exported heartbeat row back into a heartbeat for an executor, or None if it is incomplete."""
+    try:
+        timestamp = float(row['time'])
+        entity = row['entity']
+    except (KeyError, TypeError, ValueError):
+        entity = None
+    if not entity:
+        metrics.inc('import.invalid')
+        return None
+    is_write = row.get('is_write')
+    # CSV gives back strings, JSONL the 0/1 the store keeps.
+    if isinstance(is_write, str): is_write = is_write.strip().lower() in ('1', 'true', 'yes')
+    return {
+        'entity': entity, 'project': row.get('project') or 'Fusion 360',
+        'language': row.get('language') or DEFAULT_LANGUAGE, 'category': row.get('category') or DEFAULT_CATEGORY,
+        'is_write': bool(is_write), 'timestamp': timestamp,
+    }
+
+
+def batched(items, size: int):
+    """Yields lists of up to `size` consecutive items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch: yield batch
+
+
+def export_stats(db_path: str, path: str, since: float = None, until: float = None,
+                 stop_event: threading.Event = None) -> tuple:
+    """Exports the heartbeats of a StatsStore to `path` and its sessions to sessions_path(path).
+
+    The format follows the extension of `path`. Returns the number of
+    (heartbeats, sessions) written. Setting `stop_event` cancels the export
+    with InterruptedError, leaving no partial file.
+    """
+    fields, _ = EXPORT_TABLES['heartbeats']
+    rows = _until_stopped(iter_table(db_path, 'heartbeats', since, until), stop_event)
+    heartbeats = write_rows(rows, path, fields)
+    fields, _ = EXPORT_TABLES['sessions']
+    rows = _until_stopped(iter_table(db_path, 'sessions', since, until), stop_event)
+    sessions = write_rows(rows, sessions_path(path), fields)
+    logger.info('Exported %d heartbeat(s) and %d session(s) to %s.', heartbeats, sessions, path)
+    return heartbeats, sessions
+
+
+def import_heartbeats(path: str, submit, batch_size: int = IMPORT_BATCH_SIZE,
+                      stop_event: threading.Event = None) -> int:
+    """Re-submits the heartbeats of an export in batches of `batch_size` and returns how many were sent.
+
+    `submit` is an executor's submit(). The file is read a batch at a time,
+    so only one batch is ever in memory. The import stops at the first batch
+    that is not delivered, raising DeliveryError with how far it got, or
+    quietly once `stop_event` is set.
+    """
+    heartbeats = (heartbeat for heartbeat in map(to_heartbeat, read_rows(path)) if heartbeat is not None)
+    sent = 0
+    for batch in batched(heartbeats, batch_size):
+        if stop_event is not None and stop_event.is_set(): break
+        try:
+            delivered = submit(batch)
+        except DeliveryError as e:
+            # wakatime-cli saved the batch to its offline queue, but more would only pile up there.
+            if e.queued: sent += len(batch)
+            raise DeliveryError(e.kind, f'{e} after {sent} heartbeat(s)', e.queued)
+        if not delivered: raise DeliveryError(FAILURE_ERROR, f'a batch was not accepted after {sent} heartbeat(s)')
+        sent += len(batch)
+        metrics.inc('import.heartbeats', len(batch))
+    logger.info('Imported %d heartbeat(s) from %s.', sent, path)
+    return sent
+
+
+def _until_stopped(rows, stop_event: threading.Event):
+    if stop_event is None:
+        yield from rows
+        return
+    for row in rows:
+        if stop_event.is_set(): raise InterruptedError('the export was cancelled')
+        yield row
@@ -0,0 +1,90 @@
+import contextlib
+import json
+import os
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS heartbeats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    payload TEXT NOT NULL,
+    acked REAL
+);
+CREATE INDEX IF NOT EXISTS heartbeats_pending ON heartbeats(id) WHERE acked IS NULL;
+"""
+
+
+class HeartbeatJournal:
+    """Append-only SQLite journal of heartbeats awaiting delivery.
+
+    The database runs in WAL mode with synchronous=NORMAL, so commits are
+    appends to the write-ahead log and fsyncs are batched at checkpoints.
+    Pending rows are found through a partial index, which keeps replay cost
+    proportional to the backlog rather than to the journal's history.
+
+    The connection belongs to the thread that calls open(); every other
+    method must be called from that same thread.
+    """
+
+    def __init__(self, path: str, retention_days: float = 14):
+        self.path = path
+        self.retention_days = retention_days
+        self._db = None
+
+    def open(self):
+        import sqlite3
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        self.prune()
+
+    def close(self):
+        if self._db is None: return
+        self._db.close()
+        self._db = None
+
+    def append(self, heartbeats: list) -> list:
+        """Records heartbeats in one transaction and returns their journal ids."""
+        now = time.time()
+        ids = []
+        with self._transaction():
+            for heartbeat in heartbeats:
+                cursor = self._db.execute(
+                    'INSERT INTO heartbeats (created, payload) VALUES (?, ?)', (now, json.dumps(heartbeat))
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def ack(self, ids: list):
+        """Marks heartbeats as delivered so they are not replayed."""
+        with self._transaction():
+            self._db.executemany('UPDATE heartbeats SET acked = ? WHERE id = ?', [(time.time(), i) for i in ids])
+
+    def pending(self, after_id: int = 0, limit: int = 50) -> list:
+        """Returns up to `limit` unacknowledged (id, heartbeat) pairs with ids above `after_id`."""
+        rows = self._db.execute(
+            'SELECT id, payload FROM heartbeats WHERE acked IS NULL AND id > ? ORDER BY id LIMIT ?',
+            (after_id, limit)
+        )
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def pending_count(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM heartbeats WHERE acked IS NULL').fetchone()[0]
+
+    def prune(self):
+        """Deletes acknowledged heartbeats older than the retention period."""
+        cutoff = time.time() - self.retention_days * 86400
+        with self._transaction():
+            self._db.execute('DELETE FROM heartbeats WHERE acked IS NOT NULL AND acked < ?', (cutoff,))
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
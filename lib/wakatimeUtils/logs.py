@@ -0,0 +1,137 @@
+import collections
+import os
+import threading
+import time
+from typing import Callable
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+
+class RingLogger:
+    """Leveled logger that keeps records in memory until a background flush.
+
+    Logging a record below `level` costs one comparison. Anything else is
+    appended unformatted to a bounded ring buffer (oldest records are dropped
+    when it is full); flush(), called from a background thread, formats the
+    records and appends them to a size-rotated file. Warnings and errors are
+    also queued for `console`, so they still show up in Fusion; since they
+    are logged from any thread and Fusion's API may only be used from the UI
+    thread, flush_console() passes them on and must be called from there.
+    """
+
+    def __init__(self, capacity: int = 4096, level: int = INFO):
+        self.level = level
+        self.path = None
+        self.max_bytes = 1024 * 1024
+        self.backups = 3
+        self.console = None
+        self.dropped = 0
+        self._records = collections.deque(maxlen=capacity)
+        self._console_records = collections.deque(maxlen=capacity)
+        self._flush_lock = threading.Lock()
+
+    def configure(self, path: str = None, level: int = None, console: Callable[[str, int], None] = None,
+                  max_bytes: int = None, backups: int = None):
+        if path is not None: self.path = path
+        if level is not None: self.level = level
+        if console is not None: self.console = console
+        if max_bytes is not None: self.max_bytes = max_bytes
+        if backups is not None: self.backups = backups
+
+    def debug(self, message: str, *args):
+        if DEBUG >= self.level: self._emit(DEBUG, message, args)
+
+    def info(self, message: str, *args):
+        if INFO >= self.level: self._emit(INFO, message, args)
+
+    def warning(self, message: str, *args):
+        if WARNING >= self.level: self._emit(WARNING, message, args)
+
+    def error(self, message: str, *args):
+        if ERROR >= self.level: self._emit(ERROR, message, args)
+
+    def exception(self, message: str, *args):
+        """Logs an error with the traceback of the exception being handled."""
+        import traceback
+        self._emit(ERROR, f'{message}\n{traceback.format_exc().rstrip()}', args)
+
+    def log(self, level: int, message: str, *args):
+        if level >= self.level: self._emit(level, message, args)
+
+    @property
+    def console_pending(self) -> bool:
+        return bool(self._console_records)
+
+    def is_enabled_for(self, level: int) -> bool:
+        return level >= self.level
+
+    def tail(self, count: int = 50) -> list:
+        """Returns the most recent unflushed records, formatted."""
+        return [_format(record) for record in list(self._records)[-count:]]
+
+    def flush(self):
+        """Writes buffered records to the log file. Safe to call from any thread."""
+        with self._flush_lock:
+            lines = []
+            while True:
+                try: lines.append(_format(self._records.popleft()))
+                except IndexError: break
+            if self.dropped:
+                lines.append(f'{_timestamp(time.time())} WARNING {self.dropped} log record(s) dropped, buffer full.')
+                self.dropped = 0
+            if not lines or not self.path: return
+            try:
+                self._rotate_if_needed()
+                with open(self.path, 'a', encoding='utf-8') as f: f.write('\n'.join(lines) + '\n')
+            except OSError:
+                pass
+
+    def flush_console(self):
+        """Passes queued warnings and errors to `console`. Call it from Fusion's UI thread only."""
+        while True:
+            try: _, level, message, args = self._console_records.popleft()
+            except IndexError: return
+            if self.console is None: continue
+            try: self.console(_render(message, args), level)
+            except Exception: pass
+
+    def _emit(self, level: int, message: str, args: tuple):
+        records = self._records
+        if len(records) == records.maxlen: self.dropped += 1
+        record = (time.time(), level, message, args)
+        records.append(record)
+        if level >= WARNING and self.console is not None: self._console_records.append(record)
+
+    def _rotate_if_needed(self):
+        try:
+            if os.path.getsize(self.path) < self.max_bytes: return
+        except OSError:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source): os.replace(source, f'{self.path}.{index + 1}')
+        os.replace(self.path, f'{self.path}.1')
+
+
+def _render(message: str, args: tuple) -> str:
+    if not args: return message
+    try: return message % args
+    except (TypeError, ValueError): return f'{message} {args!r}'
+
+
+def _timestamp(created: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created)) + f'.{int(created % 1 * 1000):03d}'
+
+
+def _format(record: tuple) -> str:
+    created, level, message, args = record
+    return f'{_timestamp(created)} {LEVEL_NAMES.get(level, level)} {_render(message, args)}'
+
+
+# The add-in's shared logger.
+logger = RingLogger()
@@ -0,0 +1,35 @@
+from collections import OrderedDict
+
+
+class HeartbeatRateLimiter:
+    """Decides which heartbeats are worth sending, per (project, entity, is_write).
+
+    A heartbeat is allowed when the entity differs from the last one allowed,
+    when its key has not been seen for `interval` seconds, or when forced
+    (saves are always sent). The table of last-sent times is an LRU capped at
+    `max_entries`, so long sessions touching many documents stay bounded.
+    Only used from the UI thread.
+    """
+
+    def __init__(self, interval: float, max_entries: int = 256):
+        self.interval = interval
+        self.max_entries = max_entries
+        self._last_sent = OrderedDict()
+        self._last_entity = None
+
+    def allow(self, key: tuple, now: float, force: bool = False) -> bool:
+        entity = key[:2]
+        last_sent = self._last_sent.get(key)
+        if not force and entity == self._last_entity and last_sent is not None and now - last_sent < self.interval:
+            return False
+        self._last_entity = entity
+        self._last_sent[key] = now
+        self._last_sent.move_to_end(key)
+        while len(self._last_sent) > self.max_entries:
+            self._last_sent.popitem(last=False)
+        return True
+
+    def reset(self):
+        """Forgets every last-sent time, so the next heartbeat for any key is allowed."""
+        self._last_sent.clear()
+        self._last_entity = None
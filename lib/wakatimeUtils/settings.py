@@ -0,0 +1,175 @@
+import codecs
+import os
+import re
+import threading
+import time
+from typing import Callable
+
+from .activity import DEFAULT_IDLE_TIMEOUT
+from .categories import parse_rules
+from .compaction import DEFAULT_COMPACTION_EPSILON
+from .logs import logger
+
+DEFAULT_HEARTBEAT_RATE_LIMIT = 120
+
+# Checked longest first so a UTF-32 LE BOM is not mistaken for UTF-16 LE.
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+class Settings:
+    """Typed view of one version of ~/.wakatime.cfg.
+
+    Everything the add-in reads on its hot paths is converted once, when the
+    file is parsed, so consulting a setting is an attribute lookup.
+    """
+
+    def __init__(self, parser: 'configparser.ConfigParser' = None, section: str = 'fusion360'):
+        self.parser = parser
+        self.section = section
+        self.api_key = self.get('settings', 'api_key', '').strip()
+        self.api_url = self.get('settings', 'api_url', '').strip() or None
+        self.proxy = self.get('settings', 'proxy', '').strip() or None
+        self.no_ssl_verify = self.getboolean('settings', 'no_ssl_verify', False)
+        self.debug = self.getboolean('settings', 'debug', False)
+        self.heartbeat_rate_limit_seconds = max(0, self.getint(
+            'settings', 'heartbeat_rate_limit_seconds', DEFAULT_HEARTBEAT_RATE_LIMIT
+        ))
+        self.exclude = _compile_patterns(self.get('settings', 'exclude', ''))
+        self.include = _compile_patterns(self.get('settings', 'include', ''))
+        self.transport = self.get(section, 'transport', 'cli').strip().lower()
+        self.metrics = self.getboolean(section, 'metrics', True)
+        self.auto_update = self.getboolean(section, 'auto_update', True)
+        self.idle_timeout = max(1.0, self.getfloat(section, 'idle_timeout', DEFAULT_IDLE_TIMEOUT))
+        self.category_rules = parse_rules(self.items(f'{section}.categories'))
+        self.component_entities = self.getboolean(section, 'component_entities', False)
+        self.compaction_epsilon = max(0.0, self.getfloat(section, 'compaction_epsilon', DEFAULT_COMPACTION_EPSILON))
+        self._excluded = {}
+
+    def get(self, section: str, option: str, fallback=None):
+        if self.parser is None: return fallback
+        return self.parser.get(section, option, fallback=fallback)
+
+    def items(self, section: str) -> list:
+        if self.parser is None or not self.parser.has_section(section): return []
+        return self.parser.items(section)
+
+    def getboolean(self, section: str, option: str, fallback: bool = False) -> bool:
+        if self.parser is None: return fallback
+        try: return self.parser.getboolean(section, option, fallback=fallback)
+        except ValueError: return fallback
+
+    def getint(self, section: str, option: str, fallback: int = 0) -> int:
+        if self.parser is None: return fallback
+        try: return self.parser.getint(section, option, fallback=fallback)
+        except ValueError: return fallback
+
+    def getfloat(self, section: str, option: str, fallback: float = 0.0) -> float:
+        if self.parser is None: return fallback
+        try: return self.parser.getfloat(section, option, fallback=fallback)
+        except ValueError: return fallback
+
+    def is_excluded(self, entity: str) -> bool:
+        """Applies the exclude and include patterns, which take precedence, to an entity."""
+        excluded = self._excluded.get(entity)
+        if excluded is None:
+            excluded = (any(pattern.search(entity) for pattern in self.exclude)
+                        and not any(pattern.search(entity) for pattern in self.include))
+            self._excluded[entity] = excluded
+        return excluded
+
+
+class ConfigService:
+    """Parses ~/.wakatime.cfg once and re-parses it only when it changes.
+
+    refresh() stats the file at most once per `check_interval` seconds and
+    compares (path, mtime, size) with the version already parsed; it is
+    meant to be called from a background timer. `settings` always holds the
+    latest parsed Settings, and on_change callbacks run after every reload.
+    """
+
+    def __init__(self, path: str, section: str = 'fusion360', check_interval: float = 5):
+        self.path = path
+        self.section = section
+        self.check_interval = check_interval
+        self.settings = Settings(section=section)
+        self._version = None
+        self._checked = None
+        self._encoding = (None, None)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def on_change(self, callback: Callable[[Settings], None]):
+        self._listeners.append(callback)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reloads the file if it changed. Returns True when new settings were loaded."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._checked is not None and now - self._checked < self.check_interval: return False
+            self._checked = now
+            try:
+                stat = os.stat(self.path)
+                version = (self.path, stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                version = None
+            if version == self._version and not force: return False
+            self._version = version
+            try:
+                settings = Settings(self._parse() if version else None, self.section)
+            except Exception as e:
+                logger.warning('Could not read config file %s, keeping the previous settings: %s', self.path, e)
+                return False
+            self.settings = settings
+        logger.debug('Loaded settings from %s.', self.path)
+        for callback in self._listeners:
+            try: callback(settings)
+            except Exception: logger.exception('Applying new settings failed.')
+        return True
+
+    def _parse(self) -> 'configparser.ConfigParser':
+        import configparser
+        with open(self.path, 'rb') as f: raw = f.read()
+        # The encoding only needs detecting again when the file itself changed.
+        version, encoding = self._encoding
+        if version != self._version or encoding is None:
+            encoding = detect_encoding(raw)
+            self._encoding = (self._version, encoding)
+        parser = configparser.ConfigParser(interpolation=None)
+        parser.read_string(raw.decode(encoding, errors='replace'), source=self.path)
+        return parser
+
+
+def detect_encoding(raw: bytes) -> str:
+    """Guesses the encoding of a config file as cheaply as possible.
+
+    Checks for a BOM, then tries strict UTF-8 and the platform code page, and
+    only falls back to chardet, imported on first use, when both fail.
+    """
+    for bom, encoding in BOMS:
+        if raw.startswith(bom): return encoding
+    import locale
+    for encoding in ('utf-8', locale.getpreferredencoding(False)):
+        try:
+            raw.decode(encoding)
+            return encoding
+        except (UnicodeDecodeError, LookupError):
+            pass
+    try:
+        import chardet
+        return chardet.detect(raw)['encoding'] or 'utf-8'
+    except Exception as e:
+        logger.warning('Config encoding detection failed: %s', e)
+        return 'utf-8'
+
+
+def _compile_patterns(value: str) -> tuple:
+    patterns = []
+    for line in value.splitlines():
+        line = line.strip()
+        if not line: continue
+        try: patterns.append(re.compile(line, re.IGNORECASE))
+        except re.error as e: logger.warning('Ignoring invalid pattern %r in config: %s', line, e)
+    return tuple(patterns)
@@ -0,0 +1,67 @@
+import contextlib
+import threading
+import time
+
+from .logs import logger
+from .telemetry import metrics
+
+STARTUP_BUDGET_MS = 50
+
+
+class StartupProfile:
+    """Times each phase of add-in startup and the thread it ran on.
+
+    The profile is created while Fusion imports the add-in, on its main
+    thread; phases run there are what Fusion waits for before it finishes
+    loading, everything else happens in the background. record() adds a phase
+    that started before the profile existed, such as the import itself, and
+    begin() marks the start of run(), keeping what was recorded before the
+    first run(). Phase times are also recorded as `startup.<phase>` histograms.
+    """
+
+    def __init__(self, budget_ms: float = STARTUP_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.phases = []
+        self._main_thread = threading.get_ident()
+        self._begun = False
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            if self._begun: self.phases = []
+            self._begun = True
+        self._main_thread = threading.get_ident()
+
+    def record(self, name: str, started: float):
+        """Adds a phase that began at perf_counter() value `started` and ends now."""
+        self._add(name, time.perf_counter() - started)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - started)
+
+    @property
+    def main_thread_ms(self) -> float:
+        with self._lock: return sum(ms for _, ms, on_main in self.phases if on_main)
+
+    def summary(self, main_thread: bool) -> str:
+        with self._lock:
+            return ', '.join(f'{name} {ms:.1f}ms' for name, ms, on_main in self.phases if on_main == main_thread)
+
+    def report_main_thread(self):
+        """Logs the main-thread breakdown, as a warning when it is over budget."""
+        total = self.main_thread_ms
+        level = logger.warning if total > self.budget_ms else logger.info
+        level('Startup took %.1fms on the main thread (budget %sms): %s', total, self.budget_ms, self.summary(True))
+
+    def report_background(self):
+        logger.info('Background warm-up: %s', self.summary(False))
+
+    def _add(self, name: str, elapsed: float):
+        on_main = threading.get_ident() == self._main_thread
+        with self._lock: self.phases.append((name, elapsed * 1000, on_main))
+        metrics.observe(f'startup.{name}', elapsed)
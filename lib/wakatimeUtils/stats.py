@@ -0,0 +1,243 @@
+import contextlib
+import datetime
+import os
+import threading
+import time
+
+from .logs import logger
+
+DEFAULT_SESSION_TIMEOUT = 15 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS heartbeats (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    project TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    category TEXT NOT NULL,
+    is_write INTEGER NOT NULL DEFAULT 0,
+    session_id INTEGER,
+    language TEXT
+);
+CREATE INDEX IF NOT EXISTS heartbeats_time ON heartbeats(time);
+CREATE INDEX IF NOT EXISTS heartbeats_project_time ON heartbeats(project, time);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    category TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    heartbeats INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS sessions_start ON sessions(start);
+CREATE INDEX IF NOT EXISTS sessions_project_start ON sessions(project, start);
+
+CREATE TABLE IF NOT EXISTS daily_totals (
+    day TEXT NOT NULL,
+    project TEXT NOT NULL,
+    category TEXT NOT NULL,
+    seconds REAL NOT NULL DEFAULT 0,
+    heartbeats INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, project, category)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS daily_totals_project ON daily_totals(project, day);
+"""
+
+
+class StatsStore:
+    """Local SQLite record of every heartbeat, the sessions they form and daily totals.
+
+    Consecutive heartbeats for the same project, entity and category no more
+    than `session_timeout` seconds apart extend one session. The time between
+    two heartbeats is credited to the earlier one's session, as the WakaTime
+    dashboard does, and added to the `daily_totals` rollup as it is recorded,
+    split at local midnight, so aggregate queries read a few rows per day
+    instead of scanning heartbeats. Heartbeats older than the last one
+    recorded are stored but not counted.
+
+    With `totals` (a TodayTotals), every slice of time credited to the
+    current day is also added there, for the dashboard. An instance that
+    does not record, because another Fusion 360 instance leads and writes
+    the store, keeps them up to date with refresh_totals() instead.
+
+    record() is called from the dispatcher's worker thread; queries may come
+    from any thread and are serialized with a lock.
+    """
+
+    def __init__(self, path: str, session_timeout: float = DEFAULT_SESSION_TIMEOUT, totals=None):
+        self.path = path
+        self.session_timeout = session_timeout
+        self.totals = totals
+        self._db = None
+        self._lock = threading.RLock()
+        # (session id, project, entity, category, end) of the session the last heartbeat went to.
+        self._current = None
+
+    def open(self):
+        import sqlite3
+        with self._lock:
+            if self._db is not None: return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(_SCHEMA)
+            columns = {row[1] for row in self._db.execute('PRAGMA table_info(heartbeats)')}
+            if 'language' not in columns: self._db.execute('ALTER TABLE heartbeats ADD COLUMN language TEXT')
+            row = self._db.execute(
+                'SELECT id, project, entity, category, end FROM sessions ORDER BY end DESC LIMIT 1'
+            ).fetchone()
+            self._current = tuple(row) if row else None
+            if self.totals is not None: self._seed_totals()
+
+    def close(self):
+        with self._lock:
+            if self._db is None: return
+            self._db.close()
+            self._db = None
+
+    def refresh_totals(self):
+        """Reloads today's totals from the database while this store is not open.
+
+        Another process is recording meanwhile, so the store is read on a
+        read-only connection of its own, opened for each refresh.
+        """
+        import pathlib
+        import sqlite3
+        with self._lock:
+            if self.totals is None or self._db is not None or not os.path.exists(self.path): return
+            try:
+                db = sqlite3.connect(pathlib.Path(self.path).absolute().as_uri() + '?mode=ro', uri=True)
+                try: self.totals.sync(*self._load_totals(db))
+                finally: db.close()
+            except sqlite3.Error as e:
+                # The leader may not have created the tables yet.
+                logger.debug('Could not read today\'s totals from %s: %s', self.path, e)
+
+    def record(self, heartbeats: list):
+        """Stores heartbeats and folds them into sessions and daily totals in one transaction."""
+        with self._lock, self._transaction():
+            for heartbeat in sorted(heartbeats, key=lambda heartbeat: heartbeat['timestamp']):
+                self._record(heartbeat)
+
+    def project_totals(self, first_day: datetime.date, last_day: datetime.date) -> list:
+        """Returns (project, seconds) for the days from first_day to last_day, most time first."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT project, SUM(seconds) AS total FROM daily_totals WHERE day BETWEEN ? AND ? '
+                'GROUP BY project ORDER BY total DESC',
+                (first_day.isoformat(), last_day.isoformat())
+            ).fetchall()
+
+    def daily_totals(self, first_day: datetime.date, last_day: datetime.date, project: str = None) -> list:
+        """Returns (day, seconds) for every day with activity in the range, optionally for one project."""
+        query = 'SELECT day, SUM(seconds) FROM daily_totals WHERE day BETWEEN ? AND ?'
+        parameters = [first_day.isoformat(), last_day.isoformat()]
+        if project is not None:
+            query = 'SELECT day, SUM(seconds) FROM daily_totals WHERE project = ? AND day BETWEEN ? AND ?'
+            parameters.insert(0, project)
+        with self._lock:
+            return self._db.execute(query + ' GROUP BY day ORDER BY day', parameters).fetchall()
+
+    def category_totals(self, first_day: datetime.date, last_day: datetime.date) -> list:
+        """Returns (category, seconds) for the days from first_day to last_day, most time first."""
+        with self._lock:
+            return self._db.execute(
+                'SELECT category, SUM(seconds) AS total FROM daily_totals WHERE day BETWEEN ? AND ? '
+                'GROUP BY category ORDER BY total DESC',
+                (first_day.isoformat(), last_day.isoformat())
+            ).fetchall()
+
+    def sessions(self, since: float, until: float = None, project: str = None) -> list:
+        """Returns (project, entity, category, start, end, heartbeats) for sessions starting in the range."""
+        query = 'SELECT project, entity, category, start, end, heartbeats FROM sessions WHERE start >= ? AND start < ?'
+        parameters = [since, until if until is not None else time.time() + 86400]
+        if project is not None:
+            query += ' AND project = ?'
+            parameters.append(project)
+        with self._lock:
+            return self._db.execute(query + ' ORDER BY start', parameters).fetchall()
+
+    def _record(self, heartbeat: dict):
+        timestamp = heartbeat['timestamp']
+        key = (heartbeat['project'], heartbeat['entity'], heartbeat['category'])
+        current = self._current
+        session_id = None
+        if current is None or timestamp - current[4] > self.session_timeout:
+            session_id = self._new_session(key, timestamp)
+        elif timestamp >= current[4]:
+            # Whatever the next heartbeat is, the time since the last one belongs to its session.
+            self._extend(current, timestamp)
+            if current[1:4] == key:
+                session_id = current[0]
+                self._db.execute('UPDATE sessions SET heartbeats = heartbeats + 1 WHERE id = ?', (session_id,))
+                self._current = (session_id, *key, timestamp)
+            else:
+                session_id = self._new_session(key, timestamp)
+        self._db.execute(
+            'INSERT INTO heartbeats (time, project, entity, category, is_write, session_id, language) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (timestamp, *key, int(bool(heartbeat.get('is_write'))), session_id, heartbeat.get('language'))
+        )
+        if session_id is not None: self._add_heartbeat(key[0], key[2], timestamp)
+
+    def _new_session(self, key: tuple, timestamp: float) -> int:
+        session_id = self._db.execute(
+            'INSERT INTO sessions (project, entity, category, start, end) VALUES (?, ?, ?, ?, ?)', (*key, timestamp, timestamp)
+        ).lastrowid
+        self._current = (session_id, *key, timestamp)
+        return session_id
+
+    def _extend(self, session: tuple, timestamp: float):
+        session_id, project, entity, category, end = session
+        if timestamp == end: return
+        self._db.execute('UPDATE sessions SET end = ? WHERE id = ?', (timestamp, session_id))
+        start = end
+        while start < timestamp:
+            day = datetime.date.fromtimestamp(start)
+            midnight = time.mktime((day + datetime.timedelta(days=1)).timetuple())
+            stop = min(timestamp, midnight)
+            self._db.execute(
+                'INSERT INTO daily_totals (day, project, category, seconds) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (day, project, category) DO UPDATE SET seconds = seconds + excluded.seconds',
+                (day.isoformat(), project, category, stop - start)
+            )
+            if self.totals is not None: self.totals.add(day.isoformat(), project, entity, stop - start)
+            start = stop
+
+    def _seed_totals(self):
+        self.totals.seed(*self._load_totals(self._db))
+
+    @staticmethod
+    def _load_totals(db) -> tuple:
+        """Returns today's (day, seconds by project, seconds by entity)."""
+        today = datetime.date.today()
+        midnight = time.mktime(today.timetuple())
+        projects = db.execute(
+            'SELECT project, SUM(seconds) FROM daily_totals WHERE day = ? GROUP BY project', (today.isoformat(),)
+        ).fetchall()
+        entities = db.execute(
+            # Sessions rarely last a day, so the start index bounds the scan.
+            'SELECT entity, SUM(end - MAX(start, ?)) FROM sessions WHERE start >= ? AND end > ? GROUP BY entity',
+            (midnight, midnight - 86400, midnight)
+        ).fetchall()
+        return today.isoformat(), dict(projects), dict(entities)
+
+    def _add_heartbeat(self, project: str, category: str, timestamp: float):
+        self._db.execute(
+            'INSERT INTO daily_totals (day, project, category, heartbeats) VALUES (?, ?, ?, 1) '
+            'ON CONFLICT (day, project, category) DO UPDATE SET heartbeats = heartbeats + 1',
+            (datetime.date.fromtimestamp(timestamp).isoformat(), project, category)
+        )
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
@@ -0,0 +1,158 @@
+import bisect
+import functools
+import threading
+import time
+from typing import Callable
+
+# Upper bounds, in milliseconds, of the latency histogram buckets. Anything
+# slower lands in a final overflow bucket.
+LATENCY_BUCKETS_MS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, 15000)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock: self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """Holds the last value set, or reads it from `source` when snapshotted."""
+
+    def __init__(self, source: Callable[[], float] = None):
+        self.value = 0
+        self._source = source
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        if self._source is None: return self.value
+        try: return self._source()
+        except Exception: return None
+
+
+class Histogram:
+    """Fixed-bucket latency histogram. observe() takes seconds."""
+
+    def __init__(self, buckets_ms: tuple = LATENCY_BUCKETS_MS):
+        self._bounds = tuple(bound / 1000 for bound in buckets_ms)
+        self._buckets_ms = buckets_ms
+        self._counts = [0] * (len(buckets_ms) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(self._bounds, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += seconds
+            if seconds > self._max: self._max = seconds
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            count, total, maximum = self._count, self._sum, self._max
+        return {
+            'count': count,
+            'avg_ms': round(1000 * total / count, 3) if count else 0.0,
+            'p50_ms': self._quantile(counts, count, 0.50),
+            'p95_ms': self._quantile(counts, count, 0.95),
+            'p99_ms': self._quantile(counts, count, 0.99),
+            'max_ms': round(1000 * maximum, 3),
+        }
+
+    def _quantile(self, counts: list, count: int, fraction: float):
+        # Reports the upper bound of the bucket holding the quantile.
+        if not count: return 0.0
+        rank = fraction * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self._buckets_ms[index] if index < len(self._buckets_ms) else float('inf')
+        return float('inf')
+
+
+class MetricsRegistry:
+    """In-process registry of named counters, gauges and latency histograms.
+
+    Instrumented code checks `enabled` before measuring anything, so a
+    disabled registry costs one attribute read per instrumented call.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def gauge(self, name: str, source: Callable[[], float] = None) -> Gauge:
+        gauge = self._get(name, Gauge)
+        if source is not None: gauge._source = source
+        return gauge
+
+    def histogram(self, name: str) -> Histogram:
+        return self._get(name, Histogram)
+
+    def inc(self, name: str, amount: int = 1):
+        if self.enabled: self.counter(name).inc(amount)
+
+    def observe(self, name: str, seconds: float):
+        if self.enabled: self.histogram(name).observe(seconds)
+
+    def timed(self, name: str):
+        """Decorator recording the run time of a function in the `name` histogram."""
+        def decorate(func):
+            histogram = self.histogram(name)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled: return func(*args, **kwargs)
+                started = time.perf_counter()
+                try: return func(*args, **kwargs)
+                finally: histogram.observe(time.perf_counter() - started)
+            return wrapper
+        return decorate
+
+    def snapshot(self) -> dict:
+        with self._lock: metrics = dict(self._metrics)
+        return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+
+    def _get(self, name: str, metric_type):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock: metric = self._metrics.setdefault(name, metric_type())
+        if not isinstance(metric, metric_type):
+            raise TypeError(f"Metric '{name}' is a {type(metric).__name__}, not a {metric_type.__name__}")
+        return metric
+
+
+def format_snapshot(snapshot: dict) -> str:
+    """Renders a registry snapshot as aligned text for the Text Commands window."""
+    if not snapshot: return 'No metrics recorded.'
+    width = max(len(name) for name in snapshot)
+    lines = []
+    for name, value in snapshot.items():
+        if isinstance(value, dict):
+            value = '  '.join(f'{key}={item}' for key, item in value.items())
+        lines.append(f'{name.ljust(width)}  {value}')
+    return '\n'.join(lines)
+
+
+# The add-in's shared registry.
+metrics = MetricsRegistry()
@@ -0,0 +1,33 @@
+import threading
+from typing import Callable
+
+from .logs import logger
+
+
+class PeriodicTimer:
+    """Calls `tick` every `interval` seconds from a background thread until `stop_event` is set.
+
+    Fusion's API may only be used from the UI thread, so `tick` should do no
+    more than fire a custom event whose handler does the real work.
+    """
+
+    def __init__(self, interval: float, tick: Callable[[], None]):
+        self._interval = interval
+        self._tick = tick
+        self._thread = None
+        self._stop_event = None
+
+    def start(self, stop_event: threading.Event):
+        self._stop_event = stop_event
+        self._thread = threading.Thread(target=self._run, name='WakaTimeTimer', daemon=True)
+        self._thread.start()
+
+    def join(self, timeout: float = None):
+        if self._thread is None: return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            try: self._tick()
+            except Exception: logger.exception('Timer tick failed.')
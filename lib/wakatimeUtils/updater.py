@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+
+from .discovery import cli_filename
+from .logs import logger
+from .telemetry import metrics
+
+RELEASES_URL = 'https://github.com/wakatime/wakatime-cli/releases'
+LATEST_RELEASE_URL = 'https://api.github.com/repos/wakatime/wakatime-cli/releases/latest'
+CHECKSUMS_ASSET = 'checksums.txt'
+CHUNK_SIZE = 64 * 1024
+UPDATE_CHECK_INTERVAL = 24 * 60 * 60
+
+
+class UpdateError(Exception):
+    pass
+
+
+class CliUpdater:
+    """Downloads wakatime-cli releases into `install_dir` and keeps them current.
+
+    Runs on a background thread and never touches Fusion. A release archive is
+    streamed to a .part file next to its destination and verified against the
+    release's checksums.txt before the binary inside it replaces the old one
+    with a single rename. An interrupted download (network error, or
+    `stop_event` being set) leaves the .part file behind, and the next attempt
+    at the same release resumes it with a Range request. The .part file is
+    named after the release, so one left by an older release is discarded
+    rather than resumed.
+
+    `releases_url` and `latest_release_url` default to GitHub and can point at
+    any server laid out the same way.
+    """
+
+    def __init__(self, install_dir: str, releases_url: str = RELEASES_URL,
+                 latest_release_url: str = LATEST_RELEASE_URL, timeout: float = 30,
+                 proxy: str = None, verify: bool = True, stop_event: threading.Event = None):
+        self.install_dir = install_dir
+        self.releases_url = releases_url.rstrip('/')
+        self.latest_release_url = latest_release_url
+        self.timeout = timeout
+        self.proxy = proxy
+        self.verify = verify
+        self.stop_event = stop_event or threading.Event()
+        self.binary_name = cli_filename()
+        self.asset_name = self.binary_name[:-len('.exe')] if self.binary_name.endswith('.exe') else self.binary_name
+        self.asset_name += '.zip'
+
+    @property
+    def binary_path(self) -> str:
+        return os.path.join(self.install_dir, self.binary_name)
+
+    @property
+    def _stamp_path(self) -> str:
+        return os.path.join(self.install_dir, 'fusion360-cli-update-check')
+
+    def check_due(self, interval: float = UPDATE_CHECK_INTERVAL) -> bool:
+        """True when the last update check is older than `interval` seconds."""
+        try: return time.time() - os.path.getmtime(self._stamp_path) >= interval
+        except OSError: return True
+
+    def update(self, current_version: str = None) -> str:
+        """Installs the latest release unless `current_version` already is it.
+
+        Returns the version that was installed, or None when nothing changed.
+        Raises UpdateError (or a requests exception) when the update failed.
+        """
+        session = self._session()
+        try:
+            version = self.latest_version(session)
+            self._touch_stamp()
+            if current_version and _normalize_version(current_version) == _normalize_version(version): return None
+            base_url = f'{self.releases_url}/download/{version}'
+            checksum = self._checksum(session, f'{base_url}/{CHECKSUMS_ASSET}')
+            archive = self.download(session, f'{base_url}/{self.asset_name}', checksum, version)
+            self.install(archive)
+        finally:
+            session.close()
+        logger.info('Installed wakatime-cli %s to %s.', version, self.binary_path)
+        metrics.inc('cli.update.installed')
+        return version
+
+    def latest_version(self, session) -> str:
+        response = session.get(self.latest_release_url, timeout=self.timeout)
+        response.raise_for_status()
+        version = response.json().get('tag_name')
+        if not version: raise UpdateError(f'No tag_name in {self.latest_release_url}')
+        return version
+
+    def part_path(self, version: str) -> str:
+        return os.path.join(self.install_dir, f'{self.asset_name}.{version}.part')
+
+    def download(self, session, url: str, sha256: str, version: str) -> str:
+        """Streams release `version` from `url` to part_path(version), resuming a previous partial download.
+
+        Returns the path of the verified archive.
+        """
+        import hashlib
+        os.makedirs(self.install_dir, exist_ok=True)
+        part_path = self.part_path(version)
+        self._discard_stale_parts(part_path)
+        digest = hashlib.sha256()
+        offset = 0
+        if os.path.exists(part_path):
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''): digest.update(chunk)
+                offset = f.tell()
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # The server has nothing past `offset`: the previous attempt got the whole file.
+                pass
+            else:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    digest = hashlib.sha256()
+                    offset = 0
+                elif not response.headers.get('Content-Range', '').startswith(f'bytes {offset}-'):
+                    os.remove(part_path)
+                    raise UpdateError(f'Unexpected Content-Range from {url}; the partial download was discarded.')
+                else:
+                    metrics.inc('cli.update.resumed')
+                    logger.info('Resuming the wakatime-cli download at byte %d.', offset)
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if self.stop_event.is_set(): raise UpdateError('Download interrupted by shutdown.')
+                        f.write(chunk)
+                        digest.update(chunk)
+                        metrics.inc('cli.update.bytes', len(chunk))
+        if digest.hexdigest() != sha256.lower():
+            os.remove(part_path)
+            raise UpdateError(f'Checksum mismatch for {url}; the partial download was discarded.')
+        return part_path
+
+    def install(self, archive_path: str):
+        """Extracts the binary from a verified archive and swaps it in atomically."""
+        import zipfile
+        temporary = self.binary_path + '.new'
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                try: member = archive.getinfo(self.binary_name)
+                except KeyError: raise UpdateError(f'{self.binary_name} is missing from {self.asset_name}')
+                with archive.open(member) as source, open(temporary, 'wb') as target:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''): target.write(chunk)
+            os.chmod(temporary, 0o755)
+            os.replace(temporary, self.binary_path)
+        finally:
+            if os.path.exists(temporary): os.remove(temporary)
+        os.remove(archive_path)
+
+    def _checksum(self, session, url: str) -> str:
+        response = session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        for line in response.text.splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[1].lstrip('*') == self.asset_name: return parts[0]
+        raise UpdateError(f'No checksum for {self.asset_name} in {url}')
+
+    def _session(self):
+        try:
+            import requests
+        except ImportError as e:
+            raise UpdateError(f'requests is unavailable: {e}')
+        session = requests.Session()
+        session.headers['User-Agent'] = 'fusion-360-wakatime'
+        if self.proxy: session.proxies.update({'http': self.proxy, 'https': self.proxy})
+        session.verify = self.verify
+        return session
+
+    def _discard_stale_parts(self, keep: str):
+        # Partial downloads of other releases can never be resumed into this one.
+        for name in os.listdir(self.install_dir):
+            path = os.path.join(self.install_dir, name)
+            if name.startswith(self.asset_name + '.') and name.endswith('.part') and path != keep:
+                try: os.remove(path)
+                except OSError: pass
+
+    def _touch_stamp(self):
+        try:
+            os.makedirs(self.install_dir, exist_ok=True)
+            with open(self._stamp_path, 'w'): pass
+        except OSError as e:
+            logger.warning('Could not record the wakatime-cli update check: %s', e)
+
+
+def _normalize_version(version: str) -> str:
+    # `wakatime-cli --version` prints "v1.90.0" on current releases and "1.90.0" on older ones.
+    return version.strip().lstrip('v')